@@ -1,7 +1,7 @@
 
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, Query, status, Request
-from starlette.responses import FileResponse
+from starlette.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
 import random
 from datetime import datetime
@@ -10,6 +10,7 @@ from app.db.database import get_db
 import os
 import shutil
 import json
+import asyncio
 import logging
 from typing import List, Optional
 from fastapi.encoders import jsonable_encoder
@@ -38,7 +39,8 @@ from app.schemas.user import (
 from app.schemas.tender_types import TenderTypeCreate, TenderTypeUpdate
 from app.schemas.evaluation import (
     EvaluationCriterionCreate, EvaluationCriterionUpdate,
-    EvaluationCriterionListResponse,
+    EvaluationCriterionListResponse, RobustnessRequest, WhatIfRequest,
+    EligibilityRuleCreate, EligibilityRuleUpdate,
 )
 
 # ---------- Services ----------
@@ -62,11 +64,26 @@ from app.services.evaluation_service import (
     toggle_criterion_status, restore_default_criteria,
     get_evaluation_criteria, get_evaluation_criterion_by_id, create_evaluation_criterion,
     update_evaluation_criterion, delete_evaluation_criterion, toggle_criterion_status, restore_default_criteria,
+    load_evaluation_inputs,
 )
 from app.services.document_extraction_service import extraction_service
+from app.services.word_geometry_store import word_geometry_store
+from app.services.progressive_extraction_service import needs_completion, progressive_extraction_service
+from app.services.embedding_index_service import embedding_index_service
+from app.services.ai_evaluation_service import ai_evaluation_service
+from app.services.evaluation_cache import evaluation_cache
+from app.services.evaluation_stream_service import evaluation_stream_service
+from app.services.evaluation_run_service import evaluation_run_service
+from app.services.evaluation_queue_service import evaluation_queue_service
+from app.services.score_matrix_service import score_matrix_service
+from app.services.tender_digest_service import tender_digest_service
+from app.services.vendor_corpus_service import vendor_corpus_service
+from app.services.eligibility_service import eligibility_service
+from app.services.fact_extraction_service import FACTS, fact_extraction_service
+from app.core.config import settings
 
 # ---------- upload model import ----------
-from app.models.upload_models import Tender, Vendor, TenderAttachment, VendorAttachment
+from app.models.upload_models import Tender, Vendor, TenderAttachment, VendorAttachment, EvaluationRun, AttachmentFact
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -360,7 +377,10 @@ def upload_tender(
     title: Optional[str] = Form(None),
     tenderform: Optional[str] = Form(None),
     tenderid: Optional[int] = Form(None),  # Optional: if provided, attach to existing tender
+    tender_type_id: Optional[int] = Form(None),  # Optional: tender type of a new tender (its eligibility rules apply)
     uploadedby: Optional[str] = Form(None),
+    progressive: bool = Form(False),
+    preview_pages: Optional[int] = Form(None),
     file: Optional[UploadFile] = File(None),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user_dep) if get_current_user_dep else None,
@@ -374,6 +394,10 @@ def upload_tender(
     Each uploaded file is stored as a TenderAttachment and processed by the
     document_extraction_service; extracted JSON is saved on the attachment's
     form_data field (not on the Tender itself).
+
+    With 'progressive', only the first 'preview_pages' pages of a PDF are
+    extracted before returning; form_data is marked "partial" and the rest
+    of the document is extracted and merged in the background.
     """
 
     # Determine uploader
@@ -414,6 +438,7 @@ def upload_tender(
                 tenderform=tenderform,
                 uploadedby=uploader_str,
                 form_data={},  # initialize empty form_data
+                tender_type_id=tender_type_id,
             )
             db.add(tender)
             db.flush()  # obtain tender.tenderid
@@ -456,7 +481,12 @@ def upload_tender(
             # Extract data from document and save on attachment
             try:
                 logger.info(f"Extracting data from tender file: {filename}")
-                form_data = extraction_service.extract_from_file(dest_path)
+                if progressive:
+                    form_data = extraction_service.extract_preview(
+                        dest_path, preview_pages or settings.PROGRESSIVE_PREVIEW_PAGES
+                    )
+                else:
+                    form_data = extraction_service.extract_from_file(dest_path)
                 attachment.form_data = form_data
                 logger.info(f"Successfully extracted data from {filename}")
             except Exception as extract_err:
@@ -472,6 +502,13 @@ def upload_tender(
         db.commit()
         db.refresh(tender)
 
+        if attachment is not None and needs_completion(attachment.form_data):
+            progressive_extraction_service.schedule(TenderAttachment, attachment.tenderattachmentsid)
+        elif attachment is not None and (attachment.form_data or {}).get("status") == "success":
+            embedding_index_service.schedule(TenderAttachment, attachment.tenderattachmentsid)
+            fact_extraction_service.schedule(TenderAttachment, attachment.tenderattachmentsid)
+            tender_digest_service.schedule(tender.tenderid)
+
         attachment_info = None
         if attachment is not None:
             attachment_info = {
@@ -578,6 +615,8 @@ def upload_vendors(
     tenderid: int = Form(...),
     vendorform: Optional[str] = Form(None),
     uploadedby: Optional[str] = Form(None),
+    progressive: bool = Form(False),
+    preview_pages: Optional[int] = Form(None),
     files: List[UploadFile] = File(...),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user_dep) if get_current_user_dep else None,
@@ -586,6 +625,7 @@ def upload_vendors(
     Upload multiple vendor files with automatic data extraction.
     Creates one vendor row per file with extracted data saved as JSON in form_data field.
     File paths are saved separately.
+    With 'progressive', PDFs return after a first-pages preview and finish in the background.
     """
     # Determine uploader
     uploader_str = None
@@ -602,6 +642,9 @@ def upload_vendors(
         raise HTTPException(status_code=404, detail="Tender not found")
 
     saved = []
+    partial_attachment_ids = []
+    extracted_attachment_ids = []
+    extracted_vendor_ids = set()
     tender_folder = os.path.join(VENDORS_UPLOAD_DIR, str(tenderid))
     os.makedirs(tender_folder, exist_ok=True)
 
@@ -732,11 +775,16 @@ def upload_vendors(
                 # Extract data from document using OCR (doctr)
                 try:
                     logger.info(f"Extracting data from vendor file: {filename}")
-                    form_data = extraction_service.extract_from_file(dest_path)
+                    if progressive:
+                        form_data = extraction_service.extract_preview(
+                            dest_path, preview_pages or settings.PROGRESSIVE_PREVIEW_PAGES
+                        )
+                    else:
+                        form_data = extraction_service.extract_from_file(dest_path)
                     # Save extracted data to the attachment record
                     vendor_attachment.form_data = form_data
                     logger.info(f"Successfully extracted data from {filename}")
-                    extraction_status = "success"
+                    extraction_status = "partial" if form_data.get("status") == "partial" else "success"
                 except Exception as extract_err:
                     logger.warning(f"Error extracting data from {filename}: {extract_err}")
                     form_data = {
@@ -748,6 +796,11 @@ def upload_vendors(
                     extraction_status = "extraction_failed"
 
                 db.flush()
+                if needs_completion(form_data):
+                    partial_attachment_ids.append(vendor_attachment.vendorattachmentid)
+                elif form_data.get("status") == "success":
+                    extracted_attachment_ids.append(vendor_attachment.vendorattachmentid)
+                    extracted_vendor_ids.add(vendor_id)
                 
                 saved.append({
                     "vendorid": vendor_id,
@@ -759,6 +812,14 @@ def upload_vendors(
                 })
 
         db.commit()
+
+        for attachment_id in partial_attachment_ids:
+            progressive_extraction_service.schedule(VendorAttachment, attachment_id)
+        for attachment_id in extracted_attachment_ids:
+            embedding_index_service.schedule(VendorAttachment, attachment_id)
+            fact_extraction_service.schedule(VendorAttachment, attachment_id)
+        for extracted_vendor_id in extracted_vendor_ids:
+            vendor_corpus_service.schedule(extracted_vendor_id)
         
         # Log the final vendor mapping for debugging
         logger.info(f"Final vendor mapping: {vendor_map}")
@@ -1138,10 +1199,16 @@ def delete_tender_attachment(
                 logger.info(f"Deleted file: {attachment.filepath}")
             except Exception as e:
                 logger.warning(f"Could not delete file {attachment.filepath}: {e}")
+        if attachment.filepath:
+            word_geometry_store.delete(attachment.filepath)
+        embedding_index_service.delete(db, TenderAttachment, attachment)
+        fact_extraction_service.delete(db, TenderAttachment, attachment)
+        tenderid = attachment.tenderid
         
         # Database delete - only the attachment record
         db.delete(attachment)
         db.commit()
+        tender_digest_service.schedule(tenderid)
         
         logger.info(f"Deleted tender attachment {attachment_id}")
         
@@ -1179,10 +1246,16 @@ def delete_vendor_attachment(
                 logger.info(f"Deleted file: {attachment.filepath}")
             except Exception as e:
                 logger.warning(f"Could not delete file {attachment.filepath}: {e}")
+        if attachment.filepath:
+            word_geometry_store.delete(attachment.filepath)
+        embedding_index_service.delete(db, VendorAttachment, attachment)
+        fact_extraction_service.delete(db, VendorAttachment, attachment)
+        vendorid = attachment.vendorid
         
         # Database delete - only the attachment record
         db.delete(attachment)
         db.commit()
+        vendor_corpus_service.schedule(vendorid)
         
         logger.info(f"Deleted vendor attachment {attachment_id}")
         
@@ -1200,6 +1273,477 @@ def delete_vendor_attachment(
         raise HTTPException(status_code=500, detail=f"Error deleting vendor attachment: {str(e)}")
 
 
+# ======================= OCR WORD GEOMETRY =======================
+
+def _get_attachment_words(attachment, page, x0, y0, x1, y1, min_confidence):
+    """Shared lookup for tender/vendor word geometry (read from the .words sidecar, no re-OCR)"""
+    region = None
+    if None not in (x0, y0, x1, y1):
+        region = (x0, y0, x1, y1)
+    elif any(v is not None for v in (x0, y0, x1, y1)):
+        raise HTTPException(status_code=400, detail="Region requires all of x0, y0, x1, y1")
+
+    words = word_geometry_store.get_words(
+        attachment.filepath, page=page, region=region, min_confidence=min_confidence
+    )
+    if words is None:
+        raise HTTPException(status_code=404, detail="No word geometry stored for this attachment")
+
+    return {
+        "success": True,
+        "filename": attachment.filename,
+        "page": page,
+        "region": list(region) if region else None,
+        "total": len(words),
+        "words": words,
+    }
+
+
+@router.get("/uploads/tender/{attachment_id}/words")
+def get_tender_attachment_words(
+    attachment_id: int,
+    page: Optional[int] = Query(None, ge=1),
+    x0: Optional[float] = Query(None, ge=0, le=1),
+    y0: Optional[float] = Query(None, ge=0, le=1),
+    x1: Optional[float] = Query(None, ge=0, le=1),
+    y1: Optional[float] = Query(None, ge=0, le=1),
+    min_confidence: Optional[float] = Query(None, ge=0, le=1),
+    db: Session = Depends(get_db)
+):
+    """Get OCR words (text, relative box, confidence) for a tender attachment page or region"""
+    attachment = db.query(TenderAttachment).filter(TenderAttachment.tenderattachmentsid == attachment_id).first()
+    if not attachment:
+        raise HTTPException(status_code=404, detail="Tender attachment not found")
+    return _get_attachment_words(attachment, page, x0, y0, x1, y1, min_confidence)
+
+
+@router.get("/uploads/vendor/{attachment_id}/words")
+def get_vendor_attachment_words(
+    attachment_id: int,
+    page: Optional[int] = Query(None, ge=1),
+    x0: Optional[float] = Query(None, ge=0, le=1),
+    y0: Optional[float] = Query(None, ge=0, le=1),
+    x1: Optional[float] = Query(None, ge=0, le=1),
+    y1: Optional[float] = Query(None, ge=0, le=1),
+    min_confidence: Optional[float] = Query(None, ge=0, le=1),
+    db: Session = Depends(get_db)
+):
+    """Get OCR words (text, relative box, confidence) for a vendor attachment page or region"""
+    attachment = db.query(VendorAttachment).filter(VendorAttachment.vendorattachmentid == attachment_id).first()
+    if not attachment:
+        raise HTTPException(status_code=404, detail="Vendor attachment not found")
+    return _get_attachment_words(attachment, page, x0, y0, x1, y1, min_confidence)
+
+
+# ======================= EXCEL SHEET ROW PAGING =======================
+
+def _get_attachment_sheet_rows(attachment, sheet_name: str, offset: int, limit: int):
+    """Shared row paging for tender/vendor Excel attachments (reads only the requested sheet)"""
+    if not attachment.filepath or not os.path.exists(attachment.filepath):
+        raise HTTPException(status_code=404, detail="File not found on server")
+    if os.path.splitext(attachment.filepath)[1].lower() not in (".xlsx", ".xls"):
+        raise HTTPException(status_code=400, detail="Attachment is not an Excel workbook")
+
+    try:
+        page = extraction_service.read_sheet_rows(attachment.filepath, sheet_name, offset, limit)
+    except Exception as e:
+        logger.error(f"Error reading sheet '{sheet_name}' of {attachment.filename}: {e}")
+        raise HTTPException(status_code=500, detail=f"Error reading sheet: {str(e)}")
+    if page is None:
+        raise HTTPException(status_code=404, detail=f"Sheet '{sheet_name}' not found")
+
+    total = None
+    for sheet in (attachment.form_data or {}).get("sheets", []):
+        if sheet.get("name") == sheet_name:
+            total = sheet.get("rows")
+            break
+
+    return {"success": True, "filename": attachment.filename, "sheet": sheet_name, "total": total, **page}
+
+
+@router.get("/uploads/tender/{attachment_id}/sheets/{sheet_name}/rows")
+def get_tender_attachment_sheet_rows(
+    attachment_id: int,
+    sheet_name: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """Page through the rows of one sheet of a tender Excel attachment"""
+    attachment = db.query(TenderAttachment).filter(TenderAttachment.tenderattachmentsid == attachment_id).first()
+    if not attachment:
+        raise HTTPException(status_code=404, detail="Tender attachment not found")
+    return _get_attachment_sheet_rows(attachment, sheet_name, offset, limit)
+
+
+@router.get("/uploads/vendor/{attachment_id}/sheets/{sheet_name}/rows")
+def get_vendor_attachment_sheet_rows(
+    attachment_id: int,
+    sheet_name: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """Page through the rows of one sheet of a vendor Excel attachment"""
+    attachment = db.query(VendorAttachment).filter(VendorAttachment.vendorattachmentid == attachment_id).first()
+    if not attachment:
+        raise HTTPException(status_code=404, detail="Vendor attachment not found")
+    return _get_attachment_sheet_rows(attachment, sheet_name, offset, limit)
+
+
+# ======================= SEMANTIC SEARCH =======================
+
+@router.get("/tenders/{tenderid}/search")
+def search_tender_chunks(
+    tenderid: int,
+    q: List[str] = Query(..., min_length=1),
+    k: int = Query(5, ge=1, le=50),
+    scope: str = Query("all", pattern="^(tender|vendor|all)$"),
+    db: Session = Depends(get_db)
+):
+    """Top-k indexed chunks per query across all attachments of a tender (no re-embedding of documents)"""
+    tender = db.query(Tender).filter(Tender.tenderid == tenderid).first()
+    if not tender:
+        raise HTTPException(status_code=404, detail="Tender not found")
+    if not embedding_index_service.available:
+        raise HTTPException(status_code=503, detail="Embedding model is not available")
+    try:
+        results = embedding_index_service.search(db, tenderid, q, k, scope=scope)
+    except Exception as e:
+        logger.error(f"Semantic search failed for tender {tenderid}: {e}")
+        raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
+    return {
+        "success": True,
+        "tenderid": tenderid,
+        "scope": scope,
+        "results": [{"query": query, "hits": hits} for query, hits in zip(q, results)],
+    }
+
+
+# ======================= EVALUATION INPUTS =======================
+
+@router.get("/tenders/{tenderid}/digest")
+def get_tender_digest(tenderid: int, db: Session = Depends(get_db)):
+    """The tender's requirement digest (cleaned text stats and extracted requirement clauses), built if stale"""
+    tender = db.query(Tender).filter(Tender.tenderid == tenderid).first()
+    if not tender:
+        raise HTTPException(status_code=404, detail="Tender not found")
+    digest = tender_digest_service.get_or_build(db, tender)
+    return {"success": True, **tender_digest_service.summary(digest)}
+
+
+@router.get("/vendors/{vendorid}/corpus")
+def get_vendor_corpus(vendorid: int, db: Session = Depends(get_db)):
+    """The vendor's materialized evaluation corpus stats and stripped boilerplate lines, built if stale"""
+    vendor = db.query(Vendor).filter(Vendor.vendorid == vendorid).first()
+    if not vendor:
+        raise HTTPException(status_code=404, detail="Vendor not found")
+    corpus = vendor_corpus_service.get_or_build(db, vendor)
+    return {"success": True, **vendor_corpus_service.summary(corpus)}
+
+
+@router.get("/tenders/{tenderid}/facts")
+def rank_vendors_by_fact(
+    tenderid: int,
+    fact: str = Query(..., description="annual_turnover | net_worth | quoted_price | years_in_business | ..."),
+    minimum: Optional[str] = Query(None, alias="min", description="Lower bound (amount such as '5 crore', or a date)"),
+    maximum: Optional[str] = Query(None, alias="max", description="Upper bound"),
+    aggregate: str = Query("max", pattern="^(max|min)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    currency: Optional[str] = Query(None, description="Currency code amounts are compared in (default FACT_CURRENCY)"),
+    db: Session = Depends(get_db),
+):
+    """Vendors of a tender filtered and sorted by an extracted fact (one value per vendor)"""
+    if fact not in FACTS:
+        raise HTTPException(status_code=400, detail=f"fact must be one of {FACTS}")
+    if not db.query(Tender).filter(Tender.tenderid == tenderid).first():
+        raise HTTPException(status_code=404, detail="Tender not found")
+    vendors = fact_extraction_service.rank_vendors(
+        db, tenderid, fact, minimum, maximum, aggregate, order, limit, currency
+    )
+    return {"success": True, "tenderid": tenderid, "fact": fact, "vendors": vendors}
+
+
+@router.get("/vendors/{vendorid}/facts")
+def get_vendor_facts(vendorid: int, db: Session = Depends(get_db)):
+    """Facts extracted from a vendor's attachments, with the page and text they came from"""
+    if not db.query(Vendor).filter(Vendor.vendorid == vendorid).first():
+        raise HTTPException(status_code=404, detail="Vendor not found")
+    rows = (
+        db.query(AttachmentFact)
+        .filter(AttachmentFact.vendorid == vendorid)
+        .order_by(AttachmentFact.fact, AttachmentFact.confidence.desc())
+        .all()
+    )
+    return {"success": True, "vendorid": vendorid, "facts": [fact_extraction_service.fact_dict(r) for r in rows]}
+
+
+@router.post("/tenders/{tenderid}/facts/extract")
+def extract_tender_facts(tenderid: int, db: Session = Depends(get_db)):
+    """(Re-)extract facts from every attachment of a tender and its vendors, e.g. after the patterns changed"""
+    tender = db.query(Tender).filter(Tender.tenderid == tenderid).first()
+    if not tender:
+        raise HTTPException(status_code=404, detail="Tender not found")
+    counts = {"tender": 0, "vendor": 0}
+    for attachment in tender.attachments:
+        counts["tender"] += fact_extraction_service.extract_attachment(db, TenderAttachment, attachment) or 0
+    for vendor in tender.vendors:
+        for attachment in vendor.attachments:
+            counts["vendor"] += fact_extraction_service.extract_attachment(db, VendorAttachment, attachment) or 0
+    db.commit()
+    return {"success": True, "tenderid": tenderid, "facts": counts}
+
+
+# ======================= ELIGIBILITY RULES =======================
+
+@router.get("/tenders/{tenderid}/eligibility-rules")
+def list_tender_eligibility_rules(tenderid: int, db: Session = Depends(get_db)):
+    """Eligibility rules applying to a tender: its own and its tender type's"""
+    tender = db.query(Tender).filter(Tender.tenderid == tenderid).first()
+    if not tender:
+        raise HTTPException(status_code=404, detail="Tender not found")
+    rules = eligibility_service.rules_for(db, tender, active_only=False)
+    return {"success": True, "tenderid": tenderid, "rules": [eligibility_service.rule_dict(r) for r in rules]}
+
+
+@router.post("/tenders/{tenderid}/eligibility-rules")
+def create_tender_eligibility_rule(tenderid: int, rule: EligibilityRuleCreate, db: Session = Depends(get_db)):
+    """Add a pass/fail eligibility rule to a tender"""
+    if not db.query(Tender).filter(Tender.tenderid == tenderid).first():
+        raise HTTPException(status_code=404, detail="Tender not found")
+    created = eligibility_service.create_rule(db, {**rule.dict(), "tenderid": tenderid})
+    return {"success": True, "rule": eligibility_service.rule_dict(created)}
+
+
+@router.post("/tender-types/{code}/eligibility-rules")
+def create_tender_type_eligibility_rule(code: str, rule: EligibilityRuleCreate, db: Session = Depends(get_db)):
+    """Add a pass/fail eligibility rule to every tender of a tender type"""
+    tender_type = db.query(TenderType).filter(TenderType.code == code).first()
+    if not tender_type:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tender type not found")
+    created = eligibility_service.create_rule(db, {**rule.dict(), "tender_type_id": tender_type.id})
+    return {"success": True, "rule": eligibility_service.rule_dict(created)}
+
+
+@router.put("/eligibility-rules/{rule_id}")
+def update_eligibility_rule(rule_id: int, changes: EligibilityRuleUpdate, db: Session = Depends(get_db)):
+    """Update an eligibility rule"""
+    rule = eligibility_service.update_rule(db, rule_id, changes.dict(exclude_unset=True))
+    if rule is None:
+        raise HTTPException(status_code=404, detail="Eligibility rule not found")
+    return {"success": True, "rule": eligibility_service.rule_dict(rule)}
+
+
+@router.delete("/eligibility-rules/{rule_id}")
+def delete_eligibility_rule(rule_id: int, db: Session = Depends(get_db)):
+    """Delete an eligibility rule"""
+    if not eligibility_service.delete_rule(db, rule_id):
+        raise HTTPException(status_code=404, detail="Eligibility rule not found")
+    return {"success": True, "message": f"Eligibility rule {rule_id} deleted"}
+
+
+@router.get("/tenders/{tenderid}/eligibility")
+def screen_tender_vendors(tenderid: int, db: Session = Depends(get_db)):
+    """Dry run of the eligibility prefilter over a tender's vendors (no LLM, nothing recorded)"""
+    _, vendors_data, _ = load_evaluation_inputs(db, tenderid)
+    screening = eligibility_service.screen(db, tenderid, vendors_data)
+    return {
+        "success": True,
+        "tenderid": tenderid,
+        "eligible_vendors": sum(1 for s in screening if s["eligible"]),
+        "vendors": [
+            {"vendor_id": vendor["id"], "vendor_name": vendor["name"], **screened}
+            for vendor, screened in zip(vendors_data, screening)
+        ],
+    }
+
+
+# ======================= AI EVALUATION STREAM =======================
+
+@router.post("/tenders/{tenderid}/evaluations/stream")
+async def start_evaluation_stream(
+    tenderid: int,
+    request: Request,
+    full: bool = Query(False, description="Re-evaluate every vendor instead of reusing unchanged results"),
+    db: Session = Depends(get_db),
+):
+    """
+    Start an AI evaluation of a tender's vendors; results are delivered over the SSE stream.
+    Vendors whose documents, criteria and model are unchanged since their last LLM evaluation
+    reuse that result unless `full` is set.
+    """
+    prepared = await asyncio.to_thread(evaluation_run_service.prepare, db, tenderid, full)
+    run = evaluation_stream_service.start(prepared)
+    return {
+        "success": True,
+        "run_id": run.run_id,
+        "tenderid": tenderid,
+        "mode": prepared.mode,
+        "total_vendors": run.total_vendors,
+        "reused_vendors": len(prepared.reused),
+        "rejected_vendors": len(prepared.rejected),
+        "stream_url": f"{request.url.path.rsplit(f'/tenders/{tenderid}', 1)[0]}/evaluations/stream/{run.run_id}",
+    }
+
+
+@router.get("/evaluations/stream/{run_id}")
+async def stream_evaluation(
+    run_id: str,
+    request: Request,
+    last_event_id: Optional[int] = Query(None, ge=0),
+):
+    """
+    Server-sent events for an evaluation run: one `result` event per vendor as it finishes
+    (with progress and ETA), then `completed`. Reconnects resume after the Last-Event-ID
+    header (or last_event_id query parameter) instead of replaying the whole run.
+    """
+    run = evaluation_stream_service.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Evaluation run not found or expired")
+    resume_from = last_event_id
+    if resume_from is None:
+        header = request.headers.get("last-event-id", "")
+        resume_from = int(header) if header.isdigit() else 0
+    return StreamingResponse(
+        evaluation_stream_service.subscribe(run, resume_from),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ======================= EVALUATION QUEUE =======================
+
+@router.post("/tenders/{tenderid}/evaluations/jobs")
+def queue_tender_evaluation(
+    tenderid: int,
+    full: bool = Query(False, description="Re-evaluate every vendor instead of reusing unchanged results"),
+    db: Session = Depends(get_db),
+):
+    """
+    Queue an AI evaluation of a tender for the standalone evaluation workers
+    (`python -m app.workers.evaluation_worker`). Progress is available from /evaluations/runs/{run_id}.
+    """
+    prepared = evaluation_queue_service.enqueue(db, tenderid, full)
+    return {
+        "success": True,
+        "run_id": prepared.run_id,
+        "tenderid": tenderid,
+        "mode": prepared.mode,
+        "total_vendors": prepared.total_vendors,
+        "queued_jobs": len(prepared.pending),
+        "reused_vendors": len(prepared.reused),
+        "rejected_vendors": len(prepared.rejected),
+    }
+
+
+@router.get("/evaluations/queue")
+def get_evaluation_queue_stats(db: Session = Depends(get_db)):
+    """Evaluation jobs by status and the workers currently holding leases"""
+    return {"success": True, **evaluation_queue_service.get_stats(db)}
+
+
+# ======================= WHAT-IF RANKING =======================
+
+@router.get("/tenders/{tenderid}/evaluations/runs")
+def list_evaluation_runs(tenderid: int, db: Session = Depends(get_db)):
+    """Evaluation runs of a tender, newest first"""
+    return {"success": True, "tenderid": tenderid, "runs": evaluation_run_service.list_runs(db, tenderid)}
+
+
+@router.get("/evaluations/runs/{run_id}")
+def get_evaluation_run(run_id: str, db: Session = Depends(get_db)):
+    """A persisted evaluation run with its vendor results, best first"""
+    run = evaluation_run_service.get_run(db, run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Evaluation run not found")
+    return {"success": True, "run": run}
+
+
+@router.post("/tenders/{tenderid}/evaluations/what-if")
+def what_if_ranking(tenderid: int, payload: WhatIfRequest):
+    """
+    Re-rank a stored evaluation run under alternative criterion weights. All scenarios are
+    one matrix product against the stored scores; no LLM calls.
+    """
+    matrix = score_matrix_service.load(tenderid, payload.run_id)
+    if matrix is None:
+        raise HTTPException(status_code=404, detail="No stored evaluation run for this tender")
+
+    weights = [matrix.weights] + [matrix.weight_vector(s.weights) for s in payload.scenarios]
+    totals = matrix.totals(weights)
+    baseline = matrix.ranking(totals[:, 0])
+    baseline_rank = {entry["vendor_id"]: entry["rank"] for entry in baseline}
+
+    scenarios = []
+    for index, scenario in enumerate(payload.scenarios, start=1):
+        ranking = matrix.ranking(totals[:, index])
+        for entry in ranking:
+            entry["rank_change"] = baseline_rank[entry["vendor_id"]] - entry["rank"]
+        scenarios.append({
+            "name": scenario.name or f"Scenario {index}",
+            "weights": dict(zip(matrix.criterion_names, (float(w) for w in weights[index]))),
+            "ranking": ranking,
+        })
+    return {
+        "success": True,
+        **matrix.summary(),
+        "baseline": baseline,
+        "scenarios": scenarios,
+    }
+
+
+@router.post("/tenders/{tenderid}/evaluations/robustness")
+def ranking_robustness(tenderid: int, payload: RobustnessRequest):
+    """
+    Monte Carlo check of how stable a stored run's ranking is: samples perturbed weight
+    vectors around the configured weightage and returns rank frequencies per vendor
+    (probability of L1 / top 3, mean rank, 5th-95th percentile rank).
+    """
+    matrix = score_matrix_service.load(tenderid, payload.run_id)
+    if matrix is None:
+        raise HTTPException(status_code=404, detail="No stored evaluation run for this tender")
+    analysis = matrix.robustness(
+        samples=payload.samples,
+        spread=payload.spread,
+        distribution=payload.distribution,
+        seed=payload.seed,
+    )
+    return {"success": True, **matrix.summary(), **analysis}
+
+
+# ======================= AI MODEL =======================
+
+@router.get("/ai/health")
+def get_ai_health():
+    """LLM readiness: load state, load duration, memory use and model source"""
+    status_info = ai_evaluation_service.get_status()
+    return {"success": True, **status_info}
+
+
+@router.post("/ai/model/load")
+def load_ai_model():
+    """Start (or retry) loading the LLM in the background; returns immediately"""
+    if ai_evaluation_service.load_state == "disabled":
+        raise HTTPException(status_code=400, detail="LLM loading is disabled (LLM_LOAD_MODE=disabled)")
+    ai_evaluation_service.reset()
+    ai_evaluation_service.start_background_load()
+    return {"success": True, **ai_evaluation_service.get_status()}
+
+
+@router.get("/ai/evaluation-cache")
+def get_evaluation_cache_stats():
+    """Hit/miss counts and size of the per-vendor evaluation result cache"""
+    return {"success": True, **evaluation_cache.get_stats()}
+
+
+@router.delete("/ai/evaluation-cache")
+def clear_evaluation_cache():
+    """Drop all cached evaluation results (e.g. after changing the model outside of config)"""
+    removed = evaluation_cache.clear()
+    return {"success": True, "removed": removed}
+
+
 # ======================= DASHBOARD ENDPOINTS =======================
 
 @router.get("/dashboard/stats")
@@ -1215,8 +1759,8 @@ def get_dashboard_stats(db: Session = Depends(get_db)):
         # Count users
         total_users = db.query(User).count()
         
-        # Static evaluations count until real implementation
-        total_evaluations = 0  # Static value as requested
+        # Count completed AI evaluation runs
+        total_evaluations = db.query(EvaluationRun).filter(EvaluationRun.status == "completed").count()
         
         return {
             "success": True,
@@ -1224,7 +1768,7 @@ def get_dashboard_stats(db: Session = Depends(get_db)):
                 "tenders": total_tenders,
                 "vendors": total_vendors,
                 "users": total_users,
-                "evaluations": total_evaluations  # This will now always be 6
+                "evaluations": total_evaluations
             }
         }
     except Exception as e:
@@ -1269,12 +1813,12 @@ def get_monthly_evaluations(db: Session = Depends(get_db)):
             func.extract('year', Tender.createddate) == current_year
         ).group_by('month').order_by('month').all()
         
-        # Monthly evaluation counts (using attachments as proxy)
+        # Monthly evaluation run counts
         monthly_evaluations = db.query(
-            func.date_trunc('month', TenderAttachment.createddate).label('month'),
-            func.count(TenderAttachment.tenderattachmentsid).label('evaluation_count')
+            func.date_trunc('month', EvaluationRun.createddate).label('month'),
+            func.count(EvaluationRun.id).label('evaluation_count')
         ).filter(
-            func.extract('year', TenderAttachment.createddate) == current_year
+            func.extract('year', EvaluationRun.createddate) == current_year
         ).group_by('month').order_by('month').all()
         
         # Combine data
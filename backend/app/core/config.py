@@ -18,4 +18,108 @@ class Settings:
         self.JWT_ALGORITHM: str = "HS256"
         self.ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
 
+        # Progressive extraction: pages OCR'd before the upload returns, and the
+        # page chunk size / worker count used to finish the rest in the background
+        self.PROGRESSIVE_PREVIEW_PAGES: int = int(os.getenv("PROGRESSIVE_PREVIEW_PAGES", "2"))
+        self.PROGRESSIVE_CHUNK_PAGES: int = int(os.getenv("PROGRESSIVE_CHUNK_PAGES", "8"))
+        self.PROGRESSIVE_EXTRACTION_WORKERS: int = int(os.getenv("PROGRESSIVE_EXTRACTION_WORKERS", "1"))
+
+        # Two-pass PDF OCR: cheap low-DPI pass for every page, high-DPI re-OCR only
+        # for pages whose mean word confidence falls below the threshold
+        self.OCR_TWO_PASS: bool = os.getenv("OCR_TWO_PASS", "true").lower() == "true"
+        self.OCR_LOW_DPI: int = int(os.getenv("OCR_LOW_DPI", "100"))
+        self.OCR_HIGH_DPI: int = int(os.getenv("OCR_HIGH_DPI", "220"))
+        self.OCR_CONFIDENCE_THRESHOLD: float = float(os.getenv("OCR_CONFIDENCE_THRESHOLD", "0.8"))
+
+        # Excel rows stored inline per sheet in form_data; the rest are paged from the file
+        self.EXCEL_INLINE_ROWS: int = int(os.getenv("EXCEL_INLINE_ROWS", "200"))
+
+        # LLM used for AI evaluation. LLM_MODEL_PATH points at a local model directory
+        # (loaded without hub access). LLM_LOAD_MODE: lazy | background | disabled
+        self.LLM_MODEL_NAME: str = os.getenv("LLM_MODEL_NAME", "mistralai/Mistral-7B-Instruct-v0.1")
+        self.LLM_MODEL_PATH: str = os.getenv("LLM_MODEL_PATH", "")
+        self.LLM_LOAD_MODE: str = os.getenv("LLM_LOAD_MODE", "lazy").lower()
+        # LLM_BACKEND: auto | transformers_gpu | transformers_cpu | stub (see app.services.llm_backends)
+        self.LLM_BACKEND: str = os.getenv("LLM_BACKEND", "auto").lower()
+        self.LLM_STUB_LATENCY_MS: int = int(os.getenv("LLM_STUB_LATENCY_MS", "0"))
+        # Batched generation: prompts arriving within LLM_BATCH_WAIT_MS are grouped by
+        # token length into batches of at most LLM_BATCH_SIZE
+        self.LLM_BATCH_SIZE: int = int(os.getenv("LLM_BATCH_SIZE", "8"))
+        self.LLM_BATCH_WAIT_MS: int = int(os.getenv("LLM_BATCH_WAIT_MS", "50"))
+        # Prefilled tender-prefix KV caches kept per loaded model (LRU)
+        self.LLM_PREFIX_CACHE_SIZE: int = int(os.getenv("LLM_PREFIX_CACHE_SIZE", "4"))
+        # Prompt token budget (capped by the model context minus generated tokens) and the
+        # shares offered to tender and criteria; the vendor section gets the remainder
+        self.LLM_CONTEXT_BUDGET: int = int(os.getenv("LLM_CONTEXT_BUDGET", "6000"))
+        self.LLM_CONTEXT_TENDER_SHARE: float = float(os.getenv("LLM_CONTEXT_TENDER_SHARE", "0.35"))
+        self.LLM_CONTEXT_CRITERIA_SHARE: float = float(os.getenv("LLM_CONTEXT_CRITERIA_SHARE", "0.1"))
+        # Evaluation JSON is decoded under a schema built from the criteria keys and stops when
+        # the object closes; the generation budget covers the template and each capped reasoning
+        self.LLM_CONSTRAINED_DECODING: bool = os.getenv("LLM_CONSTRAINED_DECODING", "true").lower() == "true"
+        self.LLM_REASONING_MAX_CHARS: int = int(os.getenv("LLM_REASONING_MAX_CHARS", "240"))
+        self.LLM_MAX_NEW_TOKENS: int = int(os.getenv("LLM_MAX_NEW_TOKENS", "2048"))
+        # EVALUATION_MODE: retrieval (top-k chunks per criterion) | digest (map-reduce: every
+        # vendor document section is summarised once into a cached digest and the vendor is
+        # evaluated on the digests, reduced further while they exceed the vendor token budget)
+        self.EVALUATION_MODE: str = os.getenv("EVALUATION_MODE", "retrieval").lower()
+        self.DIGEST_CHUNK_CHARS: int = int(os.getenv("DIGEST_CHUNK_CHARS", "4000"))
+        self.DIGEST_MAX_NEW_TOKENS: int = int(os.getenv("DIGEST_MAX_NEW_TOKENS", "200"))
+        self.DIGEST_MAX_LEVELS: int = int(os.getenv("DIGEST_MAX_LEVELS", "3"))
+        # Per-tender digest (cleaned text + extracted requirement/eligibility clauses), built
+        # once per tender; with TENDER_REQUIREMENTS_IN_PROMPT the requirement list is the tender
+        # section of every vendor's prompt instead of per-vendor retrieval
+        self.TENDER_REQUIREMENTS_IN_PROMPT: bool = os.getenv("TENDER_REQUIREMENTS_IN_PROMPT", "true").lower() == "true"
+        self.TENDER_DIGEST_MAX_REQUIREMENTS: int = int(os.getenv("TENDER_DIGEST_MAX_REQUIREMENTS", "150"))
+        # Per-vendor corpus: a line (digits ignored) among the first/last BOILERPLATE_EDGE_LINES of a
+        # page, found on at least BOILERPLATE_MIN_PAGES pages and on at least BOILERPLATE_PAGE_RATIO
+        # of the pages of the documents it occurs in, is a header/footer/stamp and is stripped;
+        # longer lines are always kept
+        self.VENDOR_CORPUS_BOILERPLATE_EDGE_LINES: int = int(os.getenv("VENDOR_CORPUS_BOILERPLATE_EDGE_LINES", "3"))
+        self.VENDOR_CORPUS_BOILERPLATE_MIN_PAGES: int = int(os.getenv("VENDOR_CORPUS_BOILERPLATE_MIN_PAGES", "3"))
+        self.VENDOR_CORPUS_BOILERPLATE_PAGE_RATIO: float = float(os.getenv("VENDOR_CORPUS_BOILERPLATE_PAGE_RATIO", "0.5"))
+        self.VENDOR_CORPUS_BOILERPLATE_MAX_CHARS: int = int(os.getenv("VENDOR_CORPUS_BOILERPLATE_MAX_CHARS", "200"))
+        # Eligibility prefilter: vendors failing a tender's (or tender type's) rules skip the LLM
+        self.ELIGIBILITY_PREFILTER: bool = os.getenv("ELIGIBILITY_PREFILTER", "true").lower() == "true"
+        self.ELIGIBILITY_MAX_MATCHES: int = int(os.getenv("ELIGIBILITY_MAX_MATCHES", "20"))
+        self.ELIGIBILITY_DATES_DAYFIRST: bool = os.getenv("ELIGIBILITY_DATES_DAYFIRST", "true").lower() == "true"
+        # Typed fact extraction: only values at or above this confidence are stored
+        self.FACT_MIN_CONFIDENCE: float = float(os.getenv("FACT_MIN_CONFIDENCE", "0.6"))
+        self.FACT_MAX_PER_ATTACHMENT: int = int(os.getenv("FACT_MAX_PER_ATTACHMENT", "10"))  # per fact
+        self.FACT_CURRENCY: str = os.getenv("FACT_CURRENCY", "INR").upper()  # amounts are compared in this currency
+
+        # Ingestion-time text chunking and embedding retrieval of the top-k chunks per criterion
+        self.CHUNK_CHARS: int = int(os.getenv("CHUNK_CHARS", "1000"))
+        self.CHUNK_OVERLAP_CHARS: int = int(os.getenv("CHUNK_OVERLAP_CHARS", "150"))
+        self.RETRIEVAL_ENABLED: bool = os.getenv("RETRIEVAL_ENABLED", "true").lower() == "true"
+        self.RETRIEVAL_TOP_K: int = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+        # Passage size for the lexical (BM25) fallback scorer used when the LLM is unavailable
+        self.LEXICAL_PASSAGE_CHARS: int = int(os.getenv("LEXICAL_PASSAGE_CHARS", "600"))
+        self.EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+        self.EMBEDDING_DEVICE: str = os.getenv("EMBEDDING_DEVICE", "")
+        self.EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+        self.EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "50000"))
+        # Persistent per-attachment vectors: float16 | int8 (per-row scale)
+        self.EMBEDDING_STORE_DTYPE: str = os.getenv("EMBEDDING_STORE_DTYPE", "float16").lower()
+        # Stored chunk vectors of the materialized vendor corpora (same format as the attachment sidecars)
+        self.VENDOR_CORPUS_VECTOR_DIR: str = os.getenv("VENDOR_CORPUS_VECTOR_DIR", os.path.join(os.getenv("UPLOAD_DIR", "uploads"), "vendor_corpora"))
+
+        # Per-vendor evaluation result cache (in-process LRU backed by JSON files)
+        self.EVALUATION_CACHE_ENABLED: bool = os.getenv("EVALUATION_CACHE_ENABLED", "true").lower() == "true"
+        self.EVALUATION_CACHE_DIR: str = os.getenv("EVALUATION_CACHE_DIR", os.path.join(os.getenv("UPLOAD_DIR", "uploads"), "evaluation_cache"))
+        self.EVALUATION_CACHE_SIZE: int = int(os.getenv("EVALUATION_CACHE_SIZE", "1000"))
+
+        # Server-sent event streams of batch evaluations; finished runs stay replayable this long
+        self.EVALUATION_STREAM_TTL_SECONDS: int = int(os.getenv("EVALUATION_STREAM_TTL_SECONDS", "3600"))
+        # Stored vendor x criterion score matrices per evaluation run (what-if re-ranking)
+        self.EVALUATION_MATRIX_DIR: str = os.getenv("EVALUATION_MATRIX_DIR", os.path.join(os.getenv("UPLOAD_DIR", "uploads"), "evaluation_matrices"))
+
+        # Queued evaluation jobs run by `python -m app.workers.evaluation_worker` processes:
+        # jobs claimed per poll, lease length (renewed by heartbeats), attempts and retry backoff
+        self.EVALUATION_WORKER_BATCH: int = int(os.getenv("EVALUATION_WORKER_BATCH", "8"))
+        self.EVALUATION_WORKER_POLL_SECONDS: float = float(os.getenv("EVALUATION_WORKER_POLL_SECONDS", "2"))
+        self.EVALUATION_JOB_LEASE_SECONDS: int = int(os.getenv("EVALUATION_JOB_LEASE_SECONDS", "120"))
+        self.EVALUATION_JOB_HEARTBEAT_SECONDS: int = int(os.getenv("EVALUATION_JOB_HEARTBEAT_SECONDS", "30"))
+        self.EVALUATION_JOB_MAX_ATTEMPTS: int = int(os.getenv("EVALUATION_JOB_MAX_ATTEMPTS", "3"))
+        self.EVALUATION_JOB_RETRY_SECONDS: int = int(os.getenv("EVALUATION_JOB_RETRY_SECONDS", "30"))
+
 settings = Settings()
@@ -5,9 +5,16 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.db.database import Base, engine
 from app.api.v1 import routes_auth
+from app.core.config import settings
+from app.services.ai_evaluation_service import ai_evaluation_service
+from app.services.progressive_extraction_service import progressive_extraction_service
 # create_tables.py
 from app.models.user import TenderType  # Import models to trigger table creation (keeps metadata available)
-from app.models.upload_models import Tender, Vendor, TenderAttachment, VendorAttachment  # Import attachment models
+from app.models.upload_models import (  # Import attachment and evaluation models
+    Tender, Vendor, TenderAttachment, VendorAttachment, AttachmentChunk,
+    TenderEvaluation, EvaluationRun, VendorEvaluation, CriterionScore, EvaluationJob,
+    ChunkDigest, TenderDigest, VendorCorpus, EligibilityRule, AttachmentFact,
+)
 from sqlalchemy import text
 
 
@@ -191,6 +198,22 @@ with engine.begin() as conn:
         """
     ))
 
+    # Add rejected_vendors column to evaluation_runs if missing (eligibility prefilter)
+    conn.execute(text(
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name='evaluation_runs' AND column_name='rejected_vendors'
+            ) THEN
+                ALTER TABLE evaluation_runs ADD COLUMN rejected_vendors INTEGER NOT NULL DEFAULT 0;
+            END IF;
+        END;
+        $$;
+        """
+    ))
+
 
 # Create attachment tables if they don't exist
 with engine.begin() as conn:
@@ -281,6 +304,19 @@ app.include_router(routes_auth.router, prefix="/api/v1/auth", tags=["Auth"])
 # Also register same router at /api/v1 for upload endpoints (upload/tender, upload/vendors)
 app.include_router(routes_auth.router, prefix="/api/v1", tags=["API"])
 
+@app.on_event("startup")
+def warm_up_llm():
+    """Start loading the evaluation LLM in the background (LLM_LOAD_MODE=background)"""
+    if settings.LLM_LOAD_MODE == "background":
+        ai_evaluation_service.start_background_load()
+
+
+@app.on_event("startup")
+def resume_progressive_extraction():
+    """Continue progressive extractions a previous process left partial"""
+    progressive_extraction_service.resume_pending()
+
+
 @app.get("/")
 def root():
     return {"message": "Backend running 🚀"}
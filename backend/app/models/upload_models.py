@@ -1,5 +1,5 @@
 # app/models/upload_models.py
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Boolean, Column, Date, Integer, String, Text, DateTime, Float, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
@@ -19,6 +19,7 @@ class Tender(Base):
     filepath = Column(Text, nullable=True)
     filename = Column(String(255), nullable=True)
     form_data = Column(JSON, nullable=True, default={})  # Extracted document data as JSON
+    tender_type_id = Column(Integer, ForeignKey("tender_types.id"), nullable=True, index=True)
 
     # relationships
     vendors = relationship("Vendor", back_populates="tender", cascade="all, delete-orphan")
@@ -80,3 +81,284 @@ class VendorAttachment(Base):
     vendor = relationship("Vendor", back_populates="attachments")
 
     __table_args__ = {"extend_existing": True}
+
+
+class AttachmentChunk(Base):
+    """
+    Retrieval chunk of an attachment's extracted text. The chunk's embedding is row
+    `chunk_index` of the attachment's memory-mapped vector file (see embedding_index_service).
+    """
+    __tablename__ = "attachment_chunks"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    attachment_type = Column(String(20), nullable=False)  # "tender" | "vendor"
+    attachment_id = Column(Integer, nullable=False)
+    tenderid = Column(Integer, ForeignKey("tenders.tenderid", ondelete="CASCADE"), nullable=False, index=True)
+    vendorid = Column(Integer, ForeignKey("vendors.vendorid", ondelete="CASCADE"), nullable=True, index=True)
+    chunk_index = Column(Integer, nullable=False)
+    start_char = Column(Integer, nullable=False)
+    end_char = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)
+    embedding_model = Column(String(255), nullable=False)
+    createddate = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("idx_attachment_chunks_attachment", "attachment_type", "attachment_id", "chunk_index"),
+        {"extend_existing": True},
+    )
+
+
+class TenderEvaluation(Base):
+    """Manual score of one vendor on one criterion, entered by an evaluator"""
+    __tablename__ = "tender_evaluations"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    tender_id = Column(Integer, ForeignKey("tenders.tenderid", ondelete="CASCADE"), nullable=False, index=True)
+    vendor_id = Column(Integer, ForeignKey("vendors.vendorid", ondelete="CASCADE"), nullable=False, index=True)
+    criterion_id = Column(Integer, ForeignKey("evaluation_criteria.id", ondelete="CASCADE"), nullable=False)
+    score = Column(Float, nullable=False)
+    comments = Column(Text, nullable=True)
+    evaluated_by = Column(Integer, nullable=True)
+    evaluated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    criterion = relationship("EvaluationCriterion")
+
+    __table_args__ = (
+        Index("idx_tender_evaluations_unique", "tender_id", "vendor_id", "criterion_id", unique=True),
+        {"extend_existing": True},
+    )
+
+
+class EvaluationRun(Base):
+    """One AI evaluation of a tender's vendors (full or incremental)"""
+    __tablename__ = "evaluation_runs"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    run_id = Column(String(36), nullable=False, unique=True, index=True)
+    tenderid = Column(Integer, ForeignKey("tenders.tenderid", ondelete="CASCADE"), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default="running")  # queued | running | completed | failed
+    mode = Column(String(20), nullable=False, default="incremental")  # full | incremental
+    criteria_fingerprint = Column(String(64), nullable=False)
+    model_fingerprint = Column(Text, nullable=False)
+    total_vendors = Column(Integer, nullable=False, default=0)
+    evaluated_vendors = Column(Integer, nullable=False, default=0)
+    reused_vendors = Column(Integer, nullable=False, default=0)
+    failed_vendors = Column(Integer, nullable=False, default=0)
+    rejected_vendors = Column(Integer, nullable=False, default=0)  # failed the eligibility prefilter, no LLM pass
+    createddate = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    completeddate = Column(DateTime(timezone=True), nullable=True)
+
+    vendor_evaluations = relationship("VendorEvaluation", back_populates="run", cascade="all, delete-orphan")
+
+    __table_args__ = {"extend_existing": True}
+
+
+class VendorEvaluation(Base):
+    """
+    A vendor's result within an evaluation run. input_fingerprint covers the tender and vendor
+    extracted texts, criteria and model; a later run reuses the row (reused_from) while it matches.
+    """
+    __tablename__ = "vendor_evaluations"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    evaluation_run_id = Column(Integer, ForeignKey("evaluation_runs.id", ondelete="CASCADE"), nullable=False, index=True)
+    tenderid = Column(Integer, ForeignKey("tenders.tenderid", ondelete="CASCADE"), nullable=False)
+    vendorid = Column(Integer, ForeignKey("vendors.vendorid", ondelete="CASCADE"), nullable=False)
+    input_fingerprint = Column(String(64), nullable=False, index=True)
+    overall_score = Column(Float, nullable=False)
+    rating = Column(String(20), nullable=True)
+    qualification_status = Column(String(20), nullable=True)
+    scoring_method = Column(String(30), nullable=True)
+    result = Column(JSON, nullable=False, default={})
+    reused_from = Column(Integer, ForeignKey("vendor_evaluations.id", ondelete="SET NULL"), nullable=True)
+    createddate = Column(DateTime(timezone=True), server_default=func.now())
+
+    run = relationship("EvaluationRun", back_populates="vendor_evaluations")
+    criterion_scores = relationship("CriterionScore", back_populates="vendor_evaluation", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index("idx_vendor_evaluations_tender_vendor", "tenderid", "vendorid", "id"),
+        {"extend_existing": True},
+    )
+
+
+class CriterionScore(Base):
+    """Score of one criterion within a vendor evaluation"""
+    __tablename__ = "criterion_scores"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    vendor_evaluation_id = Column(Integer, ForeignKey("vendor_evaluations.id", ondelete="CASCADE"), nullable=False, index=True)
+    criterion_id = Column(Integer, ForeignKey("evaluation_criteria.id", ondelete="SET NULL"), nullable=True, index=True)
+    criterion_name = Column(String(255), nullable=False)
+    score = Column(Float, nullable=False)
+    weightage = Column(Float, nullable=False, default=0)
+    reasoning = Column(Text, nullable=True)
+
+    vendor_evaluation = relationship("VendorEvaluation", back_populates="criterion_scores")
+
+    __table_args__ = {"extend_existing": True}
+
+
+class EvaluationJob(Base):
+    """
+    Queued evaluation of one vendor within a run, claimed by worker processes with
+    SELECT ... FOR UPDATE SKIP LOCKED. A running job whose lease expires (its worker stopped
+    heartbeating) is claimed again until max_attempts is reached.
+    """
+    __tablename__ = "evaluation_jobs"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    evaluation_run_id = Column(Integer, ForeignKey("evaluation_runs.id", ondelete="CASCADE"), nullable=False, index=True)
+    tenderid = Column(Integer, ForeignKey("tenders.tenderid", ondelete="CASCADE"), nullable=False)
+    vendorid = Column(Integer, ForeignKey("vendors.vendorid", ondelete="CASCADE"), nullable=False)
+    criteria = Column(JSON, nullable=False, default=[])  # criteria snapshot taken when the run was queued
+    status = Column(String(20), nullable=False, default="queued")  # queued | running | completed | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    available_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    worker_id = Column(String(100), nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    createddate = Column(DateTime(timezone=True), server_default=func.now())
+    completeddate = Column(DateTime(timezone=True), nullable=True)
+
+    run = relationship("EvaluationRun")
+
+    __table_args__ = (
+        Index("idx_evaluation_jobs_claim", "status", "available_at", "id"),
+        {"extend_existing": True},
+    )
+
+
+class ChunkDigest(Base):
+    """
+    LLM digest of one document section (or, at reduce levels > 0, of a group of digests),
+    cached by the section's text hash and the digest configuration. Criteria are not part of
+    the key, so re-evaluations and criteria changes reuse every digest.
+    """
+    __tablename__ = "chunk_digests"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    chunk_hash = Column(String(64), nullable=False)
+    digest_config = Column(String(64), nullable=False)
+    level = Column(Integer, nullable=False, default=0)
+    digest = Column(Text, nullable=False)
+    source_chars = Column(Integer, nullable=False, default=0)
+    digest_chars = Column(Integer, nullable=False, default=0)
+    createddate = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("idx_chunk_digests_key", "chunk_hash", "digest_config", unique=True),
+        {"extend_existing": True},
+    )
+
+
+class TenderDigest(Base):
+    """
+    Per-tender evaluation artifact: the cleaned tender text, the requirement and eligibility
+    clauses extracted from it, and token counts. fingerprint is the tender's documents
+    fingerprint; a digest whose fingerprint or version no longer matches is rebuilt.
+    """
+    __tablename__ = "tender_digests"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    tenderid = Column(Integer, ForeignKey("tenders.tenderid", ondelete="CASCADE"), nullable=False, unique=True, index=True)
+    fingerprint = Column(String(64), nullable=False)
+    version = Column(String(10), nullable=False)
+    cleaned_text = Column(Text, nullable=False, default="")
+    requirements = Column(JSON, nullable=False, default=[])  # [{text, kind, document}]
+    char_count = Column(Integer, nullable=False, default=0)
+    token_count = Column(Integer, nullable=False, default=0)
+    requirements_token_count = Column(Integer, nullable=False, default=0)
+    token_counter = Column(String(50), nullable=True)  # backend whose tokenizer counted, or "estimate"
+    createddate = Column(DateTime(timezone=True), server_default=func.now())
+    updateddate = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = {"extend_existing": True}
+
+
+class VendorCorpus(Base):
+    """
+    Materialized evaluation text of one vendor: all successfully extracted attachments,
+    boilerplate lines (page headers, footers, stamps) removed and cleaned, as one blob.
+    fingerprint is the vendor's documents fingerprint; a corpus whose fingerprint or
+    version no longer matches is rebuilt.
+    """
+    __tablename__ = "vendor_corpora"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    vendorid = Column(Integer, ForeignKey("vendors.vendorid", ondelete="CASCADE"), nullable=False, unique=True, index=True)
+    fingerprint = Column(String(64), nullable=False)
+    version = Column(String(10), nullable=False)
+    text = Column(Text, nullable=False, default="")
+    documents = Column(JSON, nullable=False, default=[])  # [{name, pages, chars, stripped_lines}]
+    boilerplate = Column(JSON, nullable=False, default=[])  # [{line, pages}] most repeated first
+    raw_char_count = Column(Integer, nullable=False, default=0)
+    char_count = Column(Integer, nullable=False, default=0)
+    token_count = Column(Integer, nullable=False, default=0)
+    token_counter = Column(String(50), nullable=True)  # backend whose tokenizer counted, or "estimate"
+    createddate = Column(DateTime(timezone=True), server_default=func.now())
+    updateddate = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = {"extend_existing": True}
+
+
+class EligibilityRule(Base):
+    """
+    Hard pass/fail condition checked before LLM scoring, scoped to a tender or a tender type.
+    kind regex: `pattern` must / must not occur; kind number|date: values located by `pattern`
+    (first group) in the vendor text, or read from form data `field`, compared with `value`.
+    """
+    __tablename__ = "eligibility_rules"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    tenderid = Column(Integer, ForeignKey("tenders.tenderid", ondelete="CASCADE"), nullable=True, index=True)
+    tender_type_id = Column(Integer, ForeignKey("tender_types.id", ondelete="CASCADE"), nullable=True, index=True)
+    name = Column(String(255), nullable=False)
+    description = Column(Text, nullable=True)
+    source = Column(String(20), nullable=False, default="text")  # text | field | fact
+    field = Column(String(255), nullable=True)  # dotted path into the vendor's form data, or a fact name
+    kind = Column(String(20), nullable=False)  # regex | number | date
+    pattern = Column(Text, nullable=True)
+    operator = Column(String(20), nullable=False)  # matches | not_matches | >= | > | <= | < | == | between
+    value = Column(JSON, nullable=True)  # number / date string, or [low, high] for between
+    on_missing = Column(String(10), nullable=False, default="pass")  # pass | fail when no value is found
+    is_active = Column(Boolean, nullable=False, default=True)
+    createddate = Column(DateTime(timezone=True), server_default=func.now())
+    updateddate = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = {"extend_existing": True}
+
+
+class AttachmentFact(Base):
+    """
+    Typed fact extracted from an attachment's text (turnover, years in business, quoted price,
+    delivery time, dates) with the page it was found on. Numbers and dates live in indexed
+    columns so vendors can be filtered and sorted by them in SQL.
+    """
+    __tablename__ = "attachment_facts"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    attachment_type = Column(String(20), nullable=False)  # "tender" | "vendor"
+    attachment_id = Column(Integer, nullable=False)
+    tenderid = Column(Integer, ForeignKey("tenders.tenderid", ondelete="CASCADE"), nullable=False, index=True)
+    vendorid = Column(Integer, ForeignKey("vendors.vendorid", ondelete="CASCADE"), nullable=True, index=True)
+    fact = Column(String(50), nullable=False)  # annual_turnover | net_worth | quoted_price | years_in_business | ...
+    value_number = Column(Float, nullable=True)
+    value_date = Column(Date, nullable=True)
+    unit = Column(String(20), nullable=True)  # currency code, "years", "weeks"
+    raw_text = Column(String(500), nullable=False)
+    page = Column(Integer, nullable=True)
+    start_char = Column(Integer, nullable=False)
+    confidence = Column(Float, nullable=False)
+    extractor_version = Column(String(10), nullable=False)
+    createddate = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("idx_attachment_facts_attachment", "attachment_type", "attachment_id"),
+        Index("idx_attachment_facts_number", "tenderid", "fact", "value_number"),
+        Index("idx_attachment_facts_date", "tenderid", "fact", "value_date"),
+        Index("idx_attachment_facts_vendor", "vendorid", "fact"),
+        {"extend_existing": True},
+    )
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, Field, validator
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
@@ -91,4 +91,48 @@ class EvaluationSummaryResponse(BaseModel):
 class AIEvaluationRequest(BaseModel):
     tender_id: int
     vendor_id: int
-    criteria: List[Dict[str, Any]]
\ No newline at end of file
+    criteria: List[Dict[str, Any]]
+
+
+class WhatIfScenario(BaseModel):
+    name: Optional[str] = None
+    weights: Dict[str, float]  # criterion id or name -> weightage; others keep the configured value
+
+
+class WhatIfRequest(BaseModel):
+    run_id: Optional[str] = None  # defaults to the tender's latest evaluation run
+    scenarios: List[WhatIfScenario]
+
+
+class RobustnessRequest(BaseModel):
+    run_id: Optional[str] = None  # defaults to the tender's latest evaluation run
+    samples: int = Field(10000, ge=100, le=100000)
+    spread: float = Field(0.2, gt=0, le=2)
+    distribution: str = Field("dirichlet", pattern="^(dirichlet|lognormal)$")
+    seed: Optional[int] = None
+
+
+class EligibilityRuleCreate(BaseModel):
+    name: str
+    description: Optional[str] = None
+    source: str = Field("text", pattern="^(text|field|fact)$")
+    field: Optional[str] = None  # dotted path into the vendor's form data (source "field") or fact name (source "fact")
+    kind: str = Field(..., pattern="^(regex|number|date)$")
+    pattern: Optional[str] = None
+    operator: str = Field(..., pattern="^(matches|not_matches|>=|>|<=|<|==|between)$")
+    value: Optional[Any] = None  # number / date string ("today"), or [low, high] for between
+    on_missing: str = Field("pass", pattern="^(pass|fail)$")
+    is_active: bool = True
+
+
+class EligibilityRuleUpdate(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    source: Optional[str] = Field(None, pattern="^(text|field|fact)$")
+    field: Optional[str] = None
+    kind: Optional[str] = Field(None, pattern="^(regex|number|date)$")
+    pattern: Optional[str] = None
+    operator: Optional[str] = Field(None, pattern="^(matches|not_matches|>=|>|<=|<|==|between)$")
+    value: Optional[Any] = None
+    on_missing: Optional[str] = Field(None, pattern="^(pass|fail)$")
+    is_active: Optional[bool] = None
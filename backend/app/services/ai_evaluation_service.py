@@ -1,68 +1,175 @@
 # services/ai_evaluation_service.py
 
 import os
+import sys
 import json
 import re
+import time
 import logging
-from typing import Dict, List, Any, Optional
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline, BitsAndBytesConfig
-import torch
+import threading
+from typing import Dict, List, Any, AsyncIterator, Optional, Tuple
 import asyncio
 from datetime import datetime
 import uuid
 
+from app.core.config import settings
+from app.services.context_packer import ContextPacker, PrefixPlan
+from app.services.digest_service import digest_service
+from app.services.eligibility_service import RuleSet, rejection_result
+from app.services.embedding_service import ChunkSet, chunk_text, embedding_service
+from app.services.evaluation_cache import evaluation_cache
+from app.services.inference_executor import InferenceExecutor
+from app.services.json_constraints import token_budget
+from app.services.lexical_scoring_service import lexical_scoring_service
+from app.services.score_matrix_service import score_matrix_service
+from app.services.llm_backends import LLMBackend, create_backend, resolve_backend_name
+
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class AIEvaluationService:
+    """
+    LLM-backed vendor evaluation.
+
+    The model is not loaded at import time: it is loaded lazily on the first
+    evaluation (LLM_LOAD_MODE=lazy) or warmed in a background thread after
+    startup (LLM_LOAD_MODE=background). get_status() reports the load state.
+    Generation goes through the backend selected by LLM_BACKEND, via a shared
+    InferenceExecutor that batches prompts from concurrent evaluations.
+    """
+
+    # Bump whenever the prompt or score post-processing changes so cached results are not reused
+    PROMPT_VERSION = "6"
+
     def __init__(self):
-        self.model = None
+        self.backend: Optional[LLMBackend] = None
+        self.context_packer: Optional[ContextPacker] = None
         self.tokenizer = None
-        self.pipeline = None
-        self.model_loaded = False
-        self._load_model()
-    
+        self.load_state = "not_loaded"  # not_loaded | loading | ready | failed | disabled
+        self.load_error: Optional[str] = None
+        self.load_started_at: Optional[datetime] = None
+        self.load_seconds: Optional[float] = None
+        self._load_lock = threading.Lock()
+        self._load_thread: Optional[threading.Thread] = None
+        self.inference = InferenceExecutor(
+            lambda: self.backend,
+            batch_size=settings.LLM_BATCH_SIZE,
+            max_wait_ms=settings.LLM_BATCH_WAIT_MS,
+        )
+        if settings.LLM_LOAD_MODE == "disabled":
+            self.load_state = "disabled"
+
+    @property
+    def model_loaded(self) -> bool:
+        return self.load_state == "ready"
+
+    @property
+    def model_source(self) -> str:
+        """Local model directory if configured and present, else the hub model name"""
+        if settings.LLM_MODEL_PATH and os.path.isdir(settings.LLM_MODEL_PATH):
+            return settings.LLM_MODEL_PATH
+        return settings.LLM_MODEL_NAME
+
+    def ensure_loaded(self) -> bool:
+        """Load the model if needed (blocking, thread-safe). Returns True when the model is usable."""
+        if self.load_state in ("ready", "disabled"):
+            return self.model_loaded
+        with self._load_lock:
+            if self.load_state == "not_loaded":
+                self._load_model()
+        return self.model_loaded
+
+    def start_background_load(self):
+        """Warm the model in a daemon thread so API startup is not blocked"""
+        if self.load_state != "not_loaded" or (self._load_thread and self._load_thread.is_alive()):
+            return
+        self._load_thread = threading.Thread(target=self.ensure_loaded, name="llm-warmup", daemon=True)
+        self._load_thread.start()
+
+    def reset(self):
+        """Allow a failed load to be retried"""
+        with self._load_lock:
+            if self.load_state == "failed":
+                self.load_state = "not_loaded"
+                self.load_error = None
+
+    def get_status(self) -> Dict[str, Any]:
+        """Readiness information for the health endpoint"""
+        memory = {}
+        if HAS_PSUTIL:
+            memory["process_rss_mb"] = round(psutil.Process().memory_info().rss / 1024 ** 2, 1)
+        torch = sys.modules.get("torch")  # only report GPU memory if torch is already loaded
+        if torch is not None and torch.cuda.is_available():
+            memory["cuda_allocated_mb"] = round(torch.cuda.memory_allocated() / 1024 ** 2, 1)
+            memory["cuda_reserved_mb"] = round(torch.cuda.memory_reserved() / 1024 ** 2, 1)
+
+        return {
+            "state": self.load_state,
+            "ready": self.model_loaded,
+            "load_mode": settings.LLM_LOAD_MODE,
+            "model_name": settings.LLM_MODEL_NAME,
+            "model_source": self.model_source,
+            # Configured name until loaded: resolving "auto" imports torch and probes CUDA
+            "backend": self.backend.name if self.backend else settings.LLM_BACKEND,
+            "device": self.backend.device_info() if self.model_loaded else {},
+            "load_started_at": self.load_started_at.isoformat() if self.load_started_at else None,
+            "load_seconds": self.load_seconds,
+            "error": self.load_error,
+            "memory": memory,
+            "inference": self.inference.get_stats(),
+            "prefix_cache": self.backend.prefix_cache_stats() if hasattr(self.backend, "prefix_cache_stats") else None,
+            "retrieval": embedding_service.get_status(),
+            "digest": digest_service.get_stats(),
+        }
+
     def _load_model(self):
-        """Load the Mistral model for evaluation"""
+        """Load the configured LLM backend for evaluation"""
+        self.load_state = "loading"
+        self.load_started_at = datetime.utcnow()
+        started = time.perf_counter()
         try:
-            logger.info("🚀 Loading Mistral 7B model for AI evaluation...")
-            
-            quantization_config = BitsAndBytesConfig(
-                load_in_4bit=True,
-                bnb_4bit_compute_dtype=torch.float16,
-                bnb_4bit_quant_type="nf4",
-                bnb_4bit_use_double_quant=True,
+            model_source = self.model_source
+            local_only = model_source != settings.LLM_MODEL_NAME
+            backend = create_backend(
+                settings.LLM_BACKEND,
+                model_source,
+                local_files_only=local_only,
+                stub_latency_ms=settings.LLM_STUB_LATENCY_MS,
+                prefix_cache_size=settings.LLM_PREFIX_CACHE_SIZE,
+                constrained_decoding=settings.LLM_CONSTRAINED_DECODING,
+                reasoning_max_chars=settings.LLM_REASONING_MAX_CHARS,
             )
-            
-            model_name = "mistralai/Mistral-7B-Instruct-v0.1"
-            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-            self.tokenizer.pad_token = self.tokenizer.eos_token
-            
-            self.model = AutoModelForCausalLM.from_pretrained(
-                model_name,
-                quantization_config=quantization_config,
-                device_map="auto",
-                trust_remote_code=True,
-                torch_dtype=torch.float16
-            )
-            
-            self.pipeline = pipeline(
-                "text-generation",
-                model=self.model,
-                tokenizer=self.tokenizer,
-                max_new_tokens=1024,
-                temperature=0.1,
-                do_sample=False,
-                return_full_text=False
+            logger.info(f"🚀 Loading {model_source} with {backend.name} backend for AI evaluation...")
+            backend.load()
+
+            budget = settings.LLM_CONTEXT_BUDGET
+            window = backend.context_window()
+            if window:
+                budget = min(budget, window - settings.LLM_MAX_NEW_TOKENS)
+            self.context_packer = ContextPacker(
+                backend,
+                budget=budget,
+                tender_share=settings.LLM_CONTEXT_TENDER_SHARE,
+                criteria_share=settings.LLM_CONTEXT_CRITERIA_SHARE,
             )
-            
-            self.model_loaded = True
-            logger.info("✅ Mistral 7B model loaded successfully!")
+            self.backend = backend
+            self.tokenizer = backend.tokenizer
+            self.load_seconds = round(time.perf_counter() - started, 2)
+            self.load_state = "ready"
+            logger.info(f"✅ {model_source} ({backend.name}) loaded successfully in {self.load_seconds}s")
             
         except Exception as e:
-            logger.error(f"❌ Failed to load Mistral model: {e}")
-            self.model_loaded = False
+            self.load_seconds = round(time.perf_counter() - started, 2)
+            self.load_error = str(e)
+            self.load_state = "failed"
+            logger.error(f"❌ Failed to load evaluation model: {e}")
     
     def _clean_text(self, text: str) -> str:
         """Clean extracted text"""
@@ -72,6 +179,12 @@ class AIEvaluationService:
         text = re.sub(r'[^\x20-\x7E\n\r\t]', '', text)
         return text.strip()
     
+    def count_tokens(self, text: str) -> Tuple[int, str]:
+        """(tokens, counter): the loaded model's tokenizer when available, else the backend's character estimate"""
+        if self.model_loaded and self.backend is not None:
+            return self.backend.count_tokens(text), self.backend.name
+        return -(-len(text) // LLMBackend.CHARS_PER_TOKEN), "estimate"
+    
     def _extract_json_strict(self, text: str) -> Optional[str]:
         """Very strict JSON extraction from LLM response"""
         try:
@@ -109,19 +222,33 @@ class AIEvaluationService:
             logger.error(f"JSON extraction error: {e}")
             return None
     
-    def _generate_evaluation_prompt(self, tender_text: str, vendor_text: str, criteria: List[Dict]) -> str:
-        """Generate dynamic prompt based on criteria from database"""
-        
-        # Create criteria mapping for JSON structure
-        criteria_keys = []
-        criteria_descriptions = []
-        
+    def _criteria_keys(self, criteria: List[Dict]) -> List[str]:
+        """JSON keys of the criteria, in prompt order"""
+        keys = []
         for criterion in criteria:
             # Create safe key name (lowercase, underscores)
             key_name = criterion['name'].lower().replace(' ', '_').replace('&', 'and').replace('-', '_')
-            key_name = re.sub(r'[^a-z0-9_]', '', key_name)
-            criteria_keys.append(key_name)
-            criteria_descriptions.append(f"{criterion['name']}: {criterion.get('description', 'No description')}")
+            keys.append(re.sub(r'[^a-z0-9_]', '', key_name))
+        return keys
+    
+    def _max_new_tokens(self, criteria: List[Dict]) -> int:
+        """Generation budget for the evaluation JSON: its template plus capped reasoning per criterion, capped"""
+        budget = token_budget(list(dict.fromkeys(self._criteria_keys(criteria))), settings.LLM_REASONING_MAX_CHARS)
+        if budget > settings.LLM_MAX_NEW_TOKENS:
+            logger.warning(
+                f"Evaluation JSON for {len(criteria)} criteria needs up to {budget} tokens; "
+                f"capped at LLM_MAX_NEW_TOKENS={settings.LLM_MAX_NEW_TOKENS}"
+            )
+        return min(budget, settings.LLM_MAX_NEW_TOKENS)
+    
+    def _criteria_prompt_parts(self, criteria: List[Dict]) -> Tuple[str, str]:
+        """(criteria descriptions section, JSON template) for the prompt"""
+        
+        # Create criteria mapping for JSON structure
+        criteria_keys = self._criteria_keys(criteria)
+        criteria_descriptions = [
+            f"{criterion['name']}: {criterion.get('description', 'No description')}" for criterion in criteria
+        ]
         
         # Build JSON template dynamically
         json_template = "{\n"
@@ -129,16 +256,21 @@ class AIEvaluationService:
             json_template += f'  "{key}": {{"score": 85, "reasoning": "brief specific reason"}},\n'
         json_template = json_template.rstrip(',\n') + "\n}"
         
-        prompt = f"""ANALYZE THE FOLLOWING TENDER AND VENDOR DOCUMENTS, THEN OUTPUT ONLY RAW JSON.
+        return chr(10).join(criteria_descriptions), json_template
+    
+    def _generate_prompt_prefix(self, tender_text: str, criteria_text: str, json_template: str) -> str:
+        """
+        Vendor-independent start of the prompt: instructions, tender context, criteria
+        and JSON template. It is identical for every vendor of a tender, so the backend
+        can prefill it once and reuse its key/value cache.
+        """
+        return f"""ANALYZE THE FOLLOWING TENDER AND VENDOR DOCUMENTS, THEN OUTPUT ONLY RAW JSON.
 
 TENDER DOCUMENT CONTENT:
-{tender_text[:3500]}
-
-VENDOR DOCUMENT CONTENT:  
-{vendor_text[:4500]}
+{tender_text}
 
 EVALUATION CRITERIA:
-{chr(10).join(criteria_descriptions)}
+{criteria_text}
 
 YOUR TASK: Evaluate the vendor against the tender requirements and output ONLY a JSON object with scores (0-100) and brief reasoning for EACH criterion.
 
@@ -151,14 +283,150 @@ CRITICAL INSTRUCTIONS:
 4. If information is missing for a criterion, score lower and state what's missing
 5. DO NOT ADD ANY TEXT BEFORE OR AFTER THE JSON
 
+"""
+    
+    def _generate_vendor_suffix(self, vendor_text: str) -> str:
+        """Vendor-specific continuation of the prompt prefix"""
+        return f"""VENDOR DOCUMENT CONTENT:
+{vendor_text}
+
 OUTPUT ONLY THE JSON:"""
+    
+    def _retrieve_context(
+        self, text: str, chunks: Optional[ChunkSet], criteria: List[Dict]
+    ) -> Tuple[str, Optional[Dict[str, int]]]:
+        """
+        Text made of the chunks most relevant to any criterion (top-k per criterion),
+        or the untouched text when retrieval is unavailable. Indexed chunks come with
+        stored vectors; otherwise the text is chunked and embedded on the fly.
+        Returns (text, chunk stats).
+        """
+        if not embedding_service.available:
+            return text, None
+        chunks = ChunkSet.coerce(chunks) or ChunkSet(chunk_text(text))
+        if not chunks.texts:
+            return text, None
+        try:
+            queries = [f"{c['name']}: {c.get('description') or ''}" for c in criteria]
+            selected = embedding_service.retrieve(queries, chunks)
+        except Exception as e:
+            logger.warning(f"Chunk retrieval failed, using document head: {e}")
+            return text, None
+        cleaned = [self._clean_text(chunks.texts[i]) for i in selected]
+        stats = {
+            "chunks_total": len(chunks.texts),
+            "chunks_selected": len(selected),
+            "indexed": chunks.vectors is not None,
+        }
+        return "\n...\n".join(c for c in cleaned if c), stats
+    
+    def _requirements_text(self, requirements: Optional[List[Dict]]) -> str:
+        """Numbered tender requirement list for the prompt ("" when the tender digest has none)"""
+        if not requirements or not settings.TENDER_REQUIREMENTS_IN_PROMPT:
+            return ""
+        return "\n".join(
+            f"{i}. {'[ELIGIBILITY] ' if r.get('kind') == 'eligibility' else ''}{r['text']}"
+            for i, r in enumerate(requirements, 1)
+        )
+    
+    def _plan_prompt(
+        self,
+        tender_text: str,
+        criteria: List[Dict],
+        tender_chunks: Optional[ChunkSet] = None,
+        tender_requirements: Optional[List[Dict]] = None,
+    ) -> Tuple[PrefixPlan, str, int, Optional[Dict[str, int]]]:
+        """
+        Retrieve the relevant tender chunks (or use the tender digest's requirement list) and
+        allocate the vendor-independent prompt prefix; returns (plan, JSON template, vendor
+        suffix overhead tokens, tender retrieval stats)
+        """
+        requirements_text = self._requirements_text(tender_requirements)
+        if requirements_text:
+            tender_text, tender_retrieval = requirements_text, {"requirements": len(tender_requirements)}
+        else:
+            tender_text, tender_retrieval = self._retrieve_context(tender_text, tender_chunks, criteria)
+        
+        criteria_text, json_template = self._criteria_prompt_parts(criteria)
+        prefix_overhead = self.backend.count_tokens(self._generate_prompt_prefix("", "", json_template))
+        suffix_overhead = self.backend.count_tokens(self._generate_vendor_suffix(""))
         
-        return prompt
+        plan = self.context_packer.plan_prefix(tender_text, criteria_text, prefix_overhead)
+        return plan, json_template, suffix_overhead, tender_retrieval
     
-    def _manual_content_evaluation(self, vendor_text: str, criteria: List[Dict]) -> Dict[str, Any]:
+    def _vendor_token_budget(
+        self,
+        tender_text: str,
+        criteria: List[Dict],
+        tender_chunks: Optional[ChunkSet] = None,
+        tender_requirements: Optional[List[Dict]] = None,
+    ) -> int:
+        """Tokens left for the vendor section once the prompt prefix is packed"""
+        plan, _, suffix_overhead, _ = self._plan_prompt(tender_text, criteria, tender_chunks, tender_requirements)
+        return max(0, plan.vendor_budget - suffix_overhead)
+    
+    def _build_prompt(
+        self,
+        tender_text: str,
+        vendor_text: str,
+        criteria: List[Dict],
+        tender_chunks: Optional[ChunkSet] = None,
+        vendor_chunks: Optional[ChunkSet] = None,
+        retrieve_vendor: bool = True,
+        tender_requirements: Optional[List[Dict]] = None,
+    ) -> Tuple[str, str, Dict[str, Any]]:
+        """
+        Retrieve the relevant chunks, then pack tender, criteria and vendor text into the
+        token budget; returns (prefix, suffix, context usage). In digest mode the vendor text
+        (digests, or the whole text when it fits) is packed as is (retrieve_vendor=False).
+        """
+        plan, json_template, suffix_overhead, tender_retrieval = self._plan_prompt(
+            tender_text, criteria, tender_chunks, tender_requirements
+        )
+        vendor_retrieval = None
+        if retrieve_vendor:
+            vendor_text, vendor_retrieval = self._retrieve_context(vendor_text, vendor_chunks, criteria)
+        
+        vendor, usage = self.context_packer.pack_vendor(plan, vendor_text, suffix_overhead)
+        usage["retrieval"] = {"tender": tender_retrieval, "vendor": vendor_retrieval}
+        
+        prefix = self._generate_prompt_prefix(plan.tender.text, plan.criteria.text, json_template)
+        return prefix, self._generate_vendor_suffix(vendor.text), usage
+    
+    async def _digest_vendor_text(
+        self,
+        tender_text: str,
+        vendor_text: str,
+        criteria: List[Dict],
+        tender_chunks: Optional[ChunkSet] = None,
+        tender_requirements: Optional[List[Dict]] = None,
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Map-reduce the vendor documents into cached digests that fit the vendor token budget"""
+        budget = await asyncio.to_thread(
+            self._vendor_token_budget, tender_text, criteria, tender_chunks, tender_requirements
+        )
+        return await digest_service.reduce(
+            vendor_text,
+            budget,
+            self.inference.generate,
+            self.backend.count_tokens,
+            json.dumps([self.backend.name, self.model_source]),
+        )
+    
+    def _manual_content_evaluation(self, vendor_text: str, criteria: List[Dict], tender_text: str = "") -> Dict[str, Any]:
         """Manual evaluation fallback based on content analysis"""
         logger.info("📊 Using manual content-based evaluation fallback...")
         
+        if lexical_scoring_service.available:
+            try:
+                lexical = lexical_scoring_service.score_vendor(tender_text, vendor_text, criteria)
+                return {
+                    key_name: lexical[criterion['name']]
+                    for key_name, criterion in zip(self._criteria_keys(criteria), criteria)
+                }
+            except Exception as e:
+                logger.warning(f"Lexical scoring failed, falling back to term counts: {e}")
+        
         scores = {}
         
         for criterion in criteria:
@@ -261,7 +529,12 @@ OUTPUT ONLY THE JSON:"""
         vendor_text: str, 
         criteria: List[Dict],
         vendor_id: str,
-        vendor_name: str
+        vendor_name: str,
+        tender_chunks: Optional[ChunkSet] = None,
+        vendor_chunks: Optional[ChunkSet] = None,
+        tender_requirements: Optional[List[Dict]] = None,
+        tender_cleaned: bool = False,
+        vendor_cleaned: bool = False
     ) -> Dict[str, Any]:
         """
         Main evaluation function for a single vendor
@@ -272,6 +545,11 @@ OUTPUT ONLY THE JSON:"""
             criteria: List of criteria from database with id, name, weightage, etc.
             vendor_id: Unique identifier for the vendor
             vendor_name: Name of the vendor
+            tender_chunks: Indexed chunks (with vectors) of the tender documents; chunked on the fly if None
+            vendor_chunks: Indexed chunks (with vectors) of the vendor documents; chunked on the fly if None
+            tender_requirements: Requirement clauses from the tender digest; replace tender retrieval in the prompt
+            tender_cleaned: tender_text is the tender digest's already cleaned text
+            vendor_cleaned: vendor_text is the vendor's already cleaned materialized corpus
         
         Returns:
             Evaluation results dictionary
@@ -280,14 +558,28 @@ OUTPUT ONLY THE JSON:"""
         
         try:
             # Clean and prepare texts
-            clean_tender_text = self._clean_text(tender_text)
-            clean_vendor_text = self._clean_text(vendor_text)
+            clean_tender_text = self._prepared_text(tender_text, tender_cleaned)
+            clean_vendor_text = self._prepared_text(vendor_text, vendor_cleaned)
             
             if not clean_tender_text or not clean_vendor_text:
                 raise ValueError("Tender or vendor text is empty after cleaning")
             
+            # Identical inputs under the same model/prompt configuration are not re-scored
+            cache_key = evaluation_cache.make_key(
+                self._requirements_text(tender_requirements) + "\n" + clean_tender_text,
+                clean_vendor_text,
+                criteria,
+                self._model_fingerprint(),
+            )
+            cached = evaluation_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"♻️ Cached AI evaluation reused for {vendor_name}")
+                return self._from_cache(cached, criteria, vendor_id, vendor_name)
+            
             # LLM Evaluation
-            criteria_scores = await self._evaluate_with_llm(clean_tender_text, clean_vendor_text, criteria)
+            criteria_scores, context_usage, scoring_method = await self._evaluate_with_llm(
+                clean_tender_text, clean_vendor_text, criteria, tender_chunks, vendor_chunks, tender_requirements
+            )
             
             # Calculate final score
             final_score = self._calculate_weighted_score(criteria_scores, criteria)
@@ -318,12 +610,19 @@ OUTPUT ONLY THE JSON:"""
                 "rating": rating,
                 "criteria_scores": detailed_scores,
                 "evaluation_date": datetime.utcnow().isoformat(),
-                "ai_model_used": "Mistral-7B-Instruct-v0.1",
+                "ai_model_used": self._model_label(),
                 "documents_analyzed": clean_vendor_text.count("--- Document:") or 1,
                 "tender_chars_analyzed": len(clean_tender_text),
-                "vendor_chars_analyzed": len(clean_vendor_text)
+                "vendor_chars_analyzed": len(clean_vendor_text),
+                "context_usage": context_usage,
+                "scoring_method": scoring_method,
+                "cache": {"hit": False}
             }
             
+            # Only LLM scores are cached, so a fallback result is re-scored once the model is up
+            if scoring_method == "llm":
+                evaluation_cache.put(cache_key, results)
+            
             logger.info(f"✅ AI evaluation completed for {vendor_name}: {final_score}%")
             return results
             
@@ -331,42 +630,144 @@ OUTPUT ONLY THE JSON:"""
             logger.error(f"❌ AI evaluation failed for vendor {vendor_name}: {e}")
             return self._get_fallback_results(vendor_id, vendor_name, criteria, str(e))
     
-    async def _evaluate_with_llm(self, tender_text: str, vendor_text: str, criteria: List[Dict]) -> Dict[str, Any]:
-        """Use LLM to evaluate vendor against tender requirements with dynamic criteria"""
-        if not self.model_loaded:
-            logger.warning("🤖 LLM not loaded, using manual evaluation")
-            return self._manual_content_evaluation(vendor_text, criteria)
+    def _prepared_text(self, text: str, cleaned: bool) -> str:
+        """Evaluation text: already cleaned inputs (digest, corpus) are only stripped"""
+        return text.strip() if cleaned else self._clean_text(text)
+
+    async def prescore_fallback(
+        self, tender_data: Dict[str, Any], vendors_data: List[Dict[str, Any]], criteria: List[Dict]
+    ) -> int:
+        """
+        When the LLM is unavailable, BM25-score every vendor of a run in one call; the
+        per-vendor fallback in evaluate_vendor then reads these cached scores. Returns the
+        number of vendors scored (0 when the LLM is up or lexical scoring is unavailable).
+        """
+        if not vendors_data or not criteria or not lexical_scoring_service.available:
+            return 0
+        if await asyncio.to_thread(self.ensure_loaded):
+            return 0
+        inputs = [_vendor_inputs(tender_data, vendor, criteria) for vendor in vendors_data]
+        tender_text = self._prepared_text(inputs[0]["tender_text"], inputs[0]["tender_cleaned"])
+        vendor_texts = [
+            text for text in (self._prepared_text(i["vendor_text"], i.get("vendor_cleaned", False)) for i in inputs)
+            if text
+        ]
+        if not tender_text or not vendor_texts:
+            return 0
+        try:
+            await asyncio.to_thread(lexical_scoring_service.score_vendors, tender_text, vendor_texts, criteria)
+        except Exception as e:
+            logger.warning(f"Batched lexical scoring failed; vendors are scored individually: {e}")
+            return 0
+        logger.info(f"📊 LLM unavailable: lexical scores computed for {len(vendor_texts)} vendors in one pass")
+        return len(vendor_texts)
+
+    async def _evaluate_with_llm(
+        self,
+        tender_text: str,
+        vendor_text: str,
+        criteria: List[Dict],
+        tender_chunks: Optional[ChunkSet] = None,
+        vendor_chunks: Optional[ChunkSet] = None,
+        tender_requirements: Optional[List[Dict]] = None,
+    ) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]], str]:
+        """
+        Use LLM to evaluate vendor against tender requirements with dynamic criteria.
+        Returns (criteria scores, context usage, scoring method); usage is None when the
+        prompt was never built, and the method is "llm" or "content_analysis".
+        """
+        # Lazy load runs in a worker thread so the event loop is not blocked
+        if not await asyncio.to_thread(self.ensure_loaded):
+            logger.warning(f"🤖 LLM not available ({self.load_state}), using manual evaluation")
+            return await asyncio.to_thread(self._manual_content_evaluation, vendor_text, criteria, tender_text), None, "content_analysis"
         
         try:
-            prompt = self._generate_evaluation_prompt(tender_text, vendor_text, criteria)
+            digest_stats = None
+            if settings.EVALUATION_MODE == "digest":
+                vendor_text, digest_stats = await self._digest_vendor_text(
+                    tender_text, vendor_text, criteria, tender_chunks, tender_requirements
+                )
             
-            # Run LLM inference
-            response = self.pipeline(
-                prompt,
-                max_new_tokens=512,
-                temperature=0.1,
-                do_sample=False,
-                num_return_sequences=1,
-                pad_token_id=self.tokenizer.eos_token_id,
-                eos_token_id=self.tokenizer.eos_token_id,
-                return_full_text=False
+            # Tokenising long documents is CPU work, keep it off the event loop
+            prefix, suffix, usage = await asyncio.to_thread(
+                self._build_prompt, tender_text, vendor_text, criteria, tender_chunks, vendor_chunks,
+                digest_stats is None, tender_requirements,
             )
+            usage["digest"] = digest_stats
+            if usage["dropped"]:
+                logger.info(f"✂️ Context budget {usage['budget']} tokens: dropped {usage['dropped']} tokens")
             
-            result_text = response[0]['generated_text'].strip()
+            # Queued for batched generation with other vendors' prompts on the inference thread;
+            # vendors of the same tender share the prefix's key/value cache. Decoding is
+            # constrained to the criteria's JSON schema and stops once the object closes
+            result_text = await self.inference.generate(
+                suffix,
+                max_new_tokens=self._max_new_tokens(criteria),
+                prefix=prefix,
+                json_keys=list(dict.fromkeys(self._criteria_keys(criteria))),
+            )
             logger.debug(f"🤖 LLM Raw Response: {result_text}")
             
             # Extract JSON from response
             json_match = self._extract_json_strict(result_text)
             if json_match:
                 scores = json.loads(json_match)
-                return self._validate_scores(scores, criteria)
+                return self._validate_scores(scores, criteria), usage, "llm"
             else:
                 logger.warning("❌ Could not extract valid JSON from LLM, using fallback")
-                return self._manual_content_evaluation(vendor_text, criteria)
+                return await asyncio.to_thread(self._manual_content_evaluation, vendor_text, criteria, tender_text), usage, "content_analysis"
                 
         except Exception as e:
             logger.error(f"❌ LLM evaluation failed: {e}")
-            return self._manual_content_evaluation(vendor_text, criteria)
+            return await asyncio.to_thread(self._manual_content_evaluation, vendor_text, criteria, tender_text), None, "content_analysis"
+    
+    def _model_fingerprint(self) -> str:
+        """Everything besides the inputs that changes what the LLM path returns"""
+        backend = self.backend.name if self.backend else resolve_backend_name(settings.LLM_BACKEND)
+        return json.dumps([
+            backend,
+            self.model_source,
+            self.PROMPT_VERSION,
+            settings.LLM_CONSTRAINED_DECODING,
+            settings.LLM_REASONING_MAX_CHARS,
+            settings.LLM_CONTEXT_BUDGET,
+            settings.LLM_CONTEXT_TENDER_SHARE,
+            settings.LLM_CONTEXT_CRITERIA_SHARE,
+            embedding_service.available and settings.EMBEDDING_MODEL,
+            settings.RETRIEVAL_TOP_K,
+            settings.CHUNK_CHARS,
+            settings.EVALUATION_MODE,
+            settings.TENDER_REQUIREMENTS_IN_PROMPT,
+            [
+                settings.VENDOR_CORPUS_BOILERPLATE_MIN_PAGES,
+                settings.VENDOR_CORPUS_BOILERPLATE_PAGE_RATIO,
+                settings.VENDOR_CORPUS_BOILERPLATE_MAX_CHARS,
+            ],
+            settings.EVALUATION_MODE == "digest" and [
+                settings.DIGEST_CHUNK_CHARS, settings.DIGEST_MAX_NEW_TOKENS, settings.DIGEST_MAX_LEVELS,
+            ],
+        ])
+    
+    def _from_cache(self, entry: Dict[str, Any], criteria: List[Dict], vendor_id: str, vendor_name: str) -> Dict[str, Any]:
+        """Cached result re-labelled for this vendor and the current criterion ids"""
+        results = dict(entry["result"])
+        ids = {criterion['name']: criterion['id'] for criterion in criteria}
+        results["criteria_scores"] = {
+            name: {**score, "criterion_id": ids.get(name, score.get("criterion_id"))}
+            for name, score in results.get("criteria_scores", {}).items()
+        }
+        results.update({
+            "vendor_id": vendor_id,
+            "vendor_name": vendor_name,
+            "cache": {"hit": True, "cached_at": entry.get("cached_at")},
+        })
+        return results
+    
+    def _model_label(self) -> str:
+        """Model name reported with results; the stub backend is labelled as such"""
+        if self.backend is not None and self.backend.name == "stub":
+            return "stub"
+        return settings.LLM_MODEL_NAME.split("/")[-1]
     
     def _get_fallback_results(self, vendor_id: str, vendor_name: str, criteria: List[Dict], error_msg: str) -> Dict[str, Any]:
         """Return fallback results when evaluation fails"""
@@ -398,18 +799,96 @@ OUTPUT ONLY THE JSON:"""
 # Global service instance
 ai_evaluation_service = AIEvaluationService()
 
-async def run_batch_evaluation(
+def _vendor_inputs(tender_data: Dict[str, Any], vendor: Dict[str, Any], criteria: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """evaluate_vendor() keyword arguments for one entry of vendors_data"""
+    if vendor.get('corpus'):
+        # Materialized corpus (boilerplate stripped, cleaned) with its stored chunk vectors, if indexed;
+        # never attachment-index chunks, which cover the raw text and would bring headers and footers back
+        return dict(
+            tender_text=tender_data.get('text_content', ''),
+            vendor_text=vendor['corpus'],
+            criteria=criteria,
+            vendor_id=vendor['id'],
+            vendor_name=vendor['name'],
+            tender_chunks=ChunkSet.coerce(tender_data.get('chunks')),
+            vendor_chunks=ChunkSet.coerce(vendor.get('chunks')),
+            tender_requirements=tender_data.get('requirements'),
+            tender_cleaned=tender_data.get('text_cleaned', False),
+            vendor_cleaned=True
+        )
+    
+    # Combine all OCR text from vendor documents
+    combined_vendor_text = ""
+    document_chunks = []
+    for doc in vendor.get('documents', []):
+        if doc.get('ocr_text'):
+            doc_name = doc.get('name', 'Unknown')
+            combined_vendor_text += f"\n\n--- Document: {doc_name} ---\n\n{doc['ocr_text']}"
+            doc_chunks = doc.get('chunks') or chunk_text(doc['ocr_text'])
+            document_chunks.extend(f"[{doc_name}] {chunk}" for chunk in doc_chunks)
+    # Chunks from the persistent embedding index (with vectors) take precedence
+    vendor_chunks = vendor.get('chunks') or (ChunkSet(document_chunks) if document_chunks else None)
+    
+    if not combined_vendor_text:
+        logger.warning(f"⚠️ No OCR text found for vendor {vendor['name']}")
+        combined_vendor_text = "No document content available for evaluation."
+    
+    return dict(
+        tender_text=tender_data.get('text_content', ''),
+        vendor_text=combined_vendor_text,
+        criteria=criteria,
+        vendor_id=vendor['id'],
+        vendor_name=vendor['name'],
+        tender_chunks=ChunkSet.coerce(tender_data.get('chunks')),
+        vendor_chunks=vendor_chunks,
+        tender_requirements=tender_data.get('requirements'),
+        tender_cleaned=tender_data.get('text_cleaned', False)
+    )
+
+def _vendor_evaluation(tender_data: Dict[str, Any], vendor: Dict[str, Any], criteria: List[Dict[str, Any]]):
+    """evaluate_vendor() coroutine for one entry of vendors_data"""
+    return ai_evaluation_service.evaluate_vendor(**_vendor_inputs(tender_data, vendor, criteria))
+
+async def stream_batch_evaluation(
     tender_data: Dict[str, Any],
     vendors_data: List[Dict[str, Any]],
     criteria: List[Dict[str, Any]]
+) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Evaluate all vendors concurrently and yield (vendor index, result or exception)
+    in completion order, so callers can publish each vendor as soon as it is scored.
+    Same inputs as run_batch_evaluation.
+    """
+    async def _indexed(index: int, vendor: Dict[str, Any]):
+        try:
+            return index, await _vendor_evaluation(tender_data, vendor, criteria)
+        except Exception as e:
+            return index, e
+    
+    await ai_evaluation_service.prescore_fallback(tender_data, vendors_data, criteria)
+    tasks = [asyncio.ensure_future(_indexed(i, vendor)) for i, vendor in enumerate(vendors_data)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def run_batch_evaluation(
+    tender_data: Dict[str, Any],
+    vendors_data: List[Dict[str, Any]],
+    criteria: List[Dict[str, Any]],
+    eligibility_rules: Optional[RuleSet] = None
 ) -> Dict[str, Any]:
     """
     Run AI evaluation for multiple vendors in batch
     
     Args:
-        tender_data: {id, title, text_content}
-        vendors_data: List of {id, name, documents: [{ocr_text, ...}]}
+        tender_data: {id, title, text_content, chunks (optional ChunkSet or chunk texts)}
+        vendors_data: List of {id, name, corpus (optional materialized text), chunks (optional ChunkSet;
+            of the corpus when there is one) and documents: [{ocr_text, chunks (optional), ...}] (used when there is no corpus)}
         criteria: List of criteria from database
+        eligibility_rules: Compiled prefilter rules; vendors failing them are rejected without an LLM pass
     
     Returns:
         Batch evaluation results
@@ -418,32 +897,17 @@ async def run_batch_evaluation(
     logger.info(f"🎯 Starting batch evaluation {evaluation_id} for {len(vendors_data)} vendors")
     
     try:
-        # Combine OCR text for each vendor
-        vendor_evaluation_tasks = []
-        
-        for vendor in vendors_data:
-            # Combine all OCR text from vendor documents
-            combined_vendor_text = ""
-            for doc in vendor.get('documents', []):
-                if doc.get('ocr_text'):
-                    doc_name = doc.get('name', 'Unknown')
-                    combined_vendor_text += f"\n\n--- Document: {doc_name} ---\n\n{doc['ocr_text']}"
-            
-            if not combined_vendor_text:
-                logger.warning(f"⚠️ No OCR text found for vendor {vendor['name']}")
-                combined_vendor_text = "No document content available for evaluation."
-            
-            # Create evaluation task
-            task = ai_evaluation_service.evaluate_vendor(
-                tender_text=tender_data.get('text_content', ''),
-                vendor_text=combined_vendor_text,
-                criteria=criteria,
-                vendor_id=vendor['id'],
-                vendor_name=vendor['name']
-            )
-            vendor_evaluation_tasks.append(task)
+        # Vendors failing hard eligibility rules are rejected in one pass, before any LLM work
+        screening = (eligibility_rules or RuleSet([])).screen(vendors_data)
+        rejected = [
+            rejection_result(vendor, screened, criteria)
+            for vendor, screened in zip(vendors_data, screening) if not screened["eligible"]
+        ]
+        eligible = [vendor for vendor, screened in zip(vendors_data, screening) if screened["eligible"]]
+        await ai_evaluation_service.prescore_fallback(tender_data, eligible, criteria)
+        vendor_evaluation_tasks = [_vendor_evaluation(tender_data, vendor, criteria) for vendor in eligible]
         
-        # Run all evaluations concurrently
+        # Run all evaluations concurrently; their prompts are batched by the inference executor
         results = await asyncio.gather(*vendor_evaluation_tasks, return_exceptions=True)
         
         # Process results
@@ -451,16 +915,20 @@ async def run_batch_evaluation(
         failed_vendors = []
         
         for i, result in enumerate(results):
-            vendor_name = vendors_data[i]['name']
+            vendor_name = eligible[i]['name']
             if isinstance(result, Exception):
                 logger.error(f"❌ Evaluation failed for {vendor_name}: {result}")
                 failed_vendors.append({
-                    "vendor_id": vendors_data[i]['id'],
+                    "vendor_id": eligible[i]['id'],
                     "vendor_name": vendor_name,
                     "error": str(result)
                 })
             else:
                 successful_results.append(result)
+        successful_results.extend(rejected)
+        
+        # Raw per-criterion scores are kept for what-if re-ranking without the LLM
+        score_matrix_service.record(evaluation_id, tender_data.get('id'), successful_results, criteria)
         
         # Prepare final response
         response = {
@@ -469,15 +937,19 @@ async def run_batch_evaluation(
             "tender_title": tender_data.get('title'),
             "status": "completed",
             "total_vendors": len(vendors_data),
-            "successful_evaluations": len(successful_results),
+            "successful_evaluations": len(successful_results) - len(rejected),
             "failed_evaluations": len(failed_vendors),
+            "rejected_vendors": len(rejected),
             "results": successful_results,
             "failed_vendors": failed_vendors,
             "evaluation_date": datetime.utcnow().isoformat(),
             "criteria_used": [{"id": c['id'], "name": c['name']} for c in criteria]
         }
         
-        logger.info(f"✅ Batch evaluation {evaluation_id} completed: {len(successful_results)} successful, {len(failed_vendors)} failed")
+        logger.info(
+            f"✅ Batch evaluation {evaluation_id} completed: {len(successful_results) - len(rejected)} successful, "
+            f"{len(failed_vendors)} failed, {len(rejected)} rejected by eligibility rules"
+        )
         return response
         
     except Exception as e:
@@ -0,0 +1,120 @@
+"""
+Token-budgeted packing of the evaluation prompt.
+
+The prompt is the fixed instruction template plus three variable sections:
+tender text, criteria descriptions and vendor text. The packer counts tokens
+with the loaded backend's tokenizer and fits the sections into
+LLM_CONTEXT_BUDGET:
+
+1. the template overhead is reserved first;
+2. criteria and tender get up to their configured shares of what is left,
+   and any share they do not need passes on to the vendor;
+3. the vendor section gets everything that remains.
+
+Tender and criteria allocations never depend on the vendor, so the prompt
+prefix stays identical for every vendor of a tender and its key/value cache
+can be reused. Each section reports tokens total/used/dropped.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+
+from app.services.llm_backends import LLMBackend
+
+
+@dataclass
+class PackedSection:
+    text: str
+    tokens_total: int
+    tokens_used: int
+
+    @property
+    def tokens_dropped(self) -> int:
+        return self.tokens_total - self.tokens_used
+
+    def report(self) -> Dict[str, int]:
+        return {
+            "tokens_total": self.tokens_total,
+            "tokens_used": self.tokens_used,
+            "tokens_dropped": self.tokens_dropped,
+        }
+
+
+@dataclass
+class PrefixPlan:
+    """Packed tender/criteria sections plus the token budget left for the vendor"""
+    tender: PackedSection
+    criteria: PackedSection
+    overhead_tokens: int
+    vendor_budget: int
+
+
+class ContextPacker:
+    PLAN_CACHE_SIZE = 16
+
+    def __init__(self, backend: LLMBackend, budget: int, tender_share: float, criteria_share: float):
+        self.backend = backend
+        self.budget = budget
+        self.tender_share = tender_share
+        self.criteria_share = criteria_share
+        self._plans: "OrderedDict[str, PrefixPlan]" = OrderedDict()
+        # plan_prefix runs on asyncio.to_thread workers
+        self._plans_lock = threading.Lock()
+
+    def fit(self, text: str, max_tokens: int) -> PackedSection:
+        """Keep the head of `text` that fits in `max_tokens`"""
+        total = self.backend.count_tokens(text) if text else 0
+        if total <= max_tokens:
+            return PackedSection(text, total, total)
+        fitted = self.backend.truncate_tokens(text, max(0, max_tokens))
+        return PackedSection(fitted, total, min(total, self.backend.count_tokens(fitted)) if fitted else 0)
+
+    def plan_prefix(self, tender_text: str, criteria_text: str, overhead_tokens: int) -> PrefixPlan:
+        """Allocate the tender and criteria sections; cached per (tender, criteria, overhead)"""
+        key = hashlib.sha256(
+            f"{overhead_tokens}\0{criteria_text}\0{tender_text}".encode("utf-8")
+        ).hexdigest()
+        with self._plans_lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                return plan
+
+        available = max(0, self.budget - overhead_tokens)
+        criteria = self.fit(criteria_text, int(available * self.criteria_share))
+        # Criteria's unused share is offered to the tender before the vendor
+        tender_allowance = int(available * self.tender_share) + (int(available * self.criteria_share) - criteria.tokens_used)
+        tender = self.fit(tender_text, tender_allowance)
+
+        plan = PrefixPlan(
+            tender=tender,
+            criteria=criteria,
+            overhead_tokens=overhead_tokens,
+            vendor_budget=max(0, available - tender.tokens_used - criteria.tokens_used),
+        )
+        with self._plans_lock:
+            self._plans[key] = plan
+            while len(self._plans) > self.PLAN_CACHE_SIZE:
+                self._plans.popitem(last=False)
+        return plan
+
+    def pack_vendor(self, plan: PrefixPlan, vendor_text: str, suffix_overhead_tokens: int) -> Tuple[PackedSection, Dict[str, Any]]:
+        """Fit the vendor section into what the prefix left over; returns it with the usage report"""
+        vendor = self.fit(vendor_text, max(0, plan.vendor_budget - suffix_overhead_tokens))
+        overhead = plan.overhead_tokens + suffix_overhead_tokens
+        used = overhead + plan.tender.tokens_used + plan.criteria.tokens_used + vendor.tokens_used
+        usage = {
+            "budget": self.budget,
+            "used": used,
+            "dropped": plan.tender.tokens_dropped + plan.criteria.tokens_dropped + vendor.tokens_dropped,
+            "overhead": overhead,
+            "sections": {
+                "tender": plan.tender.report(),
+                "criteria": plan.criteria.report(),
+                "vendor": vendor.report(),
+            },
+        }
+        return vendor, usage
@@ -0,0 +1,238 @@
+"""
+Map-reduce digests of long vendor submissions (EVALUATION_MODE=digest).
+
+Map: every vendor document is cut into DIGEST_CHUNK_CHARS sections and each
+section is summarised by the LLM into a terse, evaluation-oriented digest
+(qualifications, experience, technical content, figures, timelines,
+compliance). All section prompts share one instruction prefix, so the
+backend's prefix cache is reused, and they go through the batching inference
+executor together.
+
+Reduce: the digests are joined in document order; while they exceed the
+vendor's token budget, adjacent digests are grouped and digested again, up to
+DIGEST_MAX_LEVELS.
+
+Every digest is stored in chunk_digests under the hash of its input text and
+the digest configuration (prompt version, model, output length). Criteria are
+deliberately not part of the key: re-evaluations, other tenders quoting the
+same documents and criteria changes all reuse the cached digests. Documents are
+sectioned independently, so changing one attachment only re-digests that
+attachment's sections.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.upload_models import ChunkDigest
+from app.services.embedding_service import chunk_spans, chunk_text
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the digest prompt changes so stored digests are not reused
+DIGEST_PROMPT_VERSION = "1"
+
+DIGEST_PREFIX = """SUMMARIZE THE FOLLOWING SECTION OF A VENDOR'S TENDER SUBMISSION FOR BID EVALUATION.
+
+Keep only facts an evaluator would score: qualifications and certifications, experience and past projects, technical approach and specifications, team and resources, financial figures (turnover, prices, payment terms), delivery timelines, warranties and support, compliance statements and any exceptions or deviations.
+Keep numbers, dates, names and units exactly as written. Omit boilerplate, headers and legal text.
+Write terse bullet points. If nothing is relevant, write: NO RELEVANT CONTENT
+
+"""
+
+DOCUMENT_MARKER = re.compile(r"--- Document: (.*?) ---")
+
+# (prompt, max_new_tokens, prefix) -> completion; the inference executor's generate()
+Generate = Callable[..., Awaitable[str]]
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class DigestService:
+    MEMORY_CACHE_SIZE = 4096
+
+    def __init__(self):
+        self._memory: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.generated = 0
+
+    def config_key(self, model_key: str) -> str:
+        """Hash of everything besides the input text that changes a digest"""
+        return _hash(json.dumps([DIGEST_PROMPT_VERSION, model_key, settings.DIGEST_MAX_NEW_TOKENS]))
+
+    def sections(self, text: str) -> List[Tuple[str, str]]:
+        """(document name, section text) pairs; each document is sectioned on its own"""
+        parts = DOCUMENT_MARKER.split(text)
+        documents = [("Document", parts[0])] + list(zip(parts[1::2], parts[2::2]))
+        sections = []
+        for name, body in documents:
+            spans = chunk_spans(body, size=settings.DIGEST_CHUNK_CHARS, overlap=0)
+            sections.extend((name, section) for section in chunk_text(body, spans) if section)
+        return sections
+
+    def _remember(self, key: Tuple[str, str], digest: str):
+        with self._lock:
+            self._memory[key] = digest
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.MEMORY_CACHE_SIZE:
+                self._memory.popitem(last=False)
+
+    def _lookup(self, config: str, hashes: List[str]) -> Dict[str, str]:
+        found = {}
+        with self._lock:
+            for chunk_hash in hashes:
+                digest = self._memory.get((config, chunk_hash))
+                if digest is not None:
+                    self._memory.move_to_end((config, chunk_hash))
+                    found[chunk_hash] = digest
+        self.memory_hits += len(found)
+        missing = [h for h in hashes if h not in found]
+        if not missing:
+            return found
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(ChunkDigest.chunk_hash, ChunkDigest.digest)
+                .filter(ChunkDigest.digest_config == config, ChunkDigest.chunk_hash.in_(missing))
+                .all()
+            )
+        finally:
+            db.close()
+        self.db_hits += len(rows)
+        for chunk_hash, digest in rows:
+            found[chunk_hash] = digest
+            self._remember((config, chunk_hash), digest)
+        return found
+
+    def _store(self, config: str, level: int, entries: List[Tuple[str, str, str]]):
+        """Persist (hash, source text, digest) entries; rows another worker stored first are skipped"""
+        for chunk_hash, _, digest in entries:
+            self._remember((config, chunk_hash), digest)
+        db = SessionLocal()
+        try:
+            existing = {
+                h for (h,) in db.query(ChunkDigest.chunk_hash).filter(
+                    ChunkDigest.digest_config == config,
+                    ChunkDigest.chunk_hash.in_([h for h, _, _ in entries]),
+                )
+            }
+            db.add_all(
+                ChunkDigest(
+                    chunk_hash=chunk_hash,
+                    digest_config=config,
+                    level=level,
+                    digest=digest,
+                    source_chars=len(source),
+                    digest_chars=len(digest),
+                )
+                for chunk_hash, source, digest in entries
+                if chunk_hash not in existing
+            )
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+        finally:
+            db.close()
+
+    async def _digest_many(self, texts: List[str], level: int, config: str, generate: Generate) -> Tuple[List[str], int]:
+        """
+        Digest of every text, generating (concurrently, so the executor batches them) only
+        cache misses; returns (digests, number generated)
+        """
+        hashes = [_hash(text) for text in texts]
+        found = await asyncio.to_thread(self._lookup, config, list(dict.fromkeys(hashes)))
+        missing = {h: text for h, text in zip(hashes, texts) if h not in found}
+        if missing:
+            outputs = await asyncio.gather(*(
+                generate(f"SECTION:\n{text}\n\nDIGEST:", max_new_tokens=settings.DIGEST_MAX_NEW_TOKENS, prefix=DIGEST_PREFIX)
+                for text in missing.values()
+            ))
+            entries = [(h, text, output.strip()) for (h, text), output in zip(missing.items(), outputs)]
+            self.generated += len(entries)
+            await asyncio.to_thread(self._store, config, level, entries)
+            found.update((h, digest) for h, _, digest in entries)
+        return [found[h] for h in hashes], len(missing)
+
+    def _group(self, parts: List[str]) -> List[str]:
+        """Adjacent parts joined into groups of at most DIGEST_CHUNK_CHARS (at least two parts each)"""
+        groups, current, size = [], [], 0
+        for part in parts:
+            if len(current) >= 2 and size + len(part) > settings.DIGEST_CHUNK_CHARS:
+                groups.append("\n".join(current))
+                current, size = [], 0
+            current.append(part)
+            size += len(part) + 1
+        if current:
+            groups.append("\n".join(current))
+        return groups
+
+    async def reduce(
+        self,
+        text: str,
+        token_budget: int,
+        generate: Generate,
+        count_tokens: Callable[[str], int],
+        model_key: str,
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Vendor text reduced to digests that fit `token_budget` tokens where possible.
+        Text that already fits is returned unchanged. Returns (text, digest stats).
+        """
+        source_tokens = await asyncio.to_thread(count_tokens, text)
+        stats: Dict[str, Any] = {"applied": False, "source_tokens": source_tokens, "budget_tokens": token_budget}
+        if source_tokens <= token_budget:
+            return text, stats
+
+        config = self.config_key(model_key)
+        sections = self.sections(text)
+        digests, generated = await self._digest_many([section for _, section in sections], 0, config, generate)
+        parts = [
+            f"[{name}] {digest}" for (name, _), digest in zip(sections, digests)
+            if digest and "NO RELEVANT CONTENT" not in digest
+        ]
+        reduced = "\n".join(parts)
+        level = 0
+        while (
+            len(parts) > 1
+            and level + 1 < settings.DIGEST_MAX_LEVELS
+            and await asyncio.to_thread(count_tokens, reduced) > token_budget
+        ):
+            level += 1
+            parts, count = await self._digest_many(self._group(parts), level, config, generate)
+            generated += count
+            reduced = "\n".join(parts)
+
+        stats.update({
+            "applied": True,
+            "sections": len(sections),
+            "levels": level + 1,
+            "digest_tokens": await asyncio.to_thread(count_tokens, reduced),
+            "generated": generated,
+        })
+        return reduced, stats
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "mode": settings.EVALUATION_MODE,
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "generated": self.generated,
+        }
+
+
+# Global digest service instance
+digest_service = DigestService()
@@ -5,7 +5,8 @@ Extracts all data and structure from documents.
 
 import json
 import logging
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, Any, List, Optional
 from pathlib import Path
 import tempfile
 import io
@@ -17,6 +18,12 @@ try:
 except ImportError:
     HAS_DOCTR = False
 
+try:
+    import pypdfium2 as pdfium
+    HAS_PDFIUM = True
+except ImportError:
+    HAS_PDFIUM = False
+
 try:
     import pdf2image
     HAS_PDF2IMAGE = True
@@ -54,8 +61,37 @@ try:
 except ImportError:
     HAS_PANDAS = False
 
+from app.core.config import settings
+from app.services import ooxml_parser
+from app.services.embedding_service import chunk_spans
+from app.services.ooxml_parser import HAS_LXML
+from app.services.word_geometry_store import WordGeometryCollector, word_geometry_store
+
 logger = logging.getLogger(__name__)
 
+# Resolution doctr renders PDFs at by default (scale=2); used when two-pass OCR is disabled
+DEFAULT_OCR_DPI = 144
+
+
+def extracted_text(form_data: Dict[str, Any]) -> str:
+    """
+    Plain text of an extraction result: full_text for OCR/Office documents, content for
+    text files, and the inline rows of each sheet for Excel workbooks. Chunk spans in
+    form_data["chunks"] are offsets into this text.
+    """
+    if form_data.get("full_text"):
+        return form_data["full_text"]
+    if form_data.get("content"):
+        return form_data["content"]
+    parts = []
+    for sheet in form_data.get("sheets") or []:
+        parts.append(f"=== Sheet: {sheet.get('name')} ===")
+        if sheet.get("columns"):
+            parts.append(" | ".join(str(c) for c in sheet["columns"]))
+        for row in sheet.get("data") or []:
+            parts.append(" | ".join("" if v is None else str(v) for v in row))
+    return "\n".join(parts)
+
 
 class DocumentExtractionService:
     """Service to extract data from various document formats and convert to JSON"""
@@ -77,12 +113,70 @@ class DocumentExtractionService:
                 return None
         return self.ocr_model
 
+    def _build_page_data(self, page, page_number: int, words: Optional[WordGeometryCollector] = None) -> Dict[str, Any]:
+        """Convert one doctr page into page JSON, recording word geometry into `words`"""
+        page_data = {
+            "page_number": page_number,
+            "text": "",
+            "blocks": []
+        }
+
+        page_text = ""
+        for block_idx, block in enumerate(page.blocks):
+            block_text = ""
+            block_confidence = 0.0
+            word_count = 0
+
+            for line in block.lines:
+                for word in line.words:
+                    confidence = word.confidence if hasattr(word, 'confidence') else 1.0
+                    block_text += word.value + " "
+                    block_confidence += confidence
+                    word_count += 1
+                    if words is not None:
+                        words.add(page_number, block_idx, word.geometry, confidence, word.value)
+
+            if block_text.strip():
+                avg_confidence = block_confidence / word_count if word_count > 0 else 0.0
+                page_data["blocks"].append({
+                    "text": block_text.strip(),
+                    "confidence": float(avg_confidence)
+                })
+                page_text += block_text + " "
+
+        page_data["text"] = page_text.strip()
+        return page_data
+
+    def _store_word_geometry(
+        self, file_path: str, words: WordGeometryCollector, first_page: int = 1, last_page: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Write (or replace) the word sidecar segment of a page range; geometry is optional, so failures only log"""
+        try:
+            return word_geometry_store.write(file_path, words, first_page, last_page)
+        except Exception as e:
+            logger.warning(f"Could not store word geometry for {Path(file_path).name}: {e}")
+            return None
+
+    def _add_chunks(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Record retrieval chunk spans over the extracted text (character offsets) for evaluation"""
+        text = extracted_text(result) if result.get("status") in ("success", "partial") else ""
+        if text:
+            result["chunks"] = {
+                "chars": settings.CHUNK_CHARS,
+                "overlap": settings.CHUNK_OVERLAP_CHARS,
+                "spans": [list(span) for span in chunk_spans(text)],
+            }
+        return result
+
     def extract_from_file(self, file_path: str) -> Dict[str, Any]:
         """
         Extract data from a file based on its extension.
-        Returns a dictionary with extracted data.
+        Returns a dictionary with extracted data and chunk spans.
         Uses doctr OCR as primary method for best accuracy.
         """
+        return self._add_chunks(self._extract_by_type(file_path))
+
+    def _extract_by_type(self, file_path: str) -> Dict[str, Any]:
         file_path = Path(file_path)
         extension = file_path.suffix.lower()
 
@@ -110,10 +204,177 @@ class DocumentExtractionService:
                 "file_type": extension
             }
 
-    def extract_from_pdf(self, file_path: str) -> Dict[str, Any]:
+    def get_pdf_page_count(self, file_path: str) -> Optional[int]:
+        """Number of pages in a PDF without rendering it (None if it cannot be read)"""
+        if not HAS_PDFIUM:
+            return None
+        try:
+            pdf = pdfium.PdfDocument(file_path)
+            try:
+                return len(pdf)
+            finally:
+                pdf.close()
+        except Exception as e:
+            logger.warning(f"Could not read page count of {Path(file_path).name}: {e}")
+            return None
+
+    def _render_pdf_pages(self, file_path: str, page_numbers, scale: float):
+        """Render the given 1-based page numbers to RGB arrays (same rendering as DocumentFile.from_pdf)"""
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            return [pdf[n - 1].render(scale=scale, rev_byteorder=True).to_numpy() for n in page_numbers]
+        finally:
+            pdf.close()
+
+    def _pdf_page_numbers(self, file_path: str, first_page: int = 1, last_page: Optional[int] = None):
+        page_count = self.get_pdf_page_count(file_path) or 0
+        stop = page_count if last_page is None else min(last_page, page_count)
+        return list(range(first_page, stop + 1))
+
+    def _ocr_images(self, ocr_model, images, page_numbers) -> Dict[int, tuple]:
+        """OCR rendered pages; returns {page_number: (page_data, words)}"""
+        ocr_result = ocr_model(images)
+        pages = {}
+        for page_number, page in zip(page_numbers, ocr_result.pages):
+            words = WordGeometryCollector()
+            pages[page_number] = (self._build_page_data(page, page_number, words), words)
+        return pages
+
+    def _ocr_pdf_two_pass(self, file_path: str, ocr_model, first_page: int = 1, last_page: Optional[int] = None):
+        """
+        Confidence-driven OCR: every page is rendered at OCR_LOW_DPI first, and only pages
+        whose mean word confidence is below OCR_CONFIDENCE_THRESHOLD are re-rendered at
+        OCR_HIGH_DPI and OCR'd again. The pass with the higher mean confidence is kept.
+        Returns (page_data list, merged word collector, stats).
+        """
+        page_numbers = self._pdf_page_numbers(file_path, first_page, last_page)
+        high_dpi = settings.OCR_HIGH_DPI
+        low_dpi = settings.OCR_LOW_DPI if settings.OCR_TWO_PASS else DEFAULT_OCR_DPI
+        threshold = settings.OCR_CONFIDENCE_THRESHOLD
+
+        started = time.perf_counter()
+        pages = self._ocr_images(ocr_model, self._render_pdf_pages(file_path, page_numbers, low_dpi / 72), page_numbers)
+        low_seconds = time.perf_counter() - started
+        for page_data, words in pages.values():
+            page_data["ocr"] = {
+                "passes": [{"dpi": low_dpi, "words": len(words), "mean_confidence": round(words.mean_confidence(), 4)}],
+                "selected_dpi": low_dpi,
+            }
+
+        retry = []
+        if settings.OCR_TWO_PASS and high_dpi > low_dpi:
+            retry = [n for n in page_numbers if pages[n][1].mean_confidence() < threshold]
+        high_seconds = 0.0
+        if retry:
+            logger.info(f"Re-OCR of {len(retry)}/{len(page_numbers)} low-confidence pages at {high_dpi} DPI")
+            started = time.perf_counter()
+            retried = self._ocr_images(ocr_model, self._render_pdf_pages(file_path, retry, high_dpi / 72), retry)
+            high_seconds = time.perf_counter() - started
+            for n in retry:
+                page_data, words = retried[n]
+                previous = pages[n][0]["ocr"]
+                previous["passes"].append(
+                    {"dpi": high_dpi, "words": len(words), "mean_confidence": round(words.mean_confidence(), 4)}
+                )
+                if words.mean_confidence() >= pages[n][1].mean_confidence():
+                    previous["selected_dpi"] = high_dpi
+                    page_data["ocr"] = previous
+                    pages[n] = (page_data, words)
+
+        merged_words = WordGeometryCollector()
+        for n in page_numbers:
+            merged_words.extend(pages[n][1])
+
+        stats = {
+            "low_dpi": low_dpi,
+            "high_dpi": high_dpi,
+            "confidence_threshold": threshold,
+            "pages": len(page_numbers),
+            "pages_reocr": len(retry),
+            "pages_improved": sum(1 for n in retry if pages[n][0]["ocr"]["selected_dpi"] == high_dpi),
+            "low_pass_seconds": round(low_seconds, 3),
+            "high_pass_seconds": round(high_seconds, 3),
+        }
+        return [pages[n][0] for n in page_numbers], merged_words, stats
+
+    def extract_preview(self, file_path: str, preview_pages: int) -> Dict[str, Any]:
+        """
+        Extract only the first `preview_pages` pages of a PDF so the upload can return quickly.
+        The result is marked "partial" with a `progressive` section telling
+        `extract_remaining` where to continue. Other file types are extracted fully.
+        """
+        if Path(file_path).suffix.lower() != ".pdf":
+            return self.extract_from_file(file_path)
+
+        page_count = self.get_pdf_page_count(file_path)
+        if page_count is None or page_count <= preview_pages:
+            return self.extract_from_file(file_path)
+
+        result = self.extract_from_pdf(file_path, first_page=1, last_page=preview_pages)
+        if result.get("status") != "success":
+            return self._add_chunks(result)
+
+        result["status"] = "partial"
+        result["progressive"] = {
+            "status": "pending",
+            "pages_total": page_count,
+            "pages_extracted": preview_pages,
+            "next_page": preview_pages + 1,
+        }
+        return self._add_chunks(result)
+
+    def extract_remaining(self, file_path: str, first_page: int, max_pages: Optional[int] = None) -> Dict[str, Any]:
+        """Extract the next chunk of pages of a progressively extracted PDF"""
+        last_page = first_page + max_pages - 1 if max_pages else None
+        return self.extract_from_pdf(file_path, first_page=first_page, last_page=last_page)
+
+    def merge_extraction(self, base: Dict[str, Any], extra: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Merge a page-range extraction into an earlier partial result.
+        Returns a new dict (JSON columns are not mutation-tracked, so callers reassign it).
+        """
+        merged = dict(base)
+        # A re-run page range replaces the pages it covers instead of duplicating them
+        redone = {p.get("page_number") for p in extra.get("pages", [])}
+        kept = [p for p in base.get("pages", []) if p.get("page_number") not in redone]
+        merged["pages"] = sorted(kept + list(extra.get("pages", [])), key=lambda p: p.get("page_number", 0))
+        if len(kept) < len(base.get("pages", [])):
+            merged["full_text"] = "\n".join(p.get("text", "") for p in merged["pages"] if p.get("text")).strip()
+        else:
+            merged["full_text"] = "\n".join(
+                t for t in (base.get("full_text", ""), extra.get("full_text", "")) if t
+            )
+        if extra.get("word_geometry"):
+            merged["word_geometry"] = extra["word_geometry"]
+        if base.get("ocr_stats") and extra.get("ocr_stats"):
+            stats = dict(base["ocr_stats"])
+            for key in ("pages", "pages_reocr", "pages_improved", "low_pass_seconds", "high_pass_seconds"):
+                stats[key] = round(stats.get(key, 0) + extra["ocr_stats"].get(key, 0), 3)
+            merged["ocr_stats"] = stats
+
+        progressive = dict(base.get("progressive") or {})
+        pages_total = progressive.get("pages_total") or extra.get("page_count") or len(merged["pages"])
+        pages_extracted = max((p.get("page_number", 0) for p in merged["pages"]), default=0)
+        progressive.update({
+            "pages_total": pages_total,
+            "pages_extracted": pages_extracted,
+            "next_page": pages_extracted + 1,
+        })
+
+        if pages_extracted >= pages_total:
+            progressive["status"] = "completed"
+            merged["status"] = "success"
+        else:
+            progressive["status"] = "running"
+            merged["status"] = "partial"
+        merged["progressive"] = progressive
+        return self._add_chunks(merged)
+
+    def extract_from_pdf(self, file_path: str, first_page: int = 1, last_page: Optional[int] = None) -> Dict[str, Any]:
         """
         Extract text and metadata from PDF using doctr (primary OCR).
         Falls back to pytesseract only if doctr is unavailable or fails.
+        `first_page`/`last_page` (1-based, inclusive) restrict extraction to a page range.
         """
         try:
             result = {
@@ -124,6 +385,9 @@ class DocumentExtractionService:
                 "metadata": {},
                 "extraction_method": "none"
             }
+            page_count = self.get_pdf_page_count(file_path)
+            if page_count is not None:
+                result["page_count"] = page_count
 
             # PRIMARY: Use doctr OCR for best accuracy
             if HAS_DOCTR:
@@ -131,41 +395,26 @@ class DocumentExtractionService:
                     logger.info(f"Using doctr OCR for PDF: {Path(file_path).name}")
                     ocr_model = self.get_ocr_model()
                     if ocr_model:
-                        doc = DocumentFile.from_pdf(file_path)
-                        ocr_result = ocr_model(doc)
-                        
+                        if HAS_PDFIUM:
+                            pages, words, ocr_stats = self._ocr_pdf_two_pass(file_path, ocr_model, first_page, last_page)
+                            result["ocr_stats"] = ocr_stats
+                        else:
+                            doc = DocumentFile.from_pdf(file_path)[first_page - 1:last_page]
+                            ocr_result = ocr_model(doc)
+                            words = WordGeometryCollector()
+                            pages = [
+                                self._build_page_data(page, first_page + page_idx, words)
+                                for page_idx, page in enumerate(ocr_result.pages)
+                            ]
+
                         full_text = ""
-                        for page_idx, page in enumerate(ocr_result.pages):
-                            page_data = {
-                                "page_number": page_idx + 1,
-                                "text": "",
-                                "blocks": []
-                            }
-                            
-                            page_text = ""
-                            for block in page.blocks:
-                                block_text = ""
-                                block_confidence = 0.0
-                                word_count = 0
-                                
-                                for line in block.lines:
-                                    for word in line.words:
-                                        block_text += word.value + " "
-                                        block_confidence += word.confidence if hasattr(word, 'confidence') else 1.0
-                                        word_count += 1
-                                
-                                if block_text.strip():
-                                    avg_confidence = block_confidence / word_count if word_count > 0 else 0.0
-                                    page_data["blocks"].append({
-                                        "text": block_text.strip(),
-                                        "confidence": float(avg_confidence)
-                                    })
-                                    page_text += block_text + " "
-                            
-                            page_data["text"] = page_text.strip()
-                            full_text += page_text + "\n"
+                        for page_data in pages:
+                            full_text += page_data["text"] + "\n"
                             result["pages"].append(page_data)
                         
+                        result["word_geometry"] = self._store_word_geometry(
+                            file_path, words, first_page, last_page
+                        )
                         result["full_text"] = full_text.strip()
                         result["status"] = "success"
                         result["extraction_method"] = "doctr_ocr"
@@ -180,7 +429,7 @@ class DocumentExtractionService:
                 try:
                     logger.info(f"Falling back to pytesseract for PDF: {Path(file_path).name}")
                     pages_text = []
-                    images = pdf2image.convert_from_path(file_path)
+                    images = pdf2image.convert_from_path(file_path, first_page=first_page, last_page=last_page)
                     
                     for i, img in enumerate(images):
                         text = pytesseract.image_to_string(img)
@@ -188,7 +437,7 @@ class DocumentExtractionService:
                     
                     full_text = "\n".join(pages_text).strip()
                     result["pages"] = [
-                        {"page_number": i + 1, "text": p} for i, p in enumerate(pages_text)
+                        {"page_number": first_page + i, "text": p} for i, p in enumerate(pages_text)
                     ]
                     result["full_text"] = full_text
                     result["status"] = "success"
@@ -202,10 +451,10 @@ class DocumentExtractionService:
             if HAS_PDF2IMAGE:
                 try:
                     logger.info(f"Falling back to basic pdf2image conversion: {Path(file_path).name}")
-                    images = pdf2image.convert_from_path(file_path)
+                    images = pdf2image.convert_from_path(file_path, first_page=first_page, last_page=last_page)
                     result["pages"] = [
                         {
-                            "page_number": i + 1,
+                            "page_number": first_page + i,
                             "has_image": True,
                             "image_size": f"{img.width}x{img.height}"
                         }
@@ -234,8 +483,66 @@ class DocumentExtractionService:
                 "error": str(e)
             }
 
+    def _json_cell(self, value):
+        """Excel cell value as a JSON-serializable scalar ("" for empty cells)"""
+        if value is None:
+            return ""
+        if isinstance(value, float):
+            return "" if value != value else value  # NaN -> ""
+        if isinstance(value, (str, int, bool)):
+            return value
+        if hasattr(value, "isoformat"):
+            return value.isoformat()
+        return str(value)
+
+    def _iter_sheet_rows(self, rows):
+        """Yield non-empty rows as lists of JSON cells (shared by extraction and row paging)"""
+        for row in rows:
+            cells = [self._json_cell(cell) for cell in row]
+            if any(cell != "" for cell in cells):
+                yield cells
+
+    def _pad_row(self, cells: List[Any], columns: List[str]) -> List[Any]:
+        """Align a row with the column list, adding generic columns for overlong rows"""
+        if len(cells) > len(columns):
+            columns += [f"Column_{i}" for i in range(len(columns), len(cells))]
+        return cells + [""] * (len(columns) - len(cells))
+
+    def _columnar_sheet(self, name: str, rows, inline_limit: int) -> Dict[str, Any]:
+        """
+        Build the columnar sheet layout in one pass over `rows`: the first non-empty row
+        gives the columns, the next `inline_limit` rows are kept as arrays and the rest
+        are only counted (they can be paged with read_sheet_rows).
+        """
+        columns: List[str] = []
+        data = []
+        total = 0
+        for row_idx, cells in enumerate(self._iter_sheet_rows(rows)):
+            if row_idx == 0:
+                columns = [str(cell) if cell != "" else f"Column_{i}" for i, cell in enumerate(cells)]
+                continue
+            total += 1
+            if total <= inline_limit:
+                data.append(self._pad_row(cells, columns))
+        # Columns may have grown after earlier rows were stored
+        data = [row + [""] * (len(columns) - len(row)) for row in data]
+
+        return {
+            "name": name,
+            "rows": total,
+            "columns": columns,
+            "layout": "columnar",
+            "data": data,
+            "rows_inline": len(data),
+            "truncated": total > len(data),
+        }
+
     def extract_from_excel(self, file_path: str) -> Dict[str, Any]:
-        """Extract data from Excel files"""
+        """
+        Extract data from Excel files in a single pass over the workbook.
+        Sheets use a columnar layout (column list + row arrays); only the first
+        EXCEL_INLINE_ROWS rows per sheet are stored inline, the rest are paged on demand.
+        """
         try:
             result = {
                 "file_type": "excel",
@@ -243,52 +550,39 @@ class DocumentExtractionService:
                 "sheets": [],
                 "status": "success"
             }
+            inline_limit = settings.EXCEL_INLINE_ROWS
+            is_xls = Path(file_path).suffix.lower() == ".xls"
 
-            # Try pandas first (better for structured data)
-            if HAS_PANDAS:
+            # PRIMARY: openpyxl read-only streaming (one parse of the workbook)
+            if HAS_OPENPYXL and not is_xls:
                 try:
-                    excel_file = pd.ExcelFile(file_path)
-                    for sheet_name in excel_file.sheet_names:
-                        df = pd.read_excel(file_path, sheet_name=sheet_name)
-                        result["sheets"].append({
-                            "name": sheet_name,
-                            "rows": len(df),
-                            "columns": list(df.columns),
-                            "data": df.fillna("").to_dict(orient="records")
-                        })
-                    result["extraction_method"] = "pandas"
+                    workbook = load_workbook(file_path, read_only=True, data_only=True)
+                    try:
+                        for worksheet in workbook.worksheets:
+                            result["sheets"].append(
+                                self._columnar_sheet(worksheet.title, worksheet.iter_rows(values_only=True), inline_limit)
+                            )
+                    finally:
+                        workbook.close()
+                    result["extraction_method"] = "openpyxl_stream"
                     return result
                 except Exception as e:
-                    logger.warning(f"Pandas extraction failed, trying openpyxl: {e}")
+                    logger.warning(f"openpyxl streaming extraction failed, trying pandas: {e}")
+                    result["sheets"] = []
 
-            # Fallback to openpyxl
-            if HAS_OPENPYXL:
+            # Fallback to pandas (.xls), reusing one ExcelFile handle for every sheet
+            if HAS_PANDAS:
                 try:
-                    workbook = load_workbook(file_path)
-                    for sheet_name in workbook.sheetnames:
-                        worksheet = workbook[sheet_name]
-                        rows = []
-                        headers = None
-                        
-                        for row_idx, row in enumerate(worksheet.iter_rows(values_only=True), 1):
-                            if row_idx == 1:
-                                headers = [str(cell) if cell else f"Column_{i}" for i, cell in enumerate(row)]
-                            else:
-                                if headers:
-                                    row_dict = {headers[i]: cell for i, cell in enumerate(row)}
-                                    rows.append(row_dict)
-                        
-                        result["sheets"].append({
-                            "name": sheet_name,
-                            "rows": len(rows),
-                            "columns": headers or [],
-                            "data": rows
-                        })
-                    
-                    result["extraction_method"] = "openpyxl"
+                    with pd.ExcelFile(file_path) as excel_file:
+                        for sheet_name in excel_file.sheet_names:
+                            df = excel_file.parse(sheet_name, header=None)
+                            result["sheets"].append(
+                                self._columnar_sheet(str(sheet_name), df.itertuples(index=False, name=None), inline_limit)
+                            )
+                    result["extraction_method"] = "pandas"
                     return result
                 except Exception as e:
-                    logger.error(f"openpyxl extraction failed: {e}")
+                    logger.error(f"pandas extraction failed: {e}")
 
             result["status"] = "error"
             result["message"] = "Could not extract Excel. Install 'pandas' or 'openpyxl'."
@@ -303,9 +597,71 @@ class DocumentExtractionService:
                 "error": str(e)
             }
 
+    def read_sheet_rows(self, file_path: str, sheet_name: str, offset: int = 0, limit: int = 100) -> Optional[Dict[str, Any]]:
+        """
+        Page through a sheet's data rows (after the header row) without parsing other sheets.
+        Row numbering matches extract_from_excel (empty rows are skipped). Returns None if
+        the sheet does not exist.
+        """
+        if HAS_OPENPYXL and Path(file_path).suffix.lower() != ".xls":
+            workbook = load_workbook(file_path, read_only=True, data_only=True)
+            try:
+                if sheet_name not in workbook.sheetnames:
+                    return None
+                rows = workbook[sheet_name].iter_rows(values_only=True)
+                return self._page_rows(rows, offset, limit)
+            finally:
+                workbook.close()
+
+        if HAS_PANDAS:
+            with pd.ExcelFile(file_path) as excel_file:
+                if sheet_name not in [str(name) for name in excel_file.sheet_names]:
+                    return None
+                df = excel_file.parse(sheet_name, header=None)
+                return self._page_rows(df.itertuples(index=False, name=None), offset, limit)
+
+        raise RuntimeError("Could not read Excel. Install 'pandas' or 'openpyxl'.")
+
+    def _page_rows(self, rows, offset: int, limit: int) -> Dict[str, Any]:
+        columns: List[str] = []
+        data = []
+        has_more = False
+        for row_idx, cells in enumerate(self._iter_sheet_rows(rows)):
+            if row_idx == 0:
+                columns = [str(cell) if cell != "" else f"Column_{i}" for i, cell in enumerate(cells)]
+                continue
+            position = row_idx - 1
+            if position < offset:
+                continue
+            if len(data) == limit:
+                has_more = True
+                break
+            data.append(self._pad_row(cells, columns))
+        return {
+            "columns": columns,
+            "offset": offset,
+            "limit": limit,
+            "data": data,
+            "has_more": has_more,
+        }
+
     def extract_from_docx(self, file_path: str) -> Dict[str, Any]:
         """Extract text and structure from DOCX files"""
         try:
+            # PRIMARY: stream word/document.xml with lxml (bounded memory, no grid rebuilds)
+            if HAS_LXML:
+                try:
+                    parsed = ooxml_parser.parse_docx(file_path)
+                    return {
+                        "file_type": "docx",
+                        "filename": Path(file_path).name,
+                        **parsed,
+                        "status": "success",
+                        "extraction_method": "lxml_ooxml"
+                    }
+                except Exception as e:
+                    logger.warning(f"Streaming DOCX parse failed, trying python-docx: {e}")
+
             if not HAS_PYTHON_DOCX:
                 return {
                     "file_type": "docx",
@@ -321,7 +677,8 @@ class DocumentExtractionService:
                 "paragraphs": [],
                 "tables": [],
                 "full_text": "",
-                "status": "success"
+                "status": "success",
+                "extraction_method": "python_docx"
             }
 
             # Extract paragraphs
@@ -360,6 +717,20 @@ class DocumentExtractionService:
     def extract_from_pptx(self, file_path: str) -> Dict[str, Any]:
         """Extract text and structure from PPTX files"""
         try:
+            # PRIMARY: stream slide XML with lxml (includes grouped shapes and tables)
+            if HAS_LXML:
+                try:
+                    parsed = ooxml_parser.parse_pptx(file_path)
+                    return {
+                        "file_type": "pptx",
+                        "filename": Path(file_path).name,
+                        **parsed,
+                        "status": "success",
+                        "extraction_method": "lxml_ooxml"
+                    }
+                except Exception as e:
+                    logger.warning(f"Streaming PPTX parse failed, trying python-pptx: {e}")
+
             if not HAS_PYTHON_PPTX:
                 return {
                     "file_type": "pptx",
@@ -374,7 +745,8 @@ class DocumentExtractionService:
                 "filename": Path(file_path).name,
                 "slides": [],
                 "full_text": "",
-                "status": "success"
+                "status": "success",
+                "extraction_method": "python_pptx"
             }
 
             full_text = ""
@@ -450,15 +822,15 @@ class DocumentExtractionService:
                     if ocr_model:
                         doc = DocumentFile.from_images(file_path)
                         ocr_result = ocr_model(doc)
-                        
+
+                        words = WordGeometryCollector()
                         full_text = ""
-                        for page in ocr_result.pages:
-                            for block in page.blocks:
-                                for line in block.lines:
-                                    for word in line.words:
-                                        full_text += word.value + " "
-                        
+                        for page_idx, page in enumerate(ocr_result.pages):
+                            page_data = self._build_page_data(page, page_idx + 1, words)
+                            full_text += page_data["text"] + " "
+
                         result["full_text"] = full_text.strip()
+                        result["word_geometry"] = self._store_word_geometry(file_path, words)
                         result["status"] = "success"
                         result["extraction_method"] = "doctr_ocr"
                         logger.info(f"✓ Successfully extracted image using doctr: {Path(file_path).name}")
@@ -0,0 +1,417 @@
+"""
+Rule-based eligibility prefilter run before LLM scoring.
+
+A tender, or its tender type, declares hard pass/fail rules in
+eligibility_rules:
+
+- regex:  pattern must (operator "matches") or must not ("not_matches") occur
+- number: values must satisfy >=, >, <=, <, == or between against `value`
+- date:   same operators against an ISO date or "today"
+
+over a vendor's materialized corpus (source "text"), a typed field of the
+vendor's form data (source "field", dotted path) or a typed fact extracted from
+its documents (source "fact", e.g. field "annual_turnover"). For number and date rules
+over text, the pattern locates the value: its first group (or the whole
+match) is parsed, e.g. ``turnover[^.]{0,60}?([\\d,.]+\\s*(?:crore|lakh|million))``.
+Amounts understand thousand/lakh/crore/million/billion, so "5.2 crore" is
+52000000. A vendor passes a value rule if any value found satisfies it; when
+nothing is found the rule's on_missing decides ("pass" by default, so only
+evidence rejects a vendor).
+
+Rules are compiled once (regexes, parsed bounds) and evaluated for all vendors
+of a run together: the extracted values form a (vendors, matches) array that
+is compared in one NumPy operation per rule, giving a (vendors, rules) pass
+matrix. Rejected vendors are recorded with the failing rules and never reach
+the LLM.
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Pattern, Sequence, Tuple
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+try:
+    from dateutil import parser as date_parser
+    HAS_DATEUTIL = True
+except ImportError:
+    HAS_DATEUTIL = False
+
+from fastapi import HTTPException
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.upload_models import EligibilityRule, Tender
+
+logger = logging.getLogger(__name__)
+
+SOURCES = ("text", "field", "fact")
+KINDS = ("regex", "number", "date")
+REGEX_OPERATORS = ("matches", "not_matches")
+VALUE_OPERATORS = (">=", ">", "<=", "<", "==", "between")
+
+NUMBER = re.compile(
+    r"(\d[\d,]*(?:\.\d+)?)\s*(crores?|cr|lakhs?|lacs?|thousand|k|millions?|mn|billions?|bn)?\b",
+    re.IGNORECASE,
+)
+MULTIPLIERS = {
+    "crore": 1e7, "crores": 1e7, "cr": 1e7,
+    "lakh": 1e5, "lakhs": 1e5, "lac": 1e5, "lacs": 1e5,
+    "thousand": 1e3, "k": 1e3,
+    "million": 1e6, "millions": 1e6, "mn": 1e6,
+    "billion": 1e9, "billions": 1e9, "bn": 1e9,
+}
+ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}(?!\d)")
+
+
+def parse_number(text: Any) -> Optional[float]:
+    """First amount in `text` with its magnitude word applied ("5.2 crore" -> 52000000.0)"""
+    if isinstance(text, (int, float)) and not isinstance(text, bool):
+        return float(text)
+    match = NUMBER.search(str(text))
+    if match is None:
+        return None
+    try:
+        number = float(match.group(1).replace(",", ""))
+    except ValueError:
+        return None
+    return number * MULTIPLIERS.get((match.group(2) or "").lower(), 1.0)
+
+
+def parse_date(text: Any) -> Optional[date]:
+    """Date in `text` (day-first unless ELIGIBILITY_DATES_DAYFIRST is off); None when unparseable"""
+    if isinstance(text, datetime):
+        return text.date()
+    if isinstance(text, date):
+        return text
+    text = str(text).strip()
+    if not text:
+        return None
+    if text.lower() == "today":
+        return date.today()
+    # ISO dates (stored rule bounds, API input) are year-month-day whatever dayfirst says
+    if not HAS_DATEUTIL or ISO_DATE.match(text):
+        try:
+            return date.fromisoformat(text[:10])
+        except ValueError:
+            return None
+    try:
+        return date_parser.parse(text, dayfirst=settings.ELIGIBILITY_DATES_DAYFIRST, fuzzy=True).date()
+    except (ValueError, OverflowError):
+        return None
+
+
+def _field(fields: Any, path: str) -> Any:
+    for part in path.split("."):
+        if isinstance(fields, dict):
+            fields = fields.get(part)
+        elif isinstance(fields, list) and part.isdigit() and int(part) < len(fields):
+            fields = fields[int(part)]
+        else:
+            return None
+    return fields
+
+
+@dataclass
+class CompiledRule:
+    id: int
+    name: str
+    source: str
+    field: Optional[str]
+    kind: str
+    pattern: Optional[Pattern]
+    operator: str
+    bounds: Tuple[float, ...]  # numbers, or date ordinals
+    on_missing: str
+
+    def _parse(self, raw: Any) -> Optional[float]:
+        if self.kind == "number":
+            return parse_number(raw)
+        parsed = parse_date(raw)
+        return float(parsed.toordinal()) if parsed else None
+
+    def _texts(self, vendor: Dict[str, Any]) -> List[str]:
+        if self.source == "text":
+            return [vendor.get("corpus") or ""]
+        value = _field(vendor.get("fields") or {}, self.field)
+        if value is None:
+            return []
+        return [str(v) for v in value] if isinstance(value, list) else [str(value)]
+
+    def matches(self, vendor: Dict[str, Any]) -> Optional[str]:
+        """Matched text of a regex rule, or None"""
+        for text in self._texts(vendor):
+            match = self.pattern.search(text)
+            if match:
+                return match.group(0)
+        return None
+
+    def values(self, vendor: Dict[str, Any]) -> List[float]:
+        """Parsed values a number/date rule finds for a vendor (up to ELIGIBILITY_MAX_MATCHES)"""
+        found = []
+        if self.source == "fact":
+            raws = (vendor.get("facts") or {}).get(self.field) or []
+        elif self.source == "field" and self.pattern is None:
+            raws = _field(vendor.get("fields") or {}, self.field)
+            raws = raws if isinstance(raws, list) else ([] if raws is None else [raws])
+        else:
+            raws = [
+                match.group(1) if match.groups() else match.group(0)
+                for text in self._texts(vendor)
+                for match in self.pattern.finditer(text)
+            ]
+        for raw in raws:
+            value = self._parse(raw)
+            if value is not None:
+                found.append(value)
+                if len(found) >= settings.ELIGIBILITY_MAX_MATCHES:
+                    break
+        return found
+
+    def compare(self, values: "np.ndarray") -> "np.ndarray":
+        """Element-wise test of a (vendors, matches) value array; NaN padding never passes"""
+        with np.errstate(invalid="ignore"):
+            if self.operator == ">=":
+                return values >= self.bounds[0]
+            if self.operator == ">":
+                return values > self.bounds[0]
+            if self.operator == "<=":
+                return values <= self.bounds[0]
+            if self.operator == "<":
+                return values < self.bounds[0]
+            if self.operator == "==":
+                return np.isclose(values, self.bounds[0])
+            return (values >= self.bounds[0]) & (values <= self.bounds[1])
+
+    def describe(self, value: float) -> str:
+        return date.fromordinal(int(value)).isoformat() if self.kind == "date" else f"{value:,.2f}".rstrip("0").rstrip(".")
+
+    def requirement(self) -> str:
+        if self.operator == "between":
+            return f"between {self.describe(self.bounds[0])} and {self.describe(self.bounds[1])}"
+        return f"{self.operator} {self.describe(self.bounds[0])}"
+
+
+class RuleSet:
+    """A tender's compiled rules, screened against many vendors at once"""
+
+    def __init__(self, rules: Sequence[CompiledRule]):
+        self.rules = list(rules)
+
+    def __bool__(self) -> bool:
+        return bool(self.rules)
+
+    def screen(self, vendors: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Per vendor: {eligible, rejections: [{rule_id, rule, reason}], missing: [rule names]}"""
+        if not self.rules or not vendors or not HAS_NUMPY:
+            return [{"eligible": True, "rejections": [], "missing": []} for _ in vendors]
+
+        n = len(vendors)
+        passed = np.ones((n, len(self.rules)), dtype=bool)
+        missing = np.zeros((n, len(self.rules)), dtype=bool)
+        details: List[List[Any]] = []
+        for j, rule in enumerate(self.rules):
+            if rule.kind == "regex":
+                found = [rule.matches(vendor) for vendor in vendors]
+                hit = np.array([f is not None for f in found], dtype=bool)
+                passed[:, j] = hit if rule.operator == "matches" else ~hit
+                details.append(found)
+                continue
+            candidates = [rule.values(vendor) for vendor in vendors]
+            values = np.full((n, max(1, max(len(c) for c in candidates))), np.nan)
+            for i, found in enumerate(candidates):
+                values[i, :len(found)] = found
+            has_value = ~np.isnan(values).all(axis=1)
+            passed[:, j] = np.where(has_value, rule.compare(values).any(axis=1), rule.on_missing == "pass")
+            missing[:, j] = ~has_value
+            details.append(candidates)
+
+        eligible = passed.all(axis=1)
+        screening = []
+        for i in range(n):
+            rejections = [
+                {"rule_id": rule.id, "rule": rule.name, "reason": self._reason(rule, details[j][i])}
+                for j, rule in enumerate(self.rules) if not passed[i, j]
+            ]
+            screening.append({
+                "eligible": bool(eligible[i]),
+                "rejections": rejections,
+                "missing": [rule.name for j, rule in enumerate(self.rules) if missing[i, j]],
+            })
+        return screening
+
+    def _reason(self, rule: CompiledRule, detail: Any) -> str:
+        if rule.kind == "regex":
+            if rule.operator == "matches":
+                return "required text not found"
+            return f"disqualifying text found: \"{detail[:120]}\""
+        if not detail:
+            return f"no {rule.kind} found (requires {rule.requirement()})"
+        found = ", ".join(rule.describe(v) for v in detail[:5])
+        return f"found {found}; requires {rule.requirement()}"
+
+
+def rejection_result(vendor: Dict[str, Any], screening: Dict[str, Any], criteria: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Evaluation result of a vendor rejected by the prefilter (no LLM scores)"""
+    return {
+        "vendor_id": vendor["id"],
+        "vendor_name": vendor["name"],
+        "overall_score": 0.0,
+        "qualification_status": "Disqualified",
+        "rating": "POOR",
+        "criteria_scores": {},
+        "evaluation_date": datetime.utcnow().isoformat(),
+        "scoring_method": "eligibility",
+        "eligibility": screening,
+        "criteria_used": [{"id": c["id"], "name": c["name"]} for c in criteria],
+    }
+
+
+class EligibilityService:
+    def __init__(self):
+        self._compiled: Dict[Tuple[int, Any, date], CompiledRule] = {}
+
+    # ------------------------------------------------------------------ rules
+
+    def _validate(self, values: Dict[str, Any]):
+        """Reject inconsistent rules up front; raises HTTPException(400)"""
+        source, kind, operator = values.get("source"), values.get("kind"), values.get("operator")
+        if source not in SOURCES or kind not in KINDS:
+            raise HTTPException(status_code=400, detail=f"source must be one of {SOURCES}, kind one of {KINDS}")
+        if source == "field" and not values.get("field"):
+            raise HTTPException(status_code=400, detail="Field rules need a field path")
+        if source == "fact" and (not values.get("field") or kind == "regex"):
+            raise HTTPException(status_code=400, detail="Fact rules need a fact name as field and a number or date kind")
+        if (source == "text" or kind == "regex") and not values.get("pattern"):
+            raise HTTPException(status_code=400, detail="Text and regex rules need a pattern")
+        if values.get("pattern"):
+            try:
+                re.compile(values["pattern"])
+            except re.error as e:
+                raise HTTPException(status_code=400, detail=f"Invalid pattern: {e}")
+        allowed = REGEX_OPERATORS if kind == "regex" else VALUE_OPERATORS
+        if operator not in allowed:
+            raise HTTPException(status_code=400, detail=f"{kind} rules take operators {allowed}")
+        if kind != "regex":
+            self._bounds(kind, operator, values.get("value"))
+
+    def _bounds(self, kind: str, operator: str, value: Any) -> Tuple[float, ...]:
+        raw = value if operator == "between" else [value]
+        if not isinstance(raw, list) or len(raw) != (2 if operator == "between" else 1):
+            raise HTTPException(status_code=400, detail="between takes [low, high]; other operators a single value")
+        bounds = []
+        for item in raw:
+            if kind == "number":
+                parsed = parse_number(item)
+            else:
+                parsed_date = parse_date(item)
+                parsed = float(parsed_date.toordinal()) if parsed_date else None
+            if parsed is None:
+                raise HTTPException(status_code=400, detail=f"Cannot parse {kind} value {item!r}")
+            bounds.append(parsed)
+        return tuple(bounds)
+
+    def create_rule(self, db: Session, values: Dict[str, Any]) -> EligibilityRule:
+        if not values.get("tenderid") and not values.get("tender_type_id"):
+            raise HTTPException(status_code=400, detail="A rule belongs to a tender or a tender type")
+        self._validate(values)
+        rule = EligibilityRule(**values)
+        db.add(rule)
+        db.commit()
+        db.refresh(rule)
+        return rule
+
+    def update_rule(self, db: Session, rule_id: int, changes: Dict[str, Any]) -> Optional[EligibilityRule]:
+        rule = db.query(EligibilityRule).filter(EligibilityRule.id == rule_id).first()
+        if rule is None:
+            return None
+        merged = {column: getattr(rule, column) for column in ("source", "field", "kind", "pattern", "operator", "value")}
+        merged.update(changes)
+        self._validate(merged)
+        for key, value in changes.items():
+            setattr(rule, key, value)
+        db.commit()
+        db.refresh(rule)
+        return rule
+
+    def delete_rule(self, db: Session, rule_id: int) -> bool:
+        deleted = db.query(EligibilityRule).filter(EligibilityRule.id == rule_id).delete(synchronize_session=False)
+        db.commit()
+        return bool(deleted)
+
+    def rules_for(self, db: Session, tender: Tender, active_only: bool = True) -> List[EligibilityRule]:
+        """The tender's own rules plus those of its tender type"""
+        scope = EligibilityRule.tenderid == tender.tenderid
+        if tender.tender_type_id is not None:
+            scope = or_(scope, EligibilityRule.tender_type_id == tender.tender_type_id)
+        query = db.query(EligibilityRule).filter(scope)
+        if active_only:
+            query = query.filter(EligibilityRule.is_active == True)
+        return query.order_by(EligibilityRule.id).all()
+
+    # ------------------------------------------------------------------ screening
+
+    def compile(self, rule: EligibilityRule) -> CompiledRule:
+        # Keyed on the update time (and day, for "today" bounds) so edits recompile
+        key = (rule.id, rule.updateddate, date.today())
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            compiled = CompiledRule(
+                id=rule.id,
+                name=rule.name,
+                source=rule.source,
+                field=rule.field,
+                kind=rule.kind,
+                pattern=re.compile(rule.pattern, re.IGNORECASE) if rule.pattern else None,
+                operator=rule.operator,
+                bounds=() if rule.kind == "regex" else self._bounds(rule.kind, rule.operator, rule.value),
+                on_missing=rule.on_missing,
+            )
+            self._compiled = {k: v for k, v in self._compiled.items() if k[0] != rule.id}
+            self._compiled[key] = compiled
+        return compiled
+
+    def rule_set(self, db: Session, tender: Tender) -> RuleSet:
+        rules = []
+        for rule in self.rules_for(db, tender):
+            try:
+                rules.append(self.compile(rule))
+            except HTTPException as e:
+                logger.warning(f"Skipping eligibility rule {rule.id} ({rule.name}): {e.detail}")
+        return RuleSet(rules)
+
+    def screen(self, db: Session, tenderid: int, vendors: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Screening of vendors_data entries against the tender's active rules (all eligible when disabled)"""
+        tender = db.query(Tender).filter(Tender.tenderid == tenderid).first()
+        if tender is None or not settings.ELIGIBILITY_PREFILTER:
+            return RuleSet([]).screen(vendors)
+        return self.rule_set(db, tender).screen(vendors)
+
+    def rule_dict(self, rule: EligibilityRule) -> Dict[str, Any]:
+        return {
+            "id": rule.id,
+            "tenderid": rule.tenderid,
+            "tender_type_id": rule.tender_type_id,
+            "name": rule.name,
+            "description": rule.description,
+            "source": rule.source,
+            "field": rule.field,
+            "kind": rule.kind,
+            "pattern": rule.pattern,
+            "operator": rule.operator,
+            "value": rule.value,
+            "on_missing": rule.on_missing,
+            "is_active": rule.is_active,
+            "updateddate": rule.updateddate,
+        }
+
+
+# Global eligibility service instance
+eligibility_service = EligibilityService()
@@ -0,0 +1,348 @@
+"""
+Persistent embedding index for attachment chunks.
+
+When an attachment's extraction finishes, its chunks (form_data["chunks"] spans
+over the extracted text) are embedded once. Chunk metadata and text go to the attachment_chunks table; the
+vectors go to a ``<file>.emb/`` sidecar next to the upload:
+
+    vectors.npy   float16 (N, dim), or int8 (N, dim) with EMBEDDING_STORE_DTYPE=int8
+    scales.npy    float32 (N,)  per-row dequantisation scale (int8 only)
+    meta.json     model, dtype, dim, count
+
+Vendor corpora (see vendor_corpus_service) get the same sidecar under
+VENDOR_CORPUS_VECTOR_DIR, with the corpus text fingerprint in meta.json, so
+evaluations retrieve from the boilerplate-stripped corpus without re-embedding
+it, in any process and across restarts.
+
+Vectors are memory-mapped on read and kept in their stored dtype; scoring
+dequantises them block by block, so repeated evaluations and searches never
+re-embed or copy a whole sidecar into memory.
+"""
+
+import json
+import logging
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.upload_models import AttachmentChunk, TenderAttachment, VendorAttachment
+from app.services.document_extraction_service import extracted_text
+from app.services.evaluation_cache import text_fingerprint
+from app.services.embedding_service import (
+    ChunkSet, StoredVectors, chunk_spans, chunk_text, embedding_service, similarity, top_k_from_scores,
+)
+
+logger = logging.getLogger(__name__)
+
+SIDECAR_SUFFIX = ".emb"
+
+
+def attachment_type_of(model) -> str:
+    return "tender" if model is TenderAttachment else "vendor"
+
+
+def attachment_id_of(attachment) -> int:
+    if isinstance(attachment, TenderAttachment):
+        return attachment.tenderattachmentsid
+    return attachment.vendorattachmentid
+
+
+def successful_extractions(attachments):
+    """(attachment, extracted text) for attachments whose extraction succeeded"""
+    for attachment in attachments:
+        form_data = attachment.form_data or {}
+        text = extracted_text(form_data) if form_data.get("status") == "success" else ""
+        if text.strip():
+            yield attachment, text
+
+
+def documents_fingerprint(docs) -> str:
+    """Hash of (attachment id, extracted text) pairs: changes when a document is added, deleted or re-extracted"""
+    return text_fingerprint("\n".join(
+        f"{attachment_id_of(attachment)}:{text_fingerprint(text)}" for attachment, text in docs
+    ))
+
+
+class EmbeddingIndexService:
+    def __init__(self):
+        # One worker: embedding is CPU/GPU bound and the model is shared
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-index")
+
+    # ------------------------------------------------------------------ vector files
+
+    def sidecar_path(self, file_path: str) -> Path:
+        return Path(f"{file_path}{SIDECAR_SUFFIX}")
+
+    def _write_vectors(self, file_path: str, vectors: "np.ndarray", **extra: Any) -> Dict[str, Any]:
+        sidecar = self.sidecar_path(file_path)
+        sidecar.mkdir(parents=True, exist_ok=True)
+        dtype = settings.EMBEDDING_STORE_DTYPE
+        if dtype == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            stored = np.round(vectors / scales[:, None]).astype(np.int8)
+            np.save(sidecar / "scales.npy", scales.astype(np.float32), allow_pickle=False)
+        else:
+            dtype = "float16"
+            stored = vectors.astype(np.float16)
+        np.save(sidecar / "vectors.npy", stored, allow_pickle=False)
+
+        meta = {
+            "model": settings.EMBEDDING_MODEL,
+            "dtype": dtype,
+            "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+            "count": int(vectors.shape[0]),
+            "bytes": int(stored.nbytes),
+            **extra,
+        }
+        with open(sidecar / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        return {"path": str(sidecar), **meta}
+
+    def load_vectors(self, file_path: str, fingerprint: Optional[str] = None) -> Optional[StoredVectors]:
+        """
+        Memory-mapped (N, dim) vectors for a file, or None if missing, built with another
+        model, or (when `fingerprint` is given) built from other text
+        """
+        if not HAS_NUMPY:
+            return None
+        sidecar = self.sidecar_path(file_path)
+        try:
+            with open(sidecar / "meta.json", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("model") != settings.EMBEDDING_MODEL:
+            return None
+        if fingerprint is not None and meta.get("fingerprint") != fingerprint:
+            return None
+
+        vectors = np.load(sidecar / "vectors.npy", mmap_mode="r", allow_pickle=False)
+        scales = None
+        if meta.get("dtype") == "int8":
+            scales = np.load(sidecar / "scales.npy", mmap_mode="r", allow_pickle=False)
+        return StoredVectors(vectors, scales)
+
+    def delete(self, db: Session, model, attachment):
+        """Drop an attachment's chunk rows and vector sidecar (caller commits)"""
+        db.query(AttachmentChunk).filter(
+            AttachmentChunk.attachment_type == attachment_type_of(model),
+            AttachmentChunk.attachment_id == attachment_id_of(attachment),
+        ).delete(synchronize_session=False)
+        if attachment.filepath:
+            sidecar = self.sidecar_path(attachment.filepath)
+            if sidecar.exists():
+                shutil.rmtree(sidecar, ignore_errors=True)
+
+    # ------------------------------------------------------------------ indexing
+
+    def index_attachment(self, db: Session, model, attachment) -> Optional[Dict[str, Any]]:
+        """Embed an extracted attachment's chunks and persist rows + vectors (caller commits)"""
+        form_data = attachment.form_data or {}
+        full_text = extracted_text(form_data)
+        if form_data.get("status") != "success" or not full_text.strip():
+            return None
+
+        spans = (form_data.get("chunks") or {}).get("spans")
+        if spans is None:
+            spans = [list(span) for span in chunk_spans(full_text)]
+        texts = chunk_text(full_text, spans)
+        keep = [i for i, t in enumerate(texts) if t]
+        spans = [spans[i] for i in keep]
+        texts = [texts[i] for i in keep]
+        if not texts:
+            return None
+
+        vectors = embedding_service.embed(texts)
+
+        if isinstance(attachment, TenderAttachment):
+            tenderid, vendorid = attachment.tenderid, None
+        else:
+            tenderid, vendorid = attachment.vendor.tenderid, attachment.vendorid
+
+        self.delete(db, model, attachment)
+        db.add_all([
+            AttachmentChunk(
+                attachment_type=attachment_type_of(model),
+                attachment_id=attachment_id_of(attachment),
+                tenderid=tenderid,
+                vendorid=vendorid,
+                chunk_index=index,
+                start_char=start,
+                end_char=end,
+                text=text,
+                embedding_model=settings.EMBEDDING_MODEL,
+            )
+            for index, ((start, end), text) in enumerate(zip(spans, texts))
+        ])
+        summary = self._write_vectors(attachment.filepath, vectors)
+
+        updated = dict(form_data)
+        updated["embedding_index"] = summary
+        attachment.form_data = updated
+        return summary
+
+    @property
+    def available(self) -> bool:
+        return HAS_NUMPY and embedding_service.available
+
+    def schedule(self, model, attachment_id: int):
+        """Index an attachment in the background once its extraction has finished"""
+        if not self.available:
+            return None
+        return self.executor.submit(self._index_job, model, attachment_id)
+
+    def _index_job(self, model, attachment_id: int):
+        db = SessionLocal()
+        try:
+            attachment = db.get(model, attachment_id)
+            if attachment is None:
+                return
+            summary = self.index_attachment(db, model, attachment)
+            db.commit()
+            if summary:
+                logger.info(f"Indexed {summary['count']} chunks of {model.__name__} {attachment_id}")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Embedding index failed for {model.__name__} {attachment_id}: {e}")
+        finally:
+            db.close()
+
+    # ------------------------------------------------------------------ vendor corpora
+
+    def corpus_chunks(self, text: str) -> List[str]:
+        """Retrieval chunks of a vendor corpus text"""
+        return [chunk for chunk in chunk_text(text.strip()) if chunk]
+
+    def _corpus_file(self, vendorid: int) -> str:
+        return os.path.join(settings.VENDOR_CORPUS_VECTOR_DIR, f"vendor_{vendorid}")
+
+    def index_corpus(self, corpus) -> Optional[Dict[str, Any]]:
+        """Embed a vendor corpus's chunks and store them keyed by the corpus text; no-op if already stored"""
+        if not self.available or not corpus.text:
+            return None
+        fingerprint = text_fingerprint(corpus.text)
+        file_path = self._corpus_file(corpus.vendorid)
+        if self.load_vectors(file_path, fingerprint) is not None:
+            return None
+        texts = self.corpus_chunks(corpus.text)
+        if not texts:
+            return None
+        return self._write_vectors(file_path, embedding_service.embed(texts), fingerprint=fingerprint)
+
+    def load_corpus_chunks(self, corpus) -> Optional[ChunkSet]:
+        """A vendor corpus's chunks with their stored vectors, or None if not indexed for its current text"""
+        if not HAS_NUMPY or corpus is None or not corpus.text:
+            return None
+        vectors = self.load_vectors(self._corpus_file(corpus.vendorid), text_fingerprint(corpus.text))
+        if vectors is None:
+            return None
+        texts = self.corpus_chunks(corpus.text)
+        if len(texts) != len(vectors):
+            return None
+        return ChunkSet(texts, [vectors])
+
+    # ------------------------------------------------------------------ lookup
+
+    def load_chunk_set(self, db: Session, model, attachments: Sequence) -> Optional[ChunkSet]:
+        """
+        Indexed chunks of several attachments as one ChunkSet (texts in attachment/chunk
+        order with their stored vectors). None if any attachment is not indexed with
+        the current embedding model, so the caller falls back to on-the-fly chunking.
+        """
+        if not attachments or not HAS_NUMPY:
+            return None
+        texts: List[str] = []
+        blocks = []
+        for attachment in attachments:
+            vectors = self.load_vectors(attachment.filepath) if attachment.filepath else None
+            rows = (
+                db.query(AttachmentChunk.text)
+                .filter(
+                    AttachmentChunk.attachment_type == attachment_type_of(model),
+                    AttachmentChunk.attachment_id == attachment_id_of(attachment),
+                    AttachmentChunk.embedding_model == settings.EMBEDDING_MODEL,
+                )
+                .order_by(AttachmentChunk.chunk_index)
+                .all()
+            )
+            if vectors is None or len(rows) != len(vectors):
+                return None
+            label = attachment.filename or "Unknown"
+            texts.extend(f"[{label}] {row.text}" for row in rows)
+            blocks.append(vectors)
+        return ChunkSet(texts, blocks or None)
+
+    def search(
+        self, db: Session, tenderid: int, queries: Sequence[str], k: int, scope: str = "all"
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Top-k chunks per query across every indexed attachment of a tender
+        (scope: tender | vendor | all), as one vectorized matrix product.
+        """
+        query = db.query(AttachmentChunk).filter(
+            AttachmentChunk.tenderid == tenderid,
+            AttachmentChunk.embedding_model == settings.EMBEDDING_MODEL,
+        )
+        if scope in ("tender", "vendor"):
+            query = query.filter(AttachmentChunk.attachment_type == scope)
+        rows = query.order_by(
+            AttachmentChunk.attachment_type, AttachmentChunk.attachment_id, AttachmentChunk.chunk_index
+        ).all()
+
+        # Group rows per attachment with that attachment's memmapped vectors
+        models = {"tender": TenderAttachment, "vendor": VendorAttachment}
+        metas, blocks = [], []
+        start = 0
+        while start < len(rows):
+            first = rows[start]
+            stop = start
+            while stop < len(rows) and (rows[stop].attachment_type, rows[stop].attachment_id) == (
+                first.attachment_type, first.attachment_id
+            ):
+                stop += 1
+            attachment = db.get(models[first.attachment_type], first.attachment_id)
+            vectors = self.load_vectors(attachment.filepath) if attachment is not None else None
+            if vectors is not None and len(vectors) == stop - start:
+                blocks.append(vectors)
+                metas.extend(rows[start:stop])
+            start = stop
+
+        if not blocks:
+            return [[] for _ in queries]
+
+        query_vectors = embedding_service.embed(list(queries))
+        scores = similarity(query_vectors, blocks)
+        top = top_k_from_scores(scores, k)
+        return [
+            [
+                {
+                    "attachment_type": metas[i].attachment_type,
+                    "attachment_id": metas[i].attachment_id,
+                    "vendorid": metas[i].vendorid,
+                    "chunk_index": metas[i].chunk_index,
+                    "start_char": metas[i].start_char,
+                    "end_char": metas[i].end_char,
+                    "score": round(float(scores[q, i]), 4),
+                    "text": metas[i].text,
+                }
+                for i in (int(j) for j in row)
+            ]
+            for q, row in enumerate(top)
+        ]
+
+
+# Global embedding index service instance
+embedding_index_service = EmbeddingIndexService()
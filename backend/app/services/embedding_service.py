@@ -0,0 +1,240 @@
+"""
+Chunking and embedding-based retrieval of evaluation context.
+
+Extracted text is split into overlapping chunks at ingestion time (the spans
+are stored in form_data["chunks"]). At evaluation time each criterion is
+embedded as a query and only the top-k most similar tender and vendor chunks
+are put into the prompt, so evidence deep inside long bids is found instead
+of whatever happens to be in the first few thousand characters.
+
+sentence-transformers is imported lazily on first use; when it is missing or
+retrieval is disabled, callers fall back to the head of the document.
+"""
+
+import hashlib
+import importlib.util
+import logging
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+from app.core.config import settings
+
+HAS_SENTENCE_TRANSFORMERS = importlib.util.find_spec("sentence_transformers") is not None
+
+logger = logging.getLogger(__name__)
+
+# Preferred break points when a chunk has to end early, strongest first
+_BREAKS = (re.compile(r"\n\s*\n"), re.compile(r"[.!?]\s"), re.compile(r"\s"))
+
+
+def chunk_spans(text: str, size: Optional[int] = None, overlap: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Split `text` into (start, end) character spans of at most `size` characters that
+    overlap by about `overlap`, ending on a paragraph, sentence or word boundary where
+    one exists in the second half of the window.
+    """
+    size = size or settings.CHUNK_CHARS
+    overlap = min(overlap if overlap is not None else settings.CHUNK_OVERLAP_CHARS, size // 2)
+    spans = []
+    start, length = 0, len(text)
+    while start < length:
+        end = min(start + size, length)
+        if end < length:
+            window = text[start + size // 2:end]
+            for pattern in _BREAKS:
+                matches = list(pattern.finditer(window))
+                if matches:
+                    end = start + size // 2 + matches[-1].end()
+                    break
+        if text[start:end].strip():
+            spans.append((start, end))
+        if end >= length:
+            break
+        next_start = max(end - overlap, start + 1)
+        # Begin the overlap on a word boundary rather than mid-word
+        boundary = _BREAKS[-1].search(text, next_start, end)
+        start = boundary.end() if boundary else next_start
+    return spans
+
+
+def chunk_text(text: str, spans: Optional[Sequence[Sequence[int]]] = None) -> List[str]:
+    """Chunk strings for `text`, using stored ingestion spans when they are given"""
+    spans = spans if spans is not None else chunk_spans(text)
+    return [text[start:end].strip() for start, end in spans]
+
+
+def top_k_from_scores(scores: "np.ndarray", k: int) -> "np.ndarray":
+    """Column indices of the k largest scores in each row, best first"""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.zeros((scores.shape[0], 0), dtype=np.int64)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1)
+
+
+# Rows of a stored vector file converted to float32 at a time when scoring
+SCORE_BLOCK_ROWS = 4096
+
+
+@dataclass
+class StoredVectors:
+    """
+    Memory-mapped vectors of one sidecar in their stored dtype (float16, or int8 with
+    per-row scales). Rows are dequantised block by block while scoring, so a
+    search never copies the whole file into memory.
+    """
+    data: "np.ndarray"
+    scales: Optional["np.ndarray"] = None
+
+    def __len__(self) -> int:
+        return int(self.data.shape[0])
+
+    def block(self, start: int, stop: int) -> "np.ndarray":
+        rows = self.data[start:stop].astype(np.float32)
+        if self.scales is not None:
+            rows *= self.scales[start:stop, None]
+        return rows
+
+    def scores(self, queries: "np.ndarray") -> "np.ndarray":
+        """(len(queries), len(self)) dot products"""
+        return np.concatenate(
+            [queries @ self.block(start, start + SCORE_BLOCK_ROWS).T for start in range(0, len(self), SCORE_BLOCK_ROWS)]
+            or [np.zeros((queries.shape[0], 0), dtype=np.float32)],
+            axis=1,
+        )
+
+
+def similarity(queries: "np.ndarray", vectors: Union["np.ndarray", Sequence[StoredVectors]]) -> "np.ndarray":
+    """Query-by-row scores against an in-memory matrix or a sequence of stored vector files"""
+    if isinstance(vectors, np.ndarray):
+        return queries @ vectors.T
+    return np.concatenate([stored.scores(queries) for stored in vectors], axis=1)
+
+
+@dataclass
+class ChunkSet:
+    """Chunk texts plus, when they come from the persistent index, their stored vectors (one per attachment)"""
+    texts: List[str]
+    vectors: Optional[Sequence[StoredVectors]] = None
+
+    @classmethod
+    def coerce(cls, chunks: Union["ChunkSet", Sequence[str], None]) -> Optional["ChunkSet"]:
+        if chunks is None or isinstance(chunks, ChunkSet):
+            return chunks
+        return cls(list(chunks))
+
+
+class EmbeddingService:
+    """Lazily loaded sentence-transformers encoder with an in-process vector cache"""
+
+    def __init__(self):
+        self.model = None
+        self.load_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+    @property
+    def available(self) -> bool:
+        return (
+            settings.RETRIEVAL_ENABLED
+            and HAS_NUMPY
+            and HAS_SENTENCE_TRANSFORMERS
+            and self.load_error is None
+        )
+
+    def _get_model(self):
+        with self._lock:
+            if self.model is None and self.load_error is None:
+                try:
+                    from sentence_transformers import SentenceTransformer
+
+                    self.model = SentenceTransformer(settings.EMBEDDING_MODEL, device=settings.EMBEDDING_DEVICE or None)
+                    logger.info(f"Embedding model {settings.EMBEDDING_MODEL} loaded")
+                except Exception as e:
+                    self.load_error = str(e)
+                    logger.error(f"Failed to load embedding model {settings.EMBEDDING_MODEL}: {e}")
+            return self.model
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        """L2-normalised float32 vectors (len(texts), dim); repeated texts are served from the cache"""
+        model = self._get_model()
+        if model is None:
+            raise RuntimeError(f"Embedding model unavailable: {self.load_error}")
+
+        keys = [hashlib.sha256(t.encode("utf-8")).hexdigest() for t in texts]
+        # Hits are copied under the lock: another thread may evict them before the rows are stacked
+        with self._cache_lock:
+            found = {k: self._cache[k] for k in keys if k in self._cache}
+        missing = list(OrderedDict.fromkeys(k for k in keys if k not in found))
+        if missing:
+            by_key = dict(zip(keys, texts))
+            vectors = model.encode(
+                [by_key[k] for k in missing],
+                batch_size=settings.EMBEDDING_BATCH_SIZE,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            ).astype(np.float32)
+            fresh = dict(zip(missing, vectors))
+        else:
+            fresh = {}
+
+        found.update(fresh)
+        rows = [found[k] for k in keys]
+        with self._cache_lock:
+            self._cache.update(found)
+            for key in keys:
+                self._cache.move_to_end(key)
+            while len(self._cache) > settings.EMBEDDING_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        if not rows:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack(rows)
+
+    def top_k(self, queries: "np.ndarray", vectors, k: int) -> "np.ndarray":
+        """Indices of the top-k rows of `vectors` for each query row (cosine; inputs normalised)"""
+        return top_k_from_scores(similarity(queries, vectors), k)
+
+    def retrieve(self, queries: Sequence[str], chunks: Union[ChunkSet, Sequence[str]], k: Optional[int] = None) -> List[int]:
+        """
+        Union of the top-k chunks for every query, ordered by best rank across queries
+        (so the packer keeps each criterion's strongest evidence first when it truncates).
+        Stored vectors of a ChunkSet are used as-is; plain texts are embedded.
+        """
+        chunks = ChunkSet.coerce(chunks)
+        if not chunks.texts or not queries:
+            return []
+        k = k or settings.RETRIEVAL_TOP_K
+        vectors = chunks.vectors if chunks.vectors is not None else self.embed(chunks.texts)
+        hits = self.top_k(self.embed(list(queries)), vectors, k)
+        best_rank: Dict[int, Tuple[int, int]] = {}
+        for q, row in enumerate(hits):
+            for rank, index in enumerate(row):
+                index = int(index)
+                best_rank[index] = min(best_rank.get(index, (rank, q)), (rank, q))
+        return sorted(best_rank, key=lambda i: best_rank[i])
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.RETRIEVAL_ENABLED,
+            "available": self.available,
+            "model": settings.EMBEDDING_MODEL,
+            "loaded": self.model is not None,
+            "error": self.load_error,
+            "cached_vectors": len(self._cache),
+        }
+
+
+# Global embedding service instance
+embedding_service = EmbeddingService()
@@ -0,0 +1,140 @@
+"""
+Cache of per-vendor AI evaluation results.
+
+A result is keyed by fingerprints of everything that determines it: the
+cleaned tender text, the cleaned vendor text, the criteria definitions
+(name, description, weightage) and the model/prompt configuration. Re-running
+an evaluation after one vendor was added therefore only scores that vendor.
+
+Entries live in an in-process LRU backed by one JSON file per key under
+EVALUATION_CACHE_DIR, so they survive restarts and are shared by workers on
+the same host.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def text_fingerprint(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def criteria_fingerprint(criteria: List[Dict[str, Any]]) -> str:
+    """Order-independent hash of the criteria fields that affect scoring"""
+    canonical = sorted(
+        (str(c.get("name", "")), str(c.get("description") or ""), float(c.get("weightage") or 0))
+        for c in criteria
+    )
+    return hashlib.sha256(json.dumps(canonical).encode("utf-8")).hexdigest()
+
+
+class EvaluationCache:
+    def __init__(self):
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.EVALUATION_CACHE_ENABLED
+
+    @property
+    def directory(self) -> Path:
+        return Path(settings.EVALUATION_CACHE_DIR)
+
+    def make_key(self, tender_text: str, vendor_text: str, criteria: List[Dict[str, Any]], model_fingerprint: str) -> str:
+        parts = {
+            "tender": text_fingerprint(tender_text),
+            "vendor": text_fingerprint(vendor_text),
+            "criteria": criteria_fingerprint(criteria),
+            "model": model_fingerprint,
+        }
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _remember(self, key: str, value: Dict[str, Any]):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > settings.EVALUATION_CACHE_SIZE:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+        if value is None:
+            try:
+                with open(self._path(key), encoding="utf-8") as f:
+                    value = json.load(f)
+                with self._lock:
+                    self._remember(key, value)
+            except (OSError, ValueError):
+                value = None
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, key: str, result: Dict[str, Any]):
+        if not self.enabled:
+            return
+        entry = {"cached_at": datetime.utcnow().isoformat(), "result": result}
+        with self._lock:
+            self._remember(key, entry)
+            self.stores += 1
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Could not persist evaluation cache entry {key[:12]}: {e}")
+
+    def clear(self) -> int:
+        """Drop all entries (memory and disk); returns the number of disk entries removed"""
+        with self._lock:
+            self._memory.clear()
+        removed = sum(1 for _ in self.directory.glob("*/*.json")) if self.directory.exists() else 0
+        shutil.rmtree(self.directory, ignore_errors=True)
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_entries": sum(1 for _ in self.directory.glob("*/*.json")) if self.directory.exists() else 0,
+            "directory": str(self.directory),
+        }
+
+
+# Global evaluation cache instance
+evaluation_cache = EvaluationCache()
@@ -0,0 +1,291 @@
+"""
+Durable evaluation job queue in the database.
+
+enqueue() registers an evaluation run (reusing unchanged vendor results like
+the streaming path) and inserts one evaluation_jobs row per vendor that needs
+the LLM, with a snapshot of the criteria. Standalone workers
+(`python -m app.workers.evaluation_worker`) claim jobs with
+
+    SELECT ... FOR UPDATE SKIP LOCKED
+
+so any number of worker processes on any number of hosts share the queue
+without handing out a job twice. A claimed job holds a lease that the worker
+renews by heartbeating; when a worker dies its jobs' leases expire and they
+are claimed again, up to max_attempts. Failed attempts are retried with
+exponential backoff. Completion and failure are fenced on the worker id, so a
+worker that lost its lease cannot record a stale result. When a run's last
+job settles, the run is marked completed and its score matrix is stored.
+"""
+
+import logging
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.upload_models import EvaluationJob, EvaluationRun, VendorEvaluation
+from app.services.evaluation_run_service import PreparedRun, evaluation_run_service
+from app.services.score_matrix_service import score_matrix_service
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = ("queued", "running")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class EvaluationQueueService:
+    def enqueue(self, db: Session, tenderid: int, full: bool = False) -> PreparedRun:
+        """Register a queued run and one job per vendor that is not reused from an earlier run"""
+        prepared = evaluation_run_service.prepare(db, tenderid, full, status="queued")
+        run = db.query(EvaluationRun).filter(EvaluationRun.run_id == prepared.run_id).one()
+        now = _now()
+        db.add_all(
+            EvaluationJob(
+                evaluation_run_id=run.id,
+                tenderid=tenderid,
+                vendorid=vendor["id"],
+                criteria=prepared.criteria,
+                max_attempts=settings.EVALUATION_JOB_MAX_ATTEMPTS,
+                available_at=now,
+            )
+            for vendor in prepared.pending
+        )
+        db.commit()
+        if not prepared.pending:
+            self._finalize_run(db, run.id, prepared.criteria)
+        logger.info(f"Queued evaluation run {run.run_id}: {len(prepared.pending)} jobs")
+        return prepared
+
+    def claim(self, worker_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Lease up to `limit` available jobs to a worker (queued ones, or running ones whose lease expired)"""
+        db = SessionLocal()
+        try:
+            self._fail_abandoned(db)
+            now = _now()
+            jobs = (
+                db.query(EvaluationJob)
+                .filter(or_(
+                    and_(EvaluationJob.status == "queued", EvaluationJob.available_at <= now),
+                    and_(
+                        EvaluationJob.status == "running",
+                        EvaluationJob.lease_expires_at < now,
+                        EvaluationJob.attempts < EvaluationJob.max_attempts,
+                    ),
+                ))
+                .order_by(EvaluationJob.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            if not jobs:
+                db.commit()
+                return []
+            lease = now + timedelta(seconds=settings.EVALUATION_JOB_LEASE_SECONDS)
+            for job in jobs:
+                if job.status == "running":
+                    logger.warning(f"Reclaiming evaluation job {job.id} from {job.worker_id} (lease expired)")
+                job.status = "running"
+                job.worker_id = worker_id
+                job.attempts += 1
+                job.lease_expires_at = lease
+                job.heartbeat_at = now
+            db.query(EvaluationRun).filter(
+                EvaluationRun.id.in_({job.evaluation_run_id for job in jobs}),
+                EvaluationRun.status == "queued",
+            ).update({EvaluationRun.status: "running"}, synchronize_session=False)
+            claimed = [
+                {
+                    "id": job.id,
+                    "evaluation_run_id": job.evaluation_run_id,
+                    "run_id": job.run.run_id,
+                    "tenderid": job.tenderid,
+                    "vendorid": job.vendorid,
+                    "criteria": job.criteria,
+                    "attempts": job.attempts,
+                }
+                for job in jobs
+            ]
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    def heartbeat(self, worker_id: str, job_ids: List[int]) -> int:
+        """Extend the leases of a worker's running jobs; returns how many it still holds"""
+        if not job_ids:
+            return 0
+        db = SessionLocal()
+        try:
+            now = _now()
+            held = (
+                db.query(EvaluationJob)
+                .filter(
+                    EvaluationJob.id.in_(job_ids),
+                    EvaluationJob.worker_id == worker_id,
+                    EvaluationJob.status == "running",
+                )
+                .update(
+                    {
+                        EvaluationJob.heartbeat_at: now,
+                        EvaluationJob.lease_expires_at: now + timedelta(seconds=settings.EVALUATION_JOB_LEASE_SECONDS),
+                    },
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            return held
+        finally:
+            db.close()
+
+    def _settle(self, db: Session, job_id: int, worker_id: str, values: Dict[Any, Any]) -> Optional[EvaluationJob]:
+        """Apply a final state change if the worker still holds the job's lease"""
+        updated = (
+            db.query(EvaluationJob)
+            .filter(
+                EvaluationJob.id == job_id,
+                EvaluationJob.worker_id == worker_id,
+                EvaluationJob.status == "running",
+            )
+            .update(values, synchronize_session=False)
+        )
+        if not updated:
+            db.rollback()
+            logger.warning(f"Evaluation job {job_id} is no longer leased to {worker_id}; dropping its outcome")
+            return None
+        return db.query(EvaluationJob).filter(EvaluationJob.id == job_id).one()
+
+    def complete(self, job_id: int, worker_id: str, fingerprint: str, result: Dict[str, Any]) -> bool:
+        db = SessionLocal()
+        try:
+            job = self._settle(db, job_id, worker_id, {
+                EvaluationJob.status: "completed",
+                EvaluationJob.completeddate: _now(),
+                EvaluationJob.lease_expires_at: None,
+                EvaluationJob.last_error: None,
+            })
+            if job is None:
+                return False
+            evaluation_run_service.add_result(db, job.run, job.vendorid, fingerprint, result)
+            db.commit()
+            self._finalize_run(db, job.evaluation_run_id)
+            return True
+        finally:
+            db.close()
+
+    def fail(self, job_id: int, worker_id: str, error: str, retry: bool = True) -> bool:
+        """Record a failed attempt: back to the queue with backoff, or failed after the last attempt"""
+        db = SessionLocal()
+        try:
+            job = db.query(EvaluationJob).filter(EvaluationJob.id == job_id).first()
+            if job is None:
+                return False
+            final = not retry or job.attempts >= job.max_attempts
+            if not final:
+                delay = settings.EVALUATION_JOB_RETRY_SECONDS * 2 ** max(job.attempts - 1, 0)
+                values = {
+                    EvaluationJob.status: "queued",
+                    EvaluationJob.available_at: _now() + timedelta(seconds=delay),
+                    EvaluationJob.worker_id: None,
+                    EvaluationJob.lease_expires_at: None,
+                    EvaluationJob.last_error: error,
+                }
+            else:
+                values = {
+                    EvaluationJob.status: "failed",
+                    EvaluationJob.completeddate: _now(),
+                    EvaluationJob.lease_expires_at: None,
+                    EvaluationJob.last_error: error,
+                }
+            job = self._settle(db, job_id, worker_id, values)
+            if job is None:
+                return False
+            if final:
+                evaluation_run_service.add_failure(job.run)
+            db.commit()
+            if final:
+                self._finalize_run(db, job.evaluation_run_id)
+            return True
+        finally:
+            db.close()
+
+    def _fail_abandoned(self, db: Session):
+        """Fail running jobs whose lease expired on their last attempt (their worker died)"""
+        jobs = (
+            db.query(EvaluationJob)
+            .filter(
+                EvaluationJob.status == "running",
+                EvaluationJob.lease_expires_at < _now(),
+                EvaluationJob.attempts >= EvaluationJob.max_attempts,
+            )
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        failed_per_run = Counter()
+        for job in jobs:
+            job.status = "failed"
+            job.completeddate = _now()
+            job.last_error = f"Lease expired on attempt {job.attempts} (worker {job.worker_id})"
+            failed_per_run[job.evaluation_run_id] += 1
+        for run in db.query(EvaluationRun).filter(EvaluationRun.id.in_(list(failed_per_run))).all():
+            evaluation_run_service.add_failure(run, failed_per_run[run.id])
+        db.commit()
+        for run_pk in failed_per_run:
+            self._finalize_run(db, run_pk)
+
+    def _finalize_run(self, db: Session, run_pk: int, criteria: Optional[List[Dict[str, Any]]] = None):
+        """
+        Complete a run once none of its jobs is open; the conditional update makes this happen once.
+        criteria defaults to the jobs' criteria snapshot (enqueue passes them for a run without jobs).
+        """
+        open_jobs = (
+            db.query(EvaluationJob)
+            .filter(EvaluationJob.evaluation_run_id == run_pk, EvaluationJob.status.in_(OPEN_STATUSES))
+            .count()
+        )
+        if open_jobs:
+            return
+        finished = (
+            db.query(EvaluationRun)
+            .filter(EvaluationRun.id == run_pk, EvaluationRun.status.in_(OPEN_STATUSES))
+            .update(
+                {EvaluationRun.status: "completed", EvaluationRun.completeddate: _now()},
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if not finished:
+            return
+
+        run = db.query(EvaluationRun).filter(EvaluationRun.id == run_pk).one()
+        rows = db.query(VendorEvaluation).filter(VendorEvaluation.evaluation_run_id == run_pk).all()
+        if criteria is None:
+            job = db.query(EvaluationJob).filter(EvaluationJob.evaluation_run_id == run_pk).first()
+            criteria = job.criteria if job else []
+        score_matrix_service.record(run.run_id, run.tenderid, [row.result for row in rows], criteria)
+        logger.info(f"Evaluation run {run.run_id} completed ({len(rows)} vendors)")
+
+    def get_stats(self, db: Session) -> Dict[str, Any]:
+        counts = dict(
+            db.query(EvaluationJob.status, func.count(EvaluationJob.id)).group_by(EvaluationJob.status).all()
+        )
+        workers = (
+            db.query(EvaluationJob.worker_id, func.count(EvaluationJob.id))
+            .filter(EvaluationJob.status == "running", EvaluationJob.lease_expires_at >= _now())
+            .group_by(EvaluationJob.worker_id)
+            .all()
+        )
+        return {
+            "jobs": counts,
+            "workers": [{"worker_id": worker_id, "running_jobs": count} for worker_id, count in workers],
+        }
+
+
+# Global evaluation queue service instance
+evaluation_queue_service = EvaluationQueueService()
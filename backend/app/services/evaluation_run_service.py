@@ -0,0 +1,272 @@
+"""
+Persistent AI evaluation runs with incremental re-evaluation.
+
+Each run is an evaluation_runs row; every vendor gets a vendor_evaluations
+row (full result JSON plus indexed overall score) with one criterion_scores
+row per criterion. A vendor's input_fingerprint hashes the tender documents,
+the vendor's documents (attachment id + extracted text), the criteria and the
+model/prompt configuration. prepare() looks the current fingerprints up
+among earlier LLM-scored rows: matching vendors are copied into the new run
+(reused_from points at the original row) and only the rest are evaluated,
+so adding, deleting or re-extracting one vendor's attachment re-scores only
+that vendor. Vendors failing the tender's eligibility rules are recorded as
+rejected (scoring_method "eligibility", with the failed rules) before the
+reuse lookup and are neither reused nor evaluated.
+"""
+
+import hashlib
+import json
+import logging
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.db.database import SessionLocal
+from app.models.upload_models import CriterionScore, EvaluationJob, EvaluationRun, VendorEvaluation
+from app.services.ai_evaluation_service import ai_evaluation_service
+from app.services.eligibility_service import eligibility_service, rejection_result
+from app.services.evaluation_cache import criteria_fingerprint
+from app.services.evaluation_service import load_evaluation_inputs
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PreparedRun:
+    """A registered run: vendors still to evaluate, results reused from earlier runs and prefilter rejections"""
+    run_id: str
+    tenderid: int
+    mode: str
+    tender_data: Dict[str, Any]
+    criteria: List[Dict[str, Any]]
+    pending: List[Dict[str, Any]] = field(default_factory=list)
+    reused: List[Dict[str, Any]] = field(default_factory=list)
+    rejected: List[Dict[str, Any]] = field(default_factory=list)
+    fingerprints: Dict[Any, str] = field(default_factory=dict)
+
+    @property
+    def total_vendors(self) -> int:
+        return len(self.pending) + len(self.reused) + len(self.rejected)
+
+
+class EvaluationRunService:
+    def vendor_fingerprint(self, tender_fp: str, vendor_fp: str, criteria_fp: str, model_fp: str) -> str:
+        parts = {"tender": tender_fp, "vendor": vendor_fp, "criteria": criteria_fp, "model": model_fp}
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _add_vendor_evaluation(
+        self,
+        db: Session,
+        run: EvaluationRun,
+        vendorid: int,
+        fingerprint: str,
+        result: Dict[str, Any],
+        reused_from: Optional[int] = None,
+    ) -> VendorEvaluation:
+        row = VendorEvaluation(
+            evaluation_run_id=run.id,
+            tenderid=run.tenderid,
+            vendorid=vendorid,
+            input_fingerprint=fingerprint,
+            overall_score=float(result.get("overall_score") or 0),
+            rating=result.get("rating"),
+            qualification_status=result.get("qualification_status"),
+            scoring_method=result.get("scoring_method"),
+            result=result,
+            reused_from=reused_from,
+            criterion_scores=[
+                CriterionScore(
+                    criterion_id=score.get("criterion_id"),
+                    criterion_name=name,
+                    score=float(score.get("score") or 0),
+                    weightage=float(score.get("weightage") or 0),
+                    reasoning=score.get("reasoning"),
+                )
+                for name, score in (result.get("criteria_scores") or {}).items()
+            ],
+        )
+        db.add(row)
+        return row
+
+    def prepare(self, db: Session, tenderid: int, full: bool = False, status: str = "running") -> PreparedRun:
+        """
+        Load a tender's inputs, register a run and split vendors into reused and pending.
+        The run row is flushed, not committed, when status is "queued" so the caller can add
+        its jobs in the same transaction.
+        """
+        tender_data, vendors_data, criteria = load_evaluation_inputs(db, tenderid)
+        if not vendors_data:
+            raise HTTPException(status_code=400, detail="Tender has no vendors to evaluate")
+        if not criteria:
+            raise HTTPException(status_code=400, detail="No active evaluation criteria")
+
+        criteria_fp = criteria_fingerprint(criteria)
+        model_fp = ai_evaluation_service._model_fingerprint()
+        fingerprints = {
+            vendor["id"]: self.vendor_fingerprint(tender_data["fingerprint"], vendor["fingerprint"], criteria_fp, model_fp)
+            for vendor in vendors_data
+        }
+
+        # Latest LLM-scored row per matching fingerprint (fallback scores are always redone)
+        previous: Dict[str, VendorEvaluation] = {}
+        if not full:
+            rows = (
+                db.query(VendorEvaluation)
+                .filter(
+                    VendorEvaluation.tenderid == tenderid,
+                    VendorEvaluation.input_fingerprint.in_(list(fingerprints.values())),
+                    VendorEvaluation.scoring_method == "llm",
+                )
+                .order_by(VendorEvaluation.id.desc())
+                .all()
+            )
+            for row in rows:
+                previous.setdefault(row.input_fingerprint, row)
+
+        run = EvaluationRun(
+            run_id=str(uuid.uuid4()),
+            tenderid=tenderid,
+            status=status,
+            mode="full" if full else "incremental",
+            criteria_fingerprint=criteria_fp,
+            model_fingerprint=model_fp,
+            total_vendors=len(vendors_data),
+        )
+        db.add(run)
+        db.flush()
+
+        prepared = PreparedRun(run.run_id, tenderid, run.mode, tender_data, criteria, fingerprints=fingerprints)
+        screening = eligibility_service.screen(db, tenderid, vendors_data)
+        for vendor, screened in zip(vendors_data, screening):
+            fingerprint = fingerprints[vendor["id"]]
+            if not screened["eligible"]:
+                result = rejection_result(vendor, screened, criteria)
+                self._add_vendor_evaluation(db, run, vendor["id"], fingerprint, result)
+                prepared.rejected.append(result)
+                continue
+            earlier = previous.get(fingerprint)
+            if earlier is None:
+                prepared.pending.append(vendor)
+                continue
+            result = {
+                **earlier.result,
+                "vendor_name": vendor["name"],
+                "reused": {"run_id": earlier.run.run_id, "evaluated_at": earlier.result.get("evaluation_date")},
+            }
+            self._add_vendor_evaluation(db, run, vendor["id"], fingerprint, result, earlier.reused_from or earlier.id)
+            prepared.reused.append(result)
+
+        run.reused_vendors = len(prepared.reused)
+        run.rejected_vendors = len(prepared.rejected)
+        if status == "queued":
+            db.flush()
+        else:
+            db.commit()
+        logger.info(
+            f"Evaluation run {run.run_id} for tender {tenderid}: "
+            f"{len(prepared.pending)} to evaluate, {len(prepared.reused)} reused, "
+            f"{len(prepared.rejected)} rejected by eligibility rules"
+        )
+        return prepared
+
+    def _with_run(self, run_id: str, update):
+        """Apply `update(db, run)` in a short-lived session (callers run on worker threads)"""
+        db = SessionLocal()
+        try:
+            run = db.query(EvaluationRun).filter(EvaluationRun.run_id == run_id).first()
+            if run is None:
+                return
+            update(db, run)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Could not update evaluation run {run_id}: {e}")
+        finally:
+            db.close()
+
+    def add_result(self, db: Session, run: EvaluationRun, vendorid: int, fingerprint: str, result: Dict[str, Any]):
+        """Add a freshly evaluated vendor to a run (caller commits)"""
+        self._add_vendor_evaluation(db, run, vendorid, fingerprint, result)
+        # SQL-side increments: several workers may record results of one run concurrently
+        run.evaluated_vendors = EvaluationRun.evaluated_vendors + 1
+
+    def add_failure(self, run: EvaluationRun, count: int = 1):
+        run.failed_vendors = EvaluationRun.failed_vendors + count
+
+    def record_result(self, run_id: str, vendorid: int, fingerprint: str, result: Dict[str, Any]):
+        self._with_run(run_id, lambda db, run: self.add_result(db, run, vendorid, fingerprint, result))
+
+    def record_failure(self, run_id: str):
+        self._with_run(run_id, lambda db, run: self.add_failure(run))
+
+    def finish(self, run_id: str, status: str):
+        def update(db, run):
+            run.status = status
+            run.completeddate = datetime.utcnow()
+        self._with_run(run_id, update)
+
+    # ------------------------------------------------------------------ queries
+
+    def run_summary(self, run: EvaluationRun) -> Dict[str, Any]:
+        return {
+            "run_id": run.run_id,
+            "tenderid": run.tenderid,
+            "status": run.status,
+            "mode": run.mode,
+            "total_vendors": run.total_vendors,
+            "evaluated_vendors": run.evaluated_vendors,
+            "reused_vendors": run.reused_vendors,
+            "rejected_vendors": run.rejected_vendors,
+            "failed_vendors": run.failed_vendors,
+            "createddate": run.createddate,
+            "completeddate": run.completeddate,
+        }
+
+    def list_runs(self, db: Session, tenderid: int, limit: int = 50) -> List[Dict[str, Any]]:
+        runs = (
+            db.query(EvaluationRun)
+            .filter(EvaluationRun.tenderid == tenderid)
+            .order_by(EvaluationRun.id.desc())
+            .limit(limit)
+            .all()
+        )
+        return [self.run_summary(run) for run in runs]
+
+    def get_run(self, db: Session, run_id: str) -> Optional[Dict[str, Any]]:
+        run = db.query(EvaluationRun).filter(EvaluationRun.run_id == run_id).first()
+        if run is None:
+            return None
+        rows = (
+            db.query(VendorEvaluation)
+            .filter(VendorEvaluation.evaluation_run_id == run.id)
+            .order_by(VendorEvaluation.overall_score.desc())
+            .all()
+        )
+        jobs = (
+            db.query(EvaluationJob.status, func.count(EvaluationJob.id))
+            .filter(EvaluationJob.evaluation_run_id == run.id)
+            .group_by(EvaluationJob.status)
+            .all()
+        )
+        return {
+            **self.run_summary(run),
+            "jobs": dict(jobs),
+            "results": [
+                {
+                    **row.result,
+                    "vendor_id": row.vendorid,
+                    "reused": row.reused_from is not None,
+                    "rejected": row.scoring_method == "eligibility",
+                }
+                for row in rows
+            ],
+        }
+
+
+# Global evaluation run service instance
+evaluation_run_service = EvaluationRunService()
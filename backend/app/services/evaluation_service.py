@@ -1,6 +1,14 @@
+from typing import Optional, Sequence
+
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from app.models.user import EvaluationCriterion
+from app.models.upload_models import Tender, Vendor, TenderAttachment, TenderEvaluation
+from app.services.embedding_index_service import embedding_index_service, successful_extractions
+from app.services.embedding_service import chunk_text
+from app.services.fact_extraction_service import fact_extraction_service
+from app.services.tender_digest_service import tender_digest_service
+from app.services.vendor_corpus_service import vendor_corpus_service
 from app.schemas.evaluation import (
     EvaluationCriterionCreate,
     EvaluationCriterionUpdate,
@@ -204,12 +212,12 @@ def restore_default_criteria(db: Session):
 def create_tender_evaluation(db: Session, evaluation: TenderEvaluationCreate):
     """Create a new tender evaluation"""
     # Check if tender exists
-    tender = db.query(Tender).filter(Tender.id == evaluation.tender_id).first()
+    tender = db.query(Tender).filter(Tender.tenderid == evaluation.tender_id).first()
     if not tender:
         raise HTTPException(status_code=404, detail="Tender not found")
     
     # Check if vendor exists
-    vendor = db.query(Vendor).filter(Vendor.id == evaluation.vendor_id).first()
+    vendor = db.query(Vendor).filter(Vendor.vendorid == evaluation.vendor_id).first()
     if not vendor:
         raise HTTPException(status_code=404, detail="Vendor not found")
     
@@ -253,12 +261,12 @@ def create_tender_evaluation(db: Session, evaluation: TenderEvaluationCreate):
 def create_bulk_evaluations(db: Session, bulk_data: BulkEvaluationCreate):
     """Create multiple evaluations for a tender-vendor combination"""
     # Check if tender exists
-    tender = db.query(Tender).filter(Tender.id == bulk_data.tender_id).first()
+    tender = db.query(Tender).filter(Tender.tenderid == bulk_data.tender_id).first()
     if not tender:
         raise HTTPException(status_code=404, detail="Tender not found")
     
     # Check if vendor exists
-    vendor = db.query(Vendor).filter(Vendor.id == bulk_data.vendor_id).first()
+    vendor = db.query(Vendor).filter(Vendor.vendorid == bulk_data.vendor_id).first()
     if not vendor:
         raise HTTPException(status_code=404, detail="Vendor not found")
     
@@ -364,4 +372,74 @@ def get_evaluation_summary(db: Session, tender_id: int, vendor_id: int):
         "max_possible_score": max_possible_score,
         "percentage": percentage,
         "evaluations": evaluations
-    }
\ No newline at end of file
+    }
+
+
+def load_evaluation_inputs(db: Session, tenderid: int, vendorids: Optional[Sequence[int]] = None):
+    """
+    (tender_data, vendors_data, criteria) for run_batch_evaluation / stream_batch_evaluation,
+    built from a tender's extracted attachments, its vendors' extracted attachments and the
+    active evaluation criteria. Tender chunks come from the persistent embedding index when every
+    attachment is indexed, otherwise from the stored ingestion spans. Tender and vendors
+    carry a documents fingerprint for incremental re-evaluation. The tender text is the tender
+    digest's cleaned text and comes with its extracted requirements; each vendor's text is its
+    materialized corpus (boilerplate stripped) with the corpus chunks' stored vectors when
+    they are indexed for its current text (retrieval never uses the raw-text attachment
+    index for vendors), and comes with its extracted typed facts, which
+    eligibility rules with source "fact" read. `vendorids` restricts the
+    vendors loaded (evaluation workers load only the vendors of their claimed jobs).
+    """
+    tender = db.query(Tender).filter(Tender.tenderid == tenderid).first()
+    if not tender:
+        raise HTTPException(status_code=404, detail="Tender not found")
+
+    tender_docs = list(successful_extractions(tender.attachments))
+    digest = tender_digest_service.get_or_build(db, tender, tender_docs)
+    tender_data = {
+        "id": tender.tenderid,
+        "title": tender.title,
+        "fingerprint": digest.fingerprint,
+        "text_content": digest.cleaned_text,
+        "text_cleaned": True,
+        "requirements": digest.requirements,
+        "chunks": embedding_index_service.load_chunk_set(db, TenderAttachment, [a for a, _ in tender_docs])
+        or [
+            f"[{a.filename}] {chunk}"
+            for a, text in tender_docs
+            for chunk in chunk_text(text, (a.form_data.get("chunks") or {}).get("spans"))
+            if chunk
+        ],
+    }
+
+    vendors = db.query(Vendor).filter(Vendor.tenderid == tenderid)
+    if vendorids is not None:
+        vendors = vendors.filter(Vendor.vendorid.in_(list(vendorids)))
+    facts = fact_extraction_service.vendor_facts(db, tenderid)
+    vendors_data = []
+    for vendor in vendors.order_by(Vendor.vendorid).all():
+        vendor_docs = list(successful_extractions(vendor.attachments))
+        corpus = vendor_corpus_service.get_or_build(db, vendor, vendor_docs)
+        vendors_data.append({
+            "id": vendor.vendorid,
+            "name": vendor.vendorform or vendor.filename or f"Vendor {vendor.vendorid}",
+            "fingerprint": corpus.fingerprint,
+            "corpus": corpus.text,
+            "chunks": embedding_index_service.load_corpus_chunks(corpus),
+            "fields": vendor.form_data or {},
+            "facts": facts.get(vendor.vendorid, {}),
+        })
+
+    criteria = [
+        {
+            "id": c.id,
+            "name": c.name,
+            "description": c.description,
+            "weightage": c.weightage,
+            "max_score": c.max_score,
+        }
+        for c in db.query(EvaluationCriterion)
+        .filter(EvaluationCriterion.is_active == True)
+        .order_by(EvaluationCriterion.id)
+        .all()
+    ]
+    return tender_data, vendors_data, criteria
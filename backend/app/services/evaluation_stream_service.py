@@ -0,0 +1,229 @@
+"""
+Server-sent event streams of batch evaluations.
+
+start() launches a batch evaluation as a background task and returns a run
+id. Every vendor result is appended to the run's event log the moment it
+completes, with progress and an ETA (mean time per completed vendor times the
+vendors left). subscribe() replays the log after a given event id and then
+follows it live, so a client that reconnects with Last-Event-ID resumes right
+after the last vendor it received instead of restarting the batch.
+
+Event types: ``started``, ``result``, ``vendor_error``, ``completed`` (the
+final summary; the stream ends after it). Finished runs are kept for
+EVALUATION_STREAM_TTL_SECONDS so late reconnects can still replay them.
+
+Runs are persisted through evaluation_run_service: results reused from an
+earlier run (unchanged inputs) are published first with ``reused`` set, then
+vendors rejected by the eligibility prefilter with ``rejected`` set; only the
+remaining vendors are evaluated, and each result is stored as it arrives.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.ai_evaluation_service import stream_batch_evaluation
+from app.services.evaluation_run_service import PreparedRun, evaluation_run_service
+from app.services.score_matrix_service import score_matrix_service
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _StreamEvent:
+    id: int
+    event: str
+    data: Dict[str, Any]
+
+    def encode(self) -> str:
+        return f"id: {self.id}\nevent: {self.event}\ndata: {json.dumps(self.data, default=str)}\n\n"
+
+
+@dataclass
+class EvaluationStreamRun:
+    run_id: str
+    tender_id: Any
+    total_vendors: int
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: Optional[float] = None
+    completed: int = 0
+    reused: int = 0
+    rejected: int = 0
+    failed: int = 0
+    events: List[_StreamEvent] = field(default_factory=list)
+    changed: asyncio.Condition = field(default_factory=asyncio.Condition)
+    task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return bool(self.events) and self.events[-1].event == "completed"
+
+    def progress(self) -> Dict[str, Any]:
+        finished = self.completed + self.failed
+        elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+        remaining = self.total_vendors - finished
+        # Reused and rejected results arrive instantly, so only evaluated vendors count towards the rate
+        evaluated = finished - self.reused - self.rejected
+        if not remaining:
+            eta = 0.0
+        else:
+            eta = round(elapsed / evaluated * remaining, 2) if evaluated else None
+        return {
+            "completed": self.completed,
+            "reused": self.reused,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "total": self.total_vendors,
+            "percent": round(100 * finished / self.total_vendors, 1) if self.total_vendors else 100.0,
+            "elapsed_seconds": round(elapsed, 2),
+            "eta_seconds": eta,
+        }
+
+    async def publish(self, event: str, data: Dict[str, Any]):
+        async with self.changed:
+            self.events.append(_StreamEvent(len(self.events) + 1, event, data))
+            self.changed.notify_all()
+
+
+class EvaluationStreamService:
+    HEARTBEAT_SECONDS = 15
+
+    def __init__(self):
+        self.runs: Dict[str, EvaluationStreamRun] = {}
+
+    def _prune(self):
+        now = time.perf_counter()
+        expired = [
+            run_id for run_id, run in self.runs.items()
+            if run.done and now - run.finished_at > settings.EVALUATION_STREAM_TTL_SECONDS
+        ]
+        for run_id in expired:
+            del self.runs[run_id]
+
+    def start(self, prepared: PreparedRun) -> EvaluationStreamRun:
+        """Launch a prepared run's evaluation on the running event loop and register its stream"""
+        self._prune()
+        run = EvaluationStreamRun(prepared.run_id, prepared.tenderid, prepared.total_vendors)
+        self.runs[run.run_id] = run
+        run.task = asyncio.create_task(self._run(run, prepared))
+        return run
+
+    async def _run(self, run: EvaluationStreamRun, prepared: PreparedRun):
+        tender_data, criteria, pending = prepared.tender_data, prepared.criteria, prepared.pending
+        logger.info(
+            f"🎯 Streaming evaluation {run.run_id}: {len(pending)} vendors to evaluate, "
+            f"{len(prepared.reused)} reused, {len(prepared.rejected)} rejected"
+        )
+        await run.publish("started", {
+            "run_id": run.run_id,
+            "tender_id": run.tender_id,
+            "tender_title": tender_data.get("title"),
+            "mode": prepared.mode,
+            "criteria_used": [{"id": c["id"], "name": c["name"]} for c in criteria],
+            "progress": run.progress(),
+        })
+        results = []
+        for result in prepared.reused:
+            run.completed += 1
+            run.reused += 1
+            results.append(result)
+            await run.publish("result", {"result": result, "reused": True, "progress": run.progress()})
+        for result in prepared.rejected:
+            run.completed += 1
+            run.rejected += 1
+            results.append(result)
+            await run.publish("result", {"result": result, "rejected": True, "progress": run.progress()})
+        try:
+            async for index, result in stream_batch_evaluation(tender_data, pending, criteria):
+                vendor = pending[index]
+                if isinstance(result, Exception):
+                    run.failed += 1
+                    logger.error(f"❌ Evaluation failed for {vendor['name']}: {result}")
+                    await asyncio.to_thread(evaluation_run_service.record_failure, run.run_id)
+                    await run.publish("vendor_error", {
+                        "vendor_id": vendor["id"],
+                        "vendor_name": vendor["name"],
+                        "error": str(result),
+                        "progress": run.progress(),
+                    })
+                else:
+                    run.completed += 1
+                    results.append(result)
+                    await asyncio.to_thread(
+                        evaluation_run_service.record_result,
+                        run.run_id, vendor["id"], prepared.fingerprints[vendor["id"]], result,
+                    )
+                    await run.publish("result", {"result": result, "reused": False, "progress": run.progress()})
+            status = "completed"
+        except Exception as e:
+            logger.error(f"❌ Streaming evaluation {run.run_id} failed: {e}")
+            status = "failed"
+        finally:
+            run.finished_at = time.perf_counter()
+
+        # Always end the stream: subscribers wait for "completed" and _prune only drops done runs
+        try:
+            await asyncio.to_thread(evaluation_run_service.finish, run.run_id, status)
+            score_matrix_service.record(run.run_id, run.tender_id, results, criteria)
+        except Exception as e:
+            logger.error(f"❌ Finalising streaming evaluation {run.run_id} failed: {e}")
+            status = "failed"
+        finally:
+            # Eligibility rejections are reported as results but never ranked
+            scored = [r for r in results if r.get("scoring_method") != "eligibility"]
+            ranking = sorted(scored, key=lambda r: r.get("overall_score", 0), reverse=True)
+            await run.publish("completed", {
+                "run_id": run.run_id,
+                "status": status,
+                "successful_evaluations": run.completed,
+                "reused_evaluations": run.reused,
+                "rejected_vendors": run.rejected,
+                "failed_evaluations": run.failed,
+                "ranking": [
+                    {"vendor_id": r.get("vendor_id"), "vendor_name": r.get("vendor_name"), "overall_score": r.get("overall_score")}
+                    for r in ranking
+                ],
+                "evaluation_date": datetime.utcnow().isoformat(),
+                "progress": run.progress(),
+            })
+
+    def get(self, run_id: str) -> Optional[EvaluationStreamRun]:
+        return self.runs.get(run_id)
+
+    async def subscribe(self, run: EvaluationStreamRun, last_event_id: int = 0) -> AsyncIterator[str]:
+        """SSE frames for events after `last_event_id`, following the run live until it completes"""
+        position = max(0, last_event_id)
+        while True:
+            async with run.changed:
+                if position >= len(run.events) and not run.done:
+                    try:
+                        await asyncio.wait_for(run.changed.wait(), timeout=self.HEARTBEAT_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+                pending = run.events[position:]
+            if not pending:
+                if run.done:
+                    return
+                # Comment frame keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+            for event in pending:
+                yield event.encode()
+            position = pending[-1].id
+            if pending[-1].event == "completed":
+                return
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "runs": len(self.runs),
+            "active": sum(1 for run in self.runs.values() if not run.done),
+        }
+
+
+# Global evaluation stream service instance
+evaluation_stream_service = EvaluationStreamService()
@@ -0,0 +1,374 @@
+"""
+Typed fact extraction into indexed columns.
+
+When an attachment finishes extraction its text is scanned once with compiled
+patterns for the numbers and dates tenders are usually compared on:
+
+- annual_turnover, net_worth, quoted_price: currency amounts ("INR 5.2 crore"
+  -> 52000000.0, unit "INR"); a number only counts as an amount with a
+  currency or magnitude word, so years ("FY 2021-22") and periods ("last 3
+  years") between the label and the amount are skipped
+- years_in_business: "15 years of experience", "in business for 12 years"
+- delivery_weeks: delivery periods in days, weeks or months, as weeks
+- established_date, certificate_expiry: dates parsed with python-dateutil
+
+Each match gets a confidence from its pattern (labelled values score higher
+than loose ones) and its value (an amount with a magnitude word but no currency
+is weaker); only values at or above FACT_MIN_CONFIDENCE are stored in
+attachment_facts with the page they were found on. Filtering and sorting
+vendors by a fact is then a plain indexed SQL query instead of an LLM pass or
+a regex scan over every document. Amounts are only compared within one
+currency (FACT_CURRENCY unless asked otherwise); an amount whose currency is
+not stated is taken to be in it.
+"""
+
+import bisect
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.upload_models import AttachmentFact, TenderAttachment, Vendor
+from app.services.document_extraction_service import extracted_text
+from app.services.eligibility_service import parse_date, parse_number
+from app.services.embedding_index_service import attachment_id_of, attachment_type_of
+
+logger = logging.getLogger(__name__)
+
+MAGNITUDES = r"crores?|cr|lakhs?|lacs?|thousand|k|millions?|mn|billions?|bn"
+# Without a leading currency the value must not start inside another number or
+# be a year ("2021", "2021-22"), and needs a magnitude word or trailing currency
+CURRENCY = (
+    r"(?:(?P<currency>INR|Rs\.?|₹|USD|US\$|\$|EUR|€|GBP|£)\s*"
+    rf"|(?<![\d.,/-])(?!(?:19|20)\d{{2}}\b(?![.,]\d)(?!\s*(?:{MAGNITUDES})\b)))"
+    rf"(?P<value>\d[\d,]*(?:\.\d+)?(?:\s*(?P<magnitude>{MAGNITUDES})\b)?)"
+    r"(?:\s*(?P<currency_after>INR|USD|EUR|GBP|rupees|dollars)\b)?"
+    r"(?(currency)|(?(magnitude)|(?(currency_after)|(?!))))"
+)
+DATE = (
+    r"(?P<value>\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}|\d{4}-\d{2}-\d{2}"
+    r"|\d{1,2}(?:st|nd|rd|th)?\s+(?:of\s+)?[A-Za-z]{3,9}\.?,?\s+\d{4}"
+    r"|[A-Za-z]{3,9}\.?\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4})"
+)
+CURRENCY_CODES = {
+    "inr": "INR", "rs": "INR", "rs.": "INR", "₹": "INR", "rupees": "INR",
+    "usd": "USD", "us$": "USD", "$": "USD", "dollars": "USD",
+    "eur": "EUR", "€": "EUR", "gbp": "GBP", "£": "GBP",
+}
+# Indian magnitude words imply rupees when no currency is written
+INR_MAGNITUDES = re.compile(r"crores?|cr|lakhs?|lacs?", re.IGNORECASE)
+WEEKS_PER = {"day": 1 / 7, "week": 1.0, "month": 52 / 12}
+RAW_TEXT_CHARS = 200
+# Up to 60 characters within the sentence; dots inside numbers ("31.03.2023") do not end it
+MAX_LABEL_GAP = r"(?:[^.\n]|(?<=\d)\.(?=\d)){0,60}?"
+
+
+@dataclass(frozen=True)
+class FactPattern:
+    fact: str
+    kind: str  # currency | years | weeks | date
+    regex: Pattern
+    confidence: float
+
+
+def _pattern(fact: str, kind: str, label: str, value: str, confidence: float) -> FactPattern:
+    return FactPattern(fact, kind, re.compile(label + value, re.IGNORECASE), confidence)
+
+
+FACT_PATTERNS: Tuple[FactPattern, ...] = (
+    _pattern("annual_turnover", "currency", rf"\b(?:average\s+)?annual\s+turnover{MAX_LABEL_GAP}", CURRENCY, 0.9),
+    _pattern("annual_turnover", "currency", rf"\bturnover{MAX_LABEL_GAP}", CURRENCY, 0.75),
+    _pattern("net_worth", "currency", rf"\bnet\s*worth{MAX_LABEL_GAP}", CURRENCY, 0.85),
+    _pattern(
+        "quoted_price", "currency",
+        rf"\b(?:quoted|total\s+bid|bid|offer(?:ed)?|contract|total)\s+(?:price|amount|value|cost){MAX_LABEL_GAP}",
+        CURRENCY, 0.85,
+    ),
+    _pattern(
+        "years_in_business", "years", "",
+        r"(?P<value>\d{1,3})\+?\s*years?\s+(?:of\s+)?(?:experience|in\s+(?:business|operation|the\s+industry))", 0.85,
+    ),
+    _pattern(
+        "years_in_business", "years",
+        r"\b(?:in\s+business|in\s+operation|experience)\s+(?:of|for)\s+(?:over\s+|more\s+than\s+)?",
+        r"(?P<value>\d{1,3})\+?\s*years?", 0.8,
+    ),
+    _pattern(
+        "delivery_weeks", "weeks",
+        r"\b(?:delivery|deliver(?:ed)?|completion)\b[^.\n]{0,50}?(?:within|in|period\s+of)\s+",
+        r"(?P<value>\d{1,3})\s*(?P<unit>days?|weeks?|months?)\b", 0.8,
+    ),
+    _pattern(
+        "established_date", "date",
+        r"\b(?:incorporated|established|founded|registered)\s+(?:on|in|since)?\s*(?:the\s+)?", DATE, 0.8,
+    ),
+    _pattern(
+        "certificate_expiry", "date",
+        r"\b(?:valid\s+(?:until|till|up\s*to|through)|expir(?:y|es|ing)(?:\s+date)?(?:\s+on)?)\s*:?\s*", DATE, 0.85,
+    ),
+)
+FACTS = tuple(dict.fromkeys(p.fact for p in FACT_PATTERNS))
+DATE_FACTS = tuple(dict.fromkeys(p.fact for p in FACT_PATTERNS if p.kind == "date"))
+CURRENCY_FACTS = tuple(dict.fromkeys(p.fact for p in FACT_PATTERNS if p.kind == "currency"))
+FACT_UNITS = {p.fact: p.kind for p in FACT_PATTERNS if p.kind in ("years", "weeks")}
+
+
+def _page_starts(form_data: Dict[str, Any], text: str) -> List[Tuple[int, Optional[int]]]:
+    """(offset in text, page number) of each extracted page, located in order"""
+    starts, position = [], 0
+    for page in form_data.get("pages") or []:
+        page_text = (page.get("text") or "\n".join(b.get("text", "") for b in page.get("blocks") or [])).strip()
+        if not page_text:
+            continue
+        offset = text.find(page_text[:80], position)
+        if offset < 0:
+            continue
+        starts.append((offset, page.get("page_number")))
+        position = offset + 1
+    return starts
+
+
+class FactExtractionService:
+    # Bump when patterns or scoring change; stored facts carry it and are re-extracted
+    VERSION = "2"
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fact-extraction")
+
+    # ------------------------------------------------------------------ extraction
+
+    def _parse(self, pattern: FactPattern, match) -> Optional[Tuple[Any, Optional[str], float]]:
+        """(value, unit, confidence) of a match, or None when the value is unusable"""
+        raw = match.group("value")
+        confidence = pattern.confidence
+        if pattern.kind == "currency":
+            value = parse_number(raw)
+            currency = match.group("currency") or match.group("currency_after")
+            if value is None or value <= 0:
+                return None
+            if currency is None:
+                confidence -= 0.1
+                magnitude = match.group("magnitude") or ""
+                return value, "INR" if INR_MAGNITUDES.fullmatch(magnitude) else None, confidence
+            return value, CURRENCY_CODES.get(currency.lower()), confidence
+        if pattern.kind == "years":
+            value = float(raw)
+            return (value, "years", confidence) if 0 < value <= 150 else None
+        if pattern.kind == "weeks":
+            unit = match.group("unit").lower().rstrip("s")
+            return round(float(raw) * WEEKS_PER[unit], 2), "weeks", confidence
+        value = parse_date(raw)
+        if value is None or not 1900 <= value.year <= 2100:
+            return None
+        return value, None, confidence
+
+    def extract(self, form_data: Dict[str, Any], text: str) -> List[Dict[str, Any]]:
+        """Confident facts in `text`: best-scoring match per (fact, value), at most FACT_MAX_PER_ATTACHMENT per fact"""
+        starts = _page_starts(form_data, text)
+        offsets = [offset for offset, _ in starts]
+        found: Dict[Tuple[str, Any], Dict[str, Any]] = {}
+        for pattern in FACT_PATTERNS:
+            for match in pattern.regex.finditer(text):
+                parsed = self._parse(pattern, match)
+                if parsed is None or parsed[2] < settings.FACT_MIN_CONFIDENCE:
+                    continue
+                value, unit, confidence = parsed
+                key = (pattern.fact, value)
+                if key in found and found[key]["confidence"] >= confidence:
+                    continue
+                index = bisect.bisect_right(offsets, match.start()) - 1
+                found[key] = {
+                    "fact": pattern.fact,
+                    "value_number": None if isinstance(value, date) else value,
+                    "value_date": value if isinstance(value, date) else None,
+                    "unit": unit,
+                    "raw_text": " ".join(match.group(0).split())[:RAW_TEXT_CHARS],
+                    "page": starts[index][1] if index >= 0 else None,
+                    "start_char": match.start(),
+                    "confidence": round(confidence, 2),
+                }
+
+        facts, per_fact = [], {}
+        for fact in sorted(found.values(), key=lambda f: (-f["confidence"], f["start_char"])):
+            if per_fact.get(fact["fact"], 0) >= settings.FACT_MAX_PER_ATTACHMENT:
+                continue
+            per_fact[fact["fact"]] = per_fact.get(fact["fact"], 0) + 1
+            facts.append(fact)
+        return sorted(facts, key=lambda f: f["start_char"])
+
+    def extract_attachment(self, db: Session, model, attachment) -> Optional[int]:
+        """Replace an extracted attachment's fact rows (caller commits); number of facts stored"""
+        form_data = attachment.form_data or {}
+        text = extracted_text(form_data)
+        self.delete(db, model, attachment)
+        if form_data.get("status") != "success" or not text.strip():
+            return None
+
+        if isinstance(attachment, TenderAttachment):
+            tenderid, vendorid = attachment.tenderid, None
+        else:
+            tenderid, vendorid = attachment.vendor.tenderid, attachment.vendorid
+        facts = self.extract(form_data, text)
+        db.add_all([
+            AttachmentFact(
+                attachment_type=attachment_type_of(model),
+                attachment_id=attachment_id_of(attachment),
+                tenderid=tenderid,
+                vendorid=vendorid,
+                extractor_version=self.VERSION,
+                **fact,
+            )
+            for fact in facts
+        ])
+        return len(facts)
+
+    def delete(self, db: Session, model, attachment):
+        """Drop an attachment's fact rows (caller commits)"""
+        db.query(AttachmentFact).filter(
+            AttachmentFact.attachment_type == attachment_type_of(model),
+            AttachmentFact.attachment_id == attachment_id_of(attachment),
+        ).delete(synchronize_session=False)
+
+    def schedule(self, model, attachment_id: int):
+        """Extract an attachment's facts in the background once its extraction has finished"""
+        return self.executor.submit(self._extract_job, model, attachment_id)
+
+    def _extract_job(self, model, attachment_id: int):
+        db = SessionLocal()
+        try:
+            attachment = db.get(model, attachment_id)
+            if attachment is None:
+                return
+            count = self.extract_attachment(db, model, attachment)
+            db.commit()
+            if count is not None:
+                logger.info(f"Extracted {count} facts from {model.__name__} {attachment_id}")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Fact extraction failed for {model.__name__} {attachment_id}: {e}")
+        finally:
+            db.close()
+
+    # ------------------------------------------------------------------ lookup
+
+    def _in_currency(self, currency: str):
+        """Filter keeping non-amount facts and amounts in `currency` or with no stated currency"""
+        return or_(
+            AttachmentFact.fact.notin_(CURRENCY_FACTS),
+            AttachmentFact.unit == currency,
+            AttachmentFact.unit.is_(None),
+        )
+
+    def vendor_facts(self, db: Session, tenderid: int, currency: Optional[str] = None) -> Dict[int, Dict[str, List[Any]]]:
+        """
+        {vendorid: {fact: [values]}} for a tender's vendors (dates as date objects), most confident first.
+        Amounts are limited to `currency` (default FACT_CURRENCY) so they compare like for like.
+        """
+        rows = (
+            db.query(AttachmentFact)
+            .filter(
+                AttachmentFact.tenderid == tenderid,
+                AttachmentFact.vendorid.isnot(None),
+                self._in_currency((currency or settings.FACT_CURRENCY).upper()),
+            )
+            .order_by(AttachmentFact.vendorid, AttachmentFact.fact, AttachmentFact.confidence.desc())
+            .all()
+        )
+        facts: Dict[int, Dict[str, List[Any]]] = {}
+        for row in rows:
+            value = row.value_date if row.value_date is not None else row.value_number
+            facts.setdefault(row.vendorid, {}).setdefault(row.fact, []).append(value)
+        return facts
+
+    def rank_vendors(
+        self,
+        db: Session,
+        tenderid: int,
+        fact: str,
+        minimum: Any = None,
+        maximum: Any = None,
+        aggregate: str = "max",
+        order: str = "desc",
+        limit: Optional[int] = None,
+        currency: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Vendors of a tender with a fact, one value per vendor (max or min of its facts),
+        filtered to [minimum, maximum] and sorted in SQL; unparseable bounds raise HTTPException(400). Amounts only count in `currency`
+        (default FACT_CURRENCY), or when no currency was stated.
+        """
+        column = AttachmentFact.value_date if fact in DATE_FACTS else AttachmentFact.value_number
+        parse = parse_date if fact in DATE_FACTS else parse_number
+        bounds = {}
+        for name, raw in (("min", minimum), ("max", maximum)):
+            if raw is None:
+                continue
+            bounds[name] = parse(raw)
+            if bounds[name] is None:
+                kind = "date" if fact in DATE_FACTS else "number"
+                raise HTTPException(status_code=400, detail=f"Cannot parse {kind} value {raw!r} for {name}")
+        value = (func.min if aggregate == "min" else func.max)(column).label("value")
+        query = (
+            db.query(
+                Vendor.vendorid,
+                Vendor.vendorform,
+                Vendor.filename,
+                value,
+                func.max(AttachmentFact.confidence).label("confidence"),
+                func.count(AttachmentFact.id).label("count"),
+            )
+            .join(AttachmentFact, AttachmentFact.vendorid == Vendor.vendorid)
+            .filter(AttachmentFact.tenderid == tenderid, AttachmentFact.fact == fact, column.isnot(None))
+        )
+        unit = FACT_UNITS.get(fact)
+        if fact in CURRENCY_FACTS:
+            unit = (currency or settings.FACT_CURRENCY).upper()
+            query = query.filter(self._in_currency(unit))
+        query = query.group_by(Vendor.vendorid, Vendor.vendorform, Vendor.filename)
+        if "min" in bounds:
+            query = query.having(value >= bounds["min"])
+        if "max" in bounds:
+            query = query.having(value <= bounds["max"])
+        query = query.order_by(value.asc() if order == "asc" else value.desc(), Vendor.vendorid)
+        if limit:
+            query = query.limit(limit)
+        return [
+            {
+                "vendorid": row.vendorid,
+                "name": row.vendorform or row.filename or f"Vendor {row.vendorid}",
+                "fact": fact,
+                "value": row.value.isoformat() if isinstance(row.value, date) else row.value,
+                "unit": unit,
+                "confidence": row.confidence,
+                "count": row.count,
+            }
+            for row in query.all()
+        ]
+
+    def fact_dict(self, row: AttachmentFact) -> Dict[str, Any]:
+        return {
+            "id": row.id,
+            "attachment_type": row.attachment_type,
+            "attachment_id": row.attachment_id,
+            "vendorid": row.vendorid,
+            "fact": row.fact,
+            "value": row.value_date.isoformat() if row.value_date is not None else row.value_number,
+            "unit": row.unit,
+            "raw_text": row.raw_text,
+            "page": row.page,
+            "start_char": row.start_char,
+            "confidence": row.confidence,
+            "extractor_version": row.extractor_version,
+        }
+
+
+# Global fact extraction service instance
+fact_extraction_service = FactExtractionService()
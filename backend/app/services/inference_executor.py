@@ -0,0 +1,188 @@
+"""
+Batched LLM inference off the event loop.
+
+Coroutines submit prompts with ``await executor.generate(prompt)``. A single
+worker thread drains the queue, waits up to LLM_BATCH_WAIT_MS for more prompts
+to arrive, sorts the pending prompts by token length and runs them through
+the backend in padded batches of at most LLM_BATCH_SIZE, so prompts of similar
+length share a batch and little compute is spent on padding. Prompts that
+continue the same shared prefix are batched together so the backend can reuse
+that prefix's key/value cache, and prompts expecting the same evaluation
+JSON keys share one constrained-decoding batch. Results are handed back to
+the waiting coroutines with ``loop.call_soon_threadsafe``.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from itertools import groupby
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.services.llm_backends import LLMBackend
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _InferenceRequest:
+    prompt: str
+    max_new_tokens: int
+    loop: asyncio.AbstractEventLoop
+    future: asyncio.Future
+    prefix: Optional[str] = None
+    json_keys: Optional[Tuple[str, ...]] = None
+    token_count: int = 0
+
+
+def _resolve(request: _InferenceRequest, result: Any = None, error: Optional[BaseException] = None):
+    """Complete a request's future on its own event loop; dropped if that loop has already closed"""
+    def _set():
+        if request.future.done():
+            return
+        if error is not None:
+            request.future.set_exception(error)
+        else:
+            request.future.set_result(result)
+    try:
+        request.loop.call_soon_threadsafe(_set)
+    except RuntimeError:
+        # The caller's loop is closed (cancelled request, worker shutting down): nobody is waiting
+        logger.debug("Dropping inference result for a closed event loop")
+
+
+class InferenceExecutor:
+    def __init__(self, backend_getter: Callable[[], LLMBackend], batch_size: int = 8, max_wait_ms: int = 50):
+        self.backend_getter = backend_getter
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000
+        self._queue: "queue.Queue[_InferenceRequest]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        self.batches_run = 0
+        self.prompts_run = 0
+        self.generation_seconds = 0.0
+
+    async def generate(
+        self,
+        prompt: str,
+        max_new_tokens: int = 512,
+        prefix: Optional[str] = None,
+        json_keys: Optional[Sequence[str]] = None,
+    ) -> str:
+        """
+        Queue one prompt (a continuation of `prefix`, if given) and wait for its completion;
+        `json_keys` are passed to the backend for constrained JSON output
+        """
+        loop = asyncio.get_running_loop()
+        request = _InferenceRequest(
+            prompt, max_new_tokens, loop, loop.create_future(), prefix, tuple(json_keys) if json_keys else None
+        )
+        self._ensure_worker()
+        self._queue.put(request)
+        return await request.future
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="llm-inference", daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> List[_InferenceRequest]:
+        """Block for the first request, then gather whatever arrives within the wait window"""
+        pending = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                pending.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # Anything already queued joins this round without further waiting
+        while True:
+            try:
+                pending.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return pending
+
+    def _batches(self, backend: LLMBackend, pending: List[_InferenceRequest]) -> List[List[_InferenceRequest]]:
+        """Group by (generation length, shared prefix, JSON keys), then by prompt token length, into batch_size chunks"""
+        for request in pending:
+            request.token_count = backend.count_tokens(request.prompt)
+        group_key = lambda r: (r.max_new_tokens, r.prefix or "", r.json_keys or ())
+        pending.sort(key=lambda r: (group_key(r), r.token_count))
+
+        batches = []
+        for _, group in groupby(pending, key=group_key):
+            group = list(group)
+            for start in range(0, len(group), self.batch_size):
+                batches.append(group[start:start + self.batch_size])
+        return batches
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            try:
+                self._run_round(pending)
+            except Exception as e:
+                # This is the only inference thread: fail the round's unanswered requests and keep serving
+                logger.error(f"Inference round of {len(pending)} prompts failed: {e}")
+                for request in pending:
+                    _resolve(request, error=e)
+
+    def _run_round(self, pending: List[_InferenceRequest]):
+        # Callers whose loop has closed are gone; don't spend generation on them
+        pending = [r for r in pending if not r.loop.is_closed()]
+        if not pending:
+            return
+        try:
+            backend = self.backend_getter()
+            if backend is None:
+                raise RuntimeError("LLM backend is not loaded")
+            batches = self._batches(backend, pending)
+        except Exception as e:
+            for request in pending:
+                _resolve(request, error=e)
+            return
+
+        for batch in batches:
+            started = time.perf_counter()
+            try:
+                outputs = backend.generate(
+                    [r.prompt for r in batch],
+                    max_new_tokens=batch[0].max_new_tokens,
+                    prefix=batch[0].prefix,
+                    json_keys=batch[0].json_keys,
+                )
+            except Exception as e:
+                logger.error(f"Batched generation failed for {len(batch)} prompts: {e}")
+                for request in batch:
+                    _resolve(request, error=e)
+                continue
+
+            elapsed = time.perf_counter() - started
+            self.batches_run += 1
+            self.prompts_run += len(batch)
+            self.generation_seconds += elapsed
+            logger.info(
+                f"Generated batch of {len(batch)} prompts "
+                f"({batch[0].token_count}-{batch[-1].token_count} tokens) in {elapsed:.2f}s"
+            )
+            for request, output in zip(batch, outputs):
+                _resolve(request, result=output)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "batch_size": self.batch_size,
+            "batch_wait_ms": int(self.max_wait * 1000),
+            "queued": self._queue.qsize(),
+            "batches_run": self.batches_run,
+            "prompts_run": self.prompts_run,
+            "mean_batch_size": round(self.prompts_run / self.batches_run, 2) if self.batches_run else 0,
+            "generation_seconds": round(self.generation_seconds, 2),
+        }
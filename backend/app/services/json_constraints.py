@@ -0,0 +1,301 @@
+"""
+Schema-constrained decoding of the evaluation JSON.
+
+The evaluation output has a fixed shape driven by the criteria keys:
+
+    {"key_1": {"score": <int>, "reasoning": "<text>"}, ..., "key_n": {...}}
+
+so it is modelled as a template of literal segments and two kinds of free
+slots (score digits, reasoning text). JsonTemplateState tracks where one
+generated sequence is in that template; JsonLogitsProcessor masks the logits
+each step so only tokens that keep the output valid can be chosen:
+
+- literal segment: the longest vocabulary token that is a prefix of the
+  remaining literal is forced (no model choice is needed there);
+- score slot: single digits, at most three and without a leading zero
+  ("0" alone is fine), then the next literal;
+- reasoning slot: tokens without quotes, backslashes or control characters,
+  closed by the next literal (forced once LLM_REASONING_MAX_CHARS is reached);
+- after the final "}" only EOS is allowed.
+
+If the vocabulary cannot spell the next literal, that sequence is released
+and generates unconstrained; the stopping criteria then watch its brace depth
+like an unconstrained run.
+
+JsonCompleteStoppingCriteria ends generation as soon as every sequence has
+closed its top-level object (with or without the processor), instead of
+running on to max_new_tokens. The processor and criteria follow the
+transformers LogitsProcessor / StoppingCriteria call signatures; torch is
+imported lazily.
+"""
+
+import logging
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+LITERAL, SCORE, REASONING = "literal", "score", "reasoning"
+MAX_SCORE_DIGITS = 3
+# Conservative characters per generated token when sizing the generation budget
+BUDGET_CHARS_PER_TOKEN = 2.0
+
+
+def build_template(keys: Sequence[str]) -> List[Tuple[str, str]]:
+    """Template segments (kind, literal text) for the given criteria keys"""
+    segments: List[Tuple[str, str]] = []
+    for i, key in enumerate(keys):
+        opener = "{" if i == 0 else ", "
+        segments.append((LITERAL, f'{opener}"{key}": {{"score": '))
+        segments.append((SCORE, ""))
+        segments.append((LITERAL, ', "reasoning": "'))
+        segments.append((REASONING, ""))
+        segments.append((LITERAL, '"}'))
+    segments.append((LITERAL, "}"))
+
+    # Merge adjacent literals ('"}' + ', "key": ...') so each slot is followed by one literal
+    merged: List[Tuple[str, str]] = []
+    for kind, text in segments:
+        if merged and kind == LITERAL and merged[-1][0] == LITERAL:
+            merged[-1] = (LITERAL, merged[-1][1] + text)
+        else:
+            merged.append((kind, text))
+    return merged
+
+
+def token_budget(keys: Sequence[str], reasoning_max_chars: int, overhead: int = 16) -> int:
+    """
+    max_new_tokens for the evaluation JSON of `keys`: the template's literal text (keys
+    and punctuation), the score digits and each reasoning up to `reasoning_max_chars`,
+    at BUDGET_CHARS_PER_TOKEN characters per token, plus `overhead`.
+    """
+    template = build_template(keys or ["criterion"])
+    literal_chars = sum(len(text) for kind, text in template if kind == LITERAL)
+    slot_chars = sum(MAX_SCORE_DIGITS if kind == SCORE else reasoning_max_chars for kind, _ in template if kind != LITERAL)
+    return overhead + math.ceil((literal_chars + slot_chars) / BUDGET_CHARS_PER_TOKEN)
+
+
+class TokenVocabulary:
+    """Decoded text of every vocabulary token plus the masks the processor needs"""
+
+    def __init__(self, tokenizer):
+        import torch
+
+        self.eos_token_id = tokenizer.eos_token_id
+        size = len(tokenizer)
+        special = set(tokenizer.all_special_ids)
+
+        # Decode after an anchor so leading spaces of SentencePiece/BPE tokens are kept
+        anchor = tokenizer.encode("a", add_special_tokens=False)
+        base = tokenizer.decode(anchor)
+        self.strings: List[str] = []
+        for token_id in range(size):
+            if token_id in special:
+                self.strings.append("")
+            else:
+                self.strings.append(tokenizer.decode(anchor + [token_id])[len(base):])
+
+        self.by_string: Dict[str, int] = {}
+        for token_id, text in enumerate(self.strings):
+            if text and text not in self.by_string:
+                self.by_string[text] = token_id
+        self.max_length = max((len(t) for t in self.by_string), default=1)
+
+        self.size = size
+        self._masks: Dict[Tuple[int, str], Tuple["torch.Tensor", "torch.Tensor"]] = {}
+        self.digit_mask = torch.zeros(size, dtype=torch.bool)
+        self.reasoning_mask = torch.zeros(size, dtype=torch.bool)
+        for token_id, text in enumerate(self.strings):
+            if len(text) == 1 and text.isdigit():
+                self.digit_mask[token_id] = True
+            if text and text.isprintable() and '"' not in text and "\\" not in text:
+                self.reasoning_mask[token_id] = True
+
+    def masks(self, width: int, device) -> Tuple["torch.Tensor", "torch.Tensor"]:
+        """(digit, reasoning) masks sized to the logits width (models may pad their vocabulary)"""
+        import torch
+
+        key = (width, str(device))
+        if key not in self._masks:
+            masks = []
+            for mask in (self.digit_mask, self.reasoning_mask):
+                sized = torch.zeros(width, dtype=torch.bool)
+                sized[:min(width, self.size)] = mask[:width]
+                masks.append(sized.to(device))
+            self._masks[key] = tuple(masks)
+        return self._masks[key]
+
+    def longest_prefix_token(self, text: str) -> Optional[int]:
+        """Id of the longest token whose text is a prefix of `text`"""
+        for length in range(min(self.max_length, len(text)), 0, -1):
+            token_id = self.by_string.get(text[:length])
+            if token_id is not None:
+                return token_id
+        return None
+
+
+class JsonTemplateState:
+    """Position of one generated sequence inside the template"""
+
+    def __init__(self, template: List[Tuple[str, str]], reasoning_max_chars: int):
+        self.template = template
+        self.reasoning_max_chars = reasoning_max_chars
+        self.segment = 0
+        self.offset = 0  # chars consumed in the current segment
+        self.leading_zero = False  # current score started with "0": no more digits
+        self.invalid = False
+        self.unconstrained = False  # released because the vocabulary cannot spell the template
+
+    @property
+    def done(self) -> bool:
+        return self.segment >= len(self.template)
+
+    def _advance(self):
+        self.segment += 1
+        self.offset = 0
+        self.leading_zero = False
+
+    def feed(self, text: str):
+        """Consume generated text"""
+        for char in text:
+            while not self.done:
+                kind, literal = self.template[self.segment]
+                if kind == LITERAL:
+                    if char != literal[self.offset]:
+                        self.invalid = True
+                    self.offset += 1
+                    if self.offset == len(literal):
+                        self._advance()
+                    break
+                if kind == SCORE:
+                    if char.isdigit() and self.offset < MAX_SCORE_DIGITS and not self.leading_zero:
+                        self.leading_zero = self.offset == 0 and char == "0"
+                        self.offset += 1
+                        break
+                    self._advance()  # the char starts the next literal
+                    continue
+                # REASONING
+                if char == '"':
+                    self._advance()
+                    continue
+                self.offset += 1
+                break
+
+    def next_literal(self) -> str:
+        """Remaining text of the current literal, or of the literal after the current slot"""
+        kind, literal = self.template[self.segment]
+        if kind == LITERAL:
+            return literal[self.offset:]
+        return self.template[self.segment + 1][1]
+
+
+class JsonLogitsProcessor:
+    """Masks logits so every sequence in the batch follows the template"""
+
+    def __init__(self, vocabulary: TokenVocabulary, keys: Sequence[str], batch_size: int, reasoning_max_chars: int):
+        template = build_template(keys)
+        self.vocabulary = vocabulary
+        self.states = [JsonTemplateState(template, reasoning_max_chars) for _ in range(batch_size)]
+        self.consumed: Optional[int] = None  # sequence length already fed to the states
+        self.prompt_length: Optional[int] = None
+
+    def sync(self, input_ids):
+        """Feed tokens generated since the last call (first call marks the prompt end)"""
+        if self.consumed is None:
+            self.consumed = self.prompt_length = input_ids.shape[1]
+            return
+        for position in range(self.consumed, input_ids.shape[1]):
+            for row, state in enumerate(self.states):
+                state.feed(self.vocabulary.strings[int(input_ids[row, position])])
+        self.consumed = input_ids.shape[1]
+
+    @property
+    def finished(self) -> List[Optional[bool]]:
+        """Per sequence: whether the template is complete, or None for unconstrained sequences"""
+        return [None if state.unconstrained else state.done or state.invalid for state in self.states]
+
+    def __call__(self, input_ids, scores):
+        import torch
+
+        self.sync(input_ids)
+        allowed = torch.zeros_like(scores, dtype=torch.bool)
+        digit_mask, reasoning_mask = self.vocabulary.masks(scores.shape[-1], scores.device)
+        for row, state in enumerate(self.states):
+            if state.unconstrained:
+                allowed[row] = True
+                continue
+            if state.done or state.invalid:
+                allowed[row, self.vocabulary.eos_token_id] = True
+                continue
+
+            kind = state.template[state.segment][0]
+            close = self.vocabulary.longest_prefix_token(state.next_literal())
+            if close is None:
+                # The vocabulary cannot spell the template; let the model finish unconstrained
+                state.unconstrained = True
+                allowed[row] = True
+                continue
+            if kind == LITERAL:
+                allowed[row, close] = True
+            elif kind == SCORE:
+                if state.offset < MAX_SCORE_DIGITS and not state.leading_zero:
+                    allowed[row] |= digit_mask
+                if state.offset > 0:
+                    allowed[row, close] = True
+            else:
+                if state.offset < state.reasoning_max_chars:
+                    allowed[row] |= reasoning_mask
+                allowed[row, close] = True
+
+        return scores.masked_fill(~allowed, float("-inf"))
+
+
+class JsonCompleteStoppingCriteria:
+    """
+    Stop once every sequence has closed its top-level JSON object. Uses the processor's
+    template state when decoding is constrained, otherwise (and for sequences the
+    processor released) scans brace depth, ignoring braces inside strings.
+    """
+
+    def __init__(self, tokenizer, processor: Optional[JsonLogitsProcessor] = None):
+        self.tokenizer = tokenizer
+        self.processor = processor
+        self.prompt_length: Optional[int] = None
+
+    def _closed(self, text: str) -> bool:
+        depth, in_string, escaped, opened = 0, False, False, False
+        for char in text:
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == "{":
+                depth += 1
+                opened = True
+            elif char == "}":
+                depth -= 1
+                if opened and depth == 0:
+                    return True
+        return False
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        if self.processor is not None:
+            self.processor.sync(input_ids)
+            finished = self.processor.finished
+            for row, done in enumerate(finished):
+                if done is None:
+                    text = self.tokenizer.decode(input_ids[row, self.processor.prompt_length:], skip_special_tokens=True)
+                    finished[row] = self._closed(text)
+            return torch.tensor(finished, dtype=torch.bool, device=input_ids.device)
+
+        if self.prompt_length is None:
+            self.prompt_length = input_ids.shape[1] - 1
+        texts = self.tokenizer.batch_decode(input_ids[:, self.prompt_length:], skip_special_tokens=True)
+        return torch.tensor([self._closed(t) for t in texts], dtype=torch.bool, device=input_ids.device)
@@ -0,0 +1,215 @@
+"""
+Lexical (BM25) scoring of vendors against evaluation criteria.
+
+Used when the LLM is unavailable. One vocabulary, IDF vector and average
+passage length is fitted per tender (tender passages plus the criteria texts)
+and cached; each criterion becomes a binary query row over that vocabulary.
+Vendor texts are split into passages, weighted with BM25 and scored against
+every criterion in one sparse matrix product, so all vendors x all criteria
+cost a handful of sparse operations instead of a regex scan per term. When the
+LLM is down a run scores all its vendors in one score_vendors call; since
+length normalisation uses the tender's average passage length, a vendor's
+scores do not depend on which other vendors share the call, and the cached
+per-vendor results serve the individual fallbacks.
+
+Per vendor and criterion the score combines
+- coverage: IDF-weighted share of the criterion's terms found anywhere in the bid;
+- strength: best passage's BM25 score relative to a passage that contains
+  every criterion term once;
+and the reasoning quotes the best matching passages.
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence
+
+try:
+    import numpy as np
+    from scipy import sparse
+    from sklearn.feature_extraction.text import CountVectorizer
+    HAS_SKLEARN = True
+except ImportError:
+    HAS_SKLEARN = False
+
+from app.core.config import settings
+from app.services.embedding_service import chunk_text, chunk_spans
+
+logger = logging.getLogger(__name__)
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+SNIPPET_CHARS = 160
+
+
+def criterion_query(criterion: Dict[str, Any]) -> str:
+    return f"{criterion.get('name', '')} {criterion.get('description') or ''}"
+
+
+@dataclass
+class _TenderModel:
+    """Vocabulary and IDF fitted on one tender, with the criteria as binary query rows"""
+    vectorizer: "CountVectorizer"
+    idf: "np.ndarray"  # (terms,)
+    queries: "sparse.csr_matrix"  # (criteria, terms) binary
+    query_mass: "np.ndarray"  # (criteria,) sum of IDF over each criterion's terms
+    avg_length: float  # mean term count of the tender's passages (BM25 length normalisation)
+
+
+class LexicalScoringService:
+    MODEL_CACHE_SIZE = 8
+    SCORE_CACHE_SIZE = 512
+
+    def __init__(self):
+        self._models: "OrderedDict[str, _TenderModel]" = OrderedDict()
+        self._scores: "OrderedDict[str, Dict[str, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return HAS_SKLEARN
+
+    def _passages(self, text: str) -> List[str]:
+        spans = chunk_spans(text, size=settings.LEXICAL_PASSAGE_CHARS, overlap=0)
+        return [p for p in chunk_text(text, spans) if p]
+
+    def _model_key(self, tender_text: str, criteria: Sequence[Dict[str, Any]]) -> str:
+        return hashlib.sha256("\0".join([tender_text, *(criterion_query(c) for c in criteria)]).encode("utf-8")).hexdigest()
+
+    def _score_key(self, model_key: str, vendor_text: str) -> str:
+        return hashlib.sha256(f"{model_key}\0{vendor_text}".encode("utf-8")).hexdigest()
+
+    def _tender_model(self, tender_text: str, criteria: Sequence[Dict[str, Any]]) -> _TenderModel:
+        queries = [criterion_query(c) for c in criteria]
+        key = self._model_key(tender_text, criteria)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+
+        passages = self._passages(tender_text)
+        corpus = passages + queries
+        vectorizer = CountVectorizer(stop_words="english", ngram_range=(1, 2))
+        counts = vectorizer.fit_transform(corpus)
+        df = np.bincount(counts.indices, minlength=counts.shape[1])
+        idf = np.log((counts.shape[0] + 1) / (df + 1)) + 1.0
+        lengths = np.asarray(counts.sum(axis=1)).ravel()
+        tender_lengths = lengths[:len(passages)]
+        avg_length = float(tender_lengths.mean()) if tender_lengths.size and tender_lengths.mean() > 0 else 0.0
+
+        query_matrix = vectorizer.transform(queries)
+        query_matrix.data[:] = 1
+        model = _TenderModel(
+            vectorizer=vectorizer,
+            idf=idf,
+            queries=query_matrix.tocsr().astype(np.float64),
+            query_mass=np.asarray(query_matrix @ idf).ravel(),
+            avg_length=avg_length or max(1.0, float(lengths.mean()) if lengths.size else 1.0),
+        )
+        with self._lock:
+            self._models[key] = model
+            while len(self._models) > self.MODEL_CACHE_SIZE:
+                self._models.popitem(last=False)
+        return model
+
+    def _bm25(self, counts: "sparse.csr_matrix", model: _TenderModel) -> "sparse.csr_matrix":
+        """BM25 term weights of passage count rows, length normalised by the tender's average passage"""
+        idf = model.idf
+        lengths = np.asarray(counts.sum(axis=1)).ravel()
+        row_norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / model.avg_length)
+        tf = counts.data.astype(np.float64)
+        rows = np.repeat(np.arange(counts.shape[0]), np.diff(counts.indptr))
+        weighted = counts.copy().astype(np.float64)
+        weighted.data = tf * (BM25_K1 + 1) / (tf + row_norm[rows]) * idf[counts.indices]
+        return weighted
+
+    def score_vendors(
+        self, tender_text: str, vendor_texts: Sequence[str], criteria: Sequence[Dict[str, Any]]
+    ) -> List[Dict[str, Dict[str, Any]]]:
+        """
+        Scores for every vendor text and criterion, as one {criterion name: {score, reasoning,
+        coverage, strength}} dict per vendor (in input order).
+        """
+        if not criteria:
+            return [{} for _ in vendor_texts]
+        model = self._tender_model(tender_text or "", criteria)
+
+        passages: List[str] = []
+        offsets = [0]
+        for text in vendor_texts:
+            passages.extend(self._passages(text or ""))
+            offsets.append(len(passages))
+        owners = np.repeat(np.arange(len(vendor_texts)), np.diff(offsets))
+
+        vendor_count, criteria_count = len(vendor_texts), len(criteria)
+        coverage = np.zeros((vendor_count, criteria_count))
+        best = np.zeros((vendor_count, criteria_count))
+        best_rows = np.full((vendor_count, criteria_count, 2), -1, dtype=np.int64)
+        passage_scores = np.zeros((0, criteria_count))
+        if passages:
+            counts = model.vectorizer.transform(passages).tocsr()
+            # Passage x criterion BM25 scores: one sparse product for every vendor and criterion
+            passage_scores = (self._bm25(counts, model) @ model.queries.T).toarray()
+
+            # Vendor x term presence, then IDF-weighted overlap with each criterion's terms
+            membership = sparse.csr_matrix(
+                (np.ones(len(owners)), (owners, np.arange(len(owners)))),
+                shape=(vendor_count, len(owners)),
+            )
+            present = ((membership @ counts) > 0).astype(np.float64)
+            overlap = (sparse.csr_matrix(present.multiply(model.idf)) @ model.queries.T).toarray()
+            coverage = overlap / np.maximum(model.query_mass, 1e-9)
+
+            for vendor_index in range(vendor_count):
+                start, stop = offsets[vendor_index], offsets[vendor_index + 1]
+                if start == stop:
+                    continue
+                block = passage_scores[start:stop]
+                best[vendor_index] = block.max(axis=0)
+                top = np.argsort(-block, axis=0, kind="stable")[:2].T
+                best_rows[vendor_index, :, :top.shape[1]] = start + top
+
+        strength = np.minimum(1.0, best / np.maximum(model.query_mass, 1e-9))
+        scores = np.rint(20 + 75 * (0.6 * coverage + 0.4 * strength)).astype(int)
+
+        results = []
+        for vendor_index in range(vendor_count):
+            vendor_scores = {}
+            for c, criterion in enumerate(criteria):
+                quotes = [
+                    f'"{passages[r][:SNIPPET_CHARS].strip()}"'
+                    for r in best_rows[vendor_index, c]
+                    if r >= 0 and passage_scores[r, c] > 0
+                ]
+                reasoning = f"Lexical match: {coverage[vendor_index, c]:.0%} of criterion terms found"
+                reasoning += f"; best passages: {' | '.join(quotes)}" if quotes else "; no matching passage"
+                vendor_scores[criterion["name"]] = {
+                    "score": int(scores[vendor_index, c]),
+                    "reasoning": reasoning,
+                    "coverage": round(float(coverage[vendor_index, c]), 4),
+                    "strength": round(float(strength[vendor_index, c]), 4),
+                }
+            results.append(vendor_scores)
+
+        model_key = self._model_key(tender_text or "", criteria)
+        with self._lock:
+            for text, vendor_scores in zip(vendor_texts, results):
+                self._scores[self._score_key(model_key, text or "")] = vendor_scores
+            while len(self._scores) > self.SCORE_CACHE_SIZE:
+                self._scores.popitem(last=False)
+        return results
+
+    def score_vendor(self, tender_text: str, vendor_text: str, criteria: Sequence[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """One vendor's scores, from a run's batched score_vendors call when it already covered this text"""
+        key = self._score_key(self._model_key(tender_text or "", criteria), vendor_text or "")
+        with self._lock:
+            if key in self._scores:
+                self._scores.move_to_end(key)
+                return self._scores[key]
+        return self.score_vendors(tender_text, [vendor_text], criteria)[0]
+
+
+# Global lexical scoring service instance
+lexical_scoring_service = LexicalScoringService()
@@ -0,0 +1,359 @@
+"""
+Pluggable text-generation backends for AI evaluation.
+
+AIEvaluationService talks to a backend instead of a hard-wired transformers
+pipeline. Selection comes from settings.LLM_BACKEND:
+
+    transformers_gpu  4-bit (bitsandbytes NF4) model with device_map="auto"; needs CUDA
+    transformers_cpu  full-precision load + torch dynamic int8 quantization of Linear layers
+    stub              deterministic scores derived from the prompt; no model, for load tests
+    auto              transformers_gpu if CUDA is available, else transformers_cpu
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class LLMBackend:
+    """Interface every backend implements"""
+
+    name = "base"
+
+    def __init__(self, model_source: str, local_files_only: bool = False):
+        self.model_source = model_source
+        self.local_files_only = local_files_only
+        self.tokenizer = None
+
+    def load(self):
+        """Load weights/tokenizer; raise on failure"""
+        raise NotImplementedError
+
+    def generate(
+        self,
+        prompts: List[str],
+        max_new_tokens: int = 512,
+        prefix: Optional[str] = None,
+        json_keys: Optional[Sequence[str]] = None,
+    ) -> List[str]:
+        """
+        Greedy completion for each prompt (completion text only, prompt not included).
+        With `prefix`, every prompt is a continuation of that shared prefix; backends
+        that can reuse the prefix's key/value cache do so, others just concatenate.
+        With `json_keys`, the completion is the evaluation JSON object for those criteria
+        keys and generation stops as soon as that object closes.
+        """
+        raise NotImplementedError
+
+    # Characters per token assumed when there is no tokenizer (stub backend)
+    CHARS_PER_TOKEN = 4
+
+    def count_tokens(self, text: str) -> int:
+        """Length of `text` in tokens, without special tokens (estimated when there is no tokenizer)"""
+        if self.tokenizer is not None:
+            return len(self.tokenizer(text, add_special_tokens=False)["input_ids"])
+        return -(-len(text) // self.CHARS_PER_TOKEN)
+
+    def truncate_tokens(self, text: str, max_tokens: int) -> str:
+        """Longest head of `text` that is at most `max_tokens` tokens"""
+        if self.tokenizer is not None:
+            ids = self.tokenizer(text, add_special_tokens=False)["input_ids"][:max_tokens]
+            return self.tokenizer.decode(ids, skip_special_tokens=True)
+        return text[:max_tokens * self.CHARS_PER_TOKEN]
+
+    def context_window(self) -> Optional[int]:
+        """Model context length in tokens, if the tokenizer declares a real one"""
+        length = getattr(self.tokenizer, "model_max_length", None)
+        return length if isinstance(length, int) and length < 1_000_000 else None
+
+    def device_info(self) -> Dict[str, Any]:
+        return {}
+
+
+class TransformersBackend(LLMBackend):
+    """
+    Shared Hugging Face transformers loading/generation; subclasses choose the model placement.
+
+    Shared prompt prefixes (tender + criteria + instructions) are prefilled once and
+    their DynamicCache kept in a small LRU keyed by the prefix hash, so each vendor
+    continuation only prefills its own tokens.
+    """
+
+    def __init__(
+        self,
+        model_source: str,
+        local_files_only: bool = False,
+        prefix_cache_size: int = 4,
+        constrained_decoding: bool = True,
+        reasoning_max_chars: int = 240,
+    ):
+        super().__init__(model_source, local_files_only)
+        self.model = None
+        self.constrained_decoding = constrained_decoding
+        self.reasoning_max_chars = reasoning_max_chars
+        self._vocabulary = None
+        self.prefix_cache_size = prefix_cache_size
+        self._prefix_cache: "OrderedDict[str, Any]" = OrderedDict()
+        self.prefix_hits = 0
+        self.prefix_misses = 0
+
+    def _load_tokenizer(self):
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_source, local_files_only=self.local_files_only)
+        self.tokenizer.pad_token = self.tokenizer.eos_token
+        # Decoder-only models must be left-padded for batched generation
+        self.tokenizer.padding_side = "left"
+
+    def _load_model(self):
+        raise NotImplementedError
+
+    def load(self):
+        self._load_tokenizer()
+        self.model = self._load_model()
+        self.model.eval()
+
+    def _json_controls(self, json_keys: Optional[Sequence[str]], batch: int) -> Dict[str, Any]:
+        """logits_processor / stopping_criteria kwargs for generate() when JSON output is expected"""
+        if not json_keys:
+            return {}
+        from transformers import LogitsProcessorList, StoppingCriteriaList
+
+        from app.services.json_constraints import JsonCompleteStoppingCriteria, JsonLogitsProcessor, TokenVocabulary
+
+        processor = None
+        if self.constrained_decoding:
+            if self._vocabulary is None:
+                self._vocabulary = TokenVocabulary(self.tokenizer)
+            processor = JsonLogitsProcessor(self._vocabulary, json_keys, batch, self.reasoning_max_chars)
+        controls = {"stopping_criteria": StoppingCriteriaList([JsonCompleteStoppingCriteria(self.tokenizer, processor)])}
+        if processor is not None:
+            controls["logits_processor"] = LogitsProcessorList([processor])
+        return controls
+
+    def _generate_ids(self, input_ids, attention_mask, max_new_tokens: int, past_key_values=None, json_keys=None):
+        import torch
+
+        with torch.inference_mode():
+            return self.model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                past_key_values=past_key_values,
+                max_new_tokens=max_new_tokens,
+                **self._json_controls(json_keys, input_ids.shape[0]),
+                do_sample=False,
+                num_return_sequences=1,
+                pad_token_id=self.tokenizer.eos_token_id,
+                eos_token_id=self.tokenizer.eos_token_id,
+            )
+
+    def _decode_new(self, output, prompt_length: int) -> List[str]:
+        new_tokens = output[:, prompt_length:]
+        return [text.strip() for text in self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)]
+
+    def _prefix_state(self, prefix: str):
+        """(prefix input_ids, prefilled DynamicCache) for a prefix, computed once per LRU slot"""
+        import torch
+        from transformers import DynamicCache
+
+        key = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        if key in self._prefix_cache:
+            self._prefix_cache.move_to_end(key)
+            self.prefix_hits += 1
+            return self._prefix_cache[key]
+
+        self.prefix_misses += 1
+        prefix_ids = self.tokenizer(prefix, return_tensors="pt").input_ids.to(self.model.device)
+        cache = DynamicCache()
+        with torch.inference_mode():
+            self.model(input_ids=prefix_ids, past_key_values=cache, use_cache=True)
+
+        self._prefix_cache[key] = (prefix_ids, cache)
+        while len(self._prefix_cache) > max(0, self.prefix_cache_size):
+            self._prefix_cache.popitem(last=False)
+        return prefix_ids, cache
+
+    def generate(
+        self,
+        prompts: List[str],
+        max_new_tokens: int = 512,
+        prefix: Optional[str] = None,
+        json_keys: Optional[Sequence[str]] = None,
+    ) -> List[str]:
+        import torch
+
+        if not prefix:
+            inputs = self.tokenizer(prompts, return_tensors="pt", padding=True).to(self.model.device)
+            output = self._generate_ids(inputs["input_ids"], inputs["attention_mask"], max_new_tokens, json_keys=json_keys)
+            return self._decode_new(output, inputs["input_ids"].shape[1])
+
+        prefix_ids, prefix_cache = self._prefix_state(prefix)
+        batch = len(prompts)
+        # Continuations are tokenised without BOS and left-padded; the padding sits between
+        # prefix and continuation and is masked out (position ids follow the mask)
+        suffix = self.tokenizer(prompts, return_tensors="pt", padding=True, add_special_tokens=False).to(self.model.device)
+        input_ids = torch.cat([prefix_ids.expand(batch, -1), suffix["input_ids"]], dim=1)
+        attention_mask = torch.cat([
+            torch.ones((batch, prefix_ids.shape[1]), dtype=suffix["attention_mask"].dtype, device=self.model.device),
+            suffix["attention_mask"],
+        ], dim=1)
+
+        # generate() extends the cache in place, so each call works on its own copy
+        cache = copy.deepcopy(prefix_cache)
+        if batch > 1:
+            cache.batch_repeat_interleave(batch)
+        output = self._generate_ids(input_ids, attention_mask, max_new_tokens, past_key_values=cache, json_keys=json_keys)
+        return self._decode_new(output, input_ids.shape[1])
+
+    def prefix_cache_stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._prefix_cache),
+            "capacity": self.prefix_cache_size,
+            "hits": self.prefix_hits,
+            "misses": self.prefix_misses,
+        }
+
+    def device_info(self) -> Dict[str, Any]:
+        if self.model is None:
+            return {}
+        return {"device": str(self.model.device), "dtype": str(getattr(self.model, "dtype", ""))}
+
+
+class TransformersGPUBackend(TransformersBackend):
+    """4-bit NF4 quantized model on CUDA (the original loading path)"""
+
+    name = "transformers_gpu"
+
+    def _load_model(self):
+        import torch
+        from transformers import AutoModelForCausalLM, BitsAndBytesConfig
+
+        if not torch.cuda.is_available():
+            raise RuntimeError("transformers_gpu backend requires a CUDA GPU")
+
+        quantization_config = BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_compute_dtype=torch.float16,
+            bnb_4bit_quant_type="nf4",
+            bnb_4bit_use_double_quant=True,
+        )
+        return AutoModelForCausalLM.from_pretrained(
+            self.model_source,
+            quantization_config=quantization_config,
+            device_map="auto",
+            trust_remote_code=True,
+            torch_dtype=torch.float16,
+            local_files_only=self.local_files_only,
+        )
+
+
+class TransformersCPUBackend(TransformersBackend):
+    """CPU model with torch dynamic int8 quantization of all Linear layers"""
+
+    name = "transformers_cpu"
+
+    def _load_model(self):
+        import torch
+        from transformers import AutoModelForCausalLM
+
+        model = AutoModelForCausalLM.from_pretrained(
+            self.model_source,
+            torch_dtype=torch.float32,
+            low_cpu_mem_usage=True,
+            trust_remote_code=True,
+            local_files_only=self.local_files_only,
+        )
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def device_info(self) -> Dict[str, Any]:
+        import torch
+
+        return {"device": "cpu", "dtype": "qint8 (dynamic)", "threads": torch.get_num_threads()}
+
+
+class StubBackend(LLMBackend):
+    """
+    Deterministic backend for load tests and benchmarks without a GPU: returns a
+    valid evaluation JSON whose scores are a hash of the prompt and criterion key.
+    Prompts without criteria keys (document digests) get the head of the prompt back.
+    """
+
+    name = "stub"
+    KEY_PATTERN = re.compile(r'"([a-z0-9_]+)": \{"score"')
+
+    def __init__(self, model_source: str = "stub", local_files_only: bool = False, latency_ms: int = 0):
+        super().__init__(model_source, local_files_only)
+        self.latency_ms = latency_ms
+
+    def load(self):
+        pass
+
+    def _complete(self, prompt: str, json_keys: Optional[Sequence[str]] = None, max_new_tokens: int = 512) -> str:
+        keys = json_keys or self.KEY_PATTERN.findall(prompt)
+        if not keys:
+            return prompt[:max_new_tokens * self.CHARS_PER_TOKEN]
+        scores = {}
+        for key in dict.fromkeys(keys):
+            digest = hashlib.sha256(f"{key}\0{prompt}".encode("utf-8")).digest()
+            scores[key] = {"score": 40 + digest[0] % 56, "reasoning": "Deterministic stub score"}
+        return json.dumps(scores)
+
+    def generate(
+        self,
+        prompts: List[str],
+        max_new_tokens: int = 512,
+        prefix: Optional[str] = None,
+        json_keys: Optional[Sequence[str]] = None,
+    ) -> List[str]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        if prefix is not None and not json_keys:
+            # Digest prompts: echo the continuation, not the shared instructions
+            return [self._complete(prompt, None, max_new_tokens) for prompt in prompts]
+        return [self._complete((prefix or "") + prompt, json_keys, max_new_tokens) for prompt in prompts]
+
+    def device_info(self) -> Dict[str, Any]:
+        return {"device": "none", "latency_ms": self.latency_ms}
+
+
+BACKENDS = {
+    TransformersGPUBackend.name: TransformersGPUBackend,
+    TransformersCPUBackend.name: TransformersCPUBackend,
+    StubBackend.name: StubBackend,
+}
+
+
+@lru_cache(maxsize=None)
+def resolve_backend_name(name: str) -> str:
+    """Map "auto" to a concrete backend based on CUDA availability (probed once per process)"""
+    if name != "auto":
+        return name
+    try:
+        import torch
+        return TransformersGPUBackend.name if torch.cuda.is_available() else TransformersCPUBackend.name
+    except ImportError:
+        return TransformersCPUBackend.name
+
+
+def create_backend(name: str, model_source: str, local_files_only: bool = False, **options) -> LLMBackend:
+    """Instantiate (but do not load) the configured backend"""
+    name = resolve_backend_name(name)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}'. Choose one of: auto, {', '.join(BACKENDS)}")
+    if name == StubBackend.name:
+        return StubBackend(model_source, local_files_only, latency_ms=options.get("stub_latency_ms", 0))
+    return BACKENDS[name](
+        model_source,
+        local_files_only,
+        prefix_cache_size=options.get("prefix_cache_size", 4),
+        constrained_decoding=options.get("constrained_decoding", True),
+        reasoning_max_chars=options.get("reasoning_max_chars", 240),
+    )
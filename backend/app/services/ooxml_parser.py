@@ -0,0 +1,318 @@
+"""
+Streaming OOXML parser for DOCX and PPTX extraction.
+
+Reads the package parts (word/document.xml, ppt/slides/slideN.xml) straight
+from the zip with lxml.iterparse and clears every processed element, so
+memory stays bounded by one top-level paragraph/table/shape. Produces the
+same paragraph, table and slide JSON as the python-docx / python-pptx paths
+in DocumentExtractionService.
+"""
+
+import posixpath
+import zipfile
+from typing import Any, Dict, List
+
+try:
+    from lxml import etree
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+A_NS = "http://schemas.openxmlformats.org/drawingml/2006/main"
+P_NS = "http://schemas.openxmlformats.org/presentationml/2006/main"
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+
+def _w(tag: str) -> str:
+    return f"{{{W_NS}}}{tag}"
+
+
+def _a(tag: str) -> str:
+    return f"{{{A_NS}}}{tag}"
+
+
+def _p(tag: str) -> str:
+    return f"{{{P_NS}}}{tag}"
+
+
+# python-pptx MSO_SHAPE_TYPE values, kept so the JSON "type" field does not change
+SHAPE_AUTO_SHAPE = 1
+SHAPE_PLACEHOLDER = 14
+SHAPE_TEXT_BOX = 17
+SHAPE_TABLE = 19
+
+
+# Built-in style names that python-docx reports in UI form ("heading 1" -> "Heading 1")
+STYLE_UI_NAMES = {
+    "caption": "Caption",
+    "footer": "Footer",
+    "header": "Header",
+    **{f"heading {i}": f"Heading {i}" for i in range(1, 10)},
+}
+
+
+def _clear(elem):
+    """Free a processed element and any already-processed preceding siblings"""
+    elem.clear()
+    parent = elem.getparent()
+    if parent is not None:
+        while elem.getprevious() is not None:
+            del parent[0]
+
+
+# ----------------------------------------------------------------------------- DOCX
+
+
+def _docx_style_names(archive: zipfile.ZipFile) -> Dict[str, str]:
+    """Map paragraph styleId -> display name from word/styles.xml (small part, parsed whole)"""
+    names = {}
+    try:
+        root = etree.fromstring(archive.read("word/styles.xml"))
+    except KeyError:
+        return names
+    for style in root.iter(_w("style")):
+        style_id = style.get(_w("styleId"))
+        name = style.find(_w("name"))
+        if name is None:
+            continue
+        ui_name = STYLE_UI_NAMES.get(name.get(_w("val")), name.get(_w("val")))
+        if style_id:
+            names[style_id] = ui_name
+        if style.get(_w("type")) == "paragraph" and style.get(_w("default")) in ("1", "true"):
+            names[None] = ui_name
+    return names
+
+
+def _docx_paragraph_text(paragraph) -> str:
+    """Text of a w:p the way python-docx renders Paragraph.text"""
+    parts = []
+    for node in paragraph.iter(_w("t"), _w("tab"), _w("br"), _w("cr")):
+        if node.tag == _w("t"):
+            parts.append(node.text or "")
+        elif node.tag == _w("tab"):
+            parts.append("\t")
+        elif node.get(_w("type")) in (None, "textWrapping"):
+            parts.append("\n")
+    return "".join(parts)
+
+
+def _docx_cell_text(cell) -> str:
+    """python-docx _Cell.text: direct child paragraphs joined by newlines"""
+    return "\n".join(_docx_paragraph_text(p) for p in cell.iterchildren(_w("p")))
+
+
+def _docx_table_rows(table) -> List[List[str]]:
+    """
+    Rows of a w:tbl laid out on the grid like python-docx row.cells: horizontally
+    merged cells repeat for each grid column they span, and vertically merged
+    continuation cells repeat the text of the cell that starts the merge.
+    """
+    rows = []
+    above: Dict[int, str] = {}
+    for tr in table.iterchildren(_w("tr")):
+        row = []
+        col = 0
+        tr_pr = tr.find(_w("trPr"))
+        if tr_pr is not None:
+            before = tr_pr.find(_w("gridBefore"))
+            if before is not None:
+                col += int(before.get(_w("val"), "0"))
+        for tc in tr.iterchildren(_w("tc")):
+            span = 1
+            merge = None
+            tc_pr = tc.find(_w("tcPr"))
+            if tc_pr is not None:
+                grid_span = tc_pr.find(_w("gridSpan"))
+                if grid_span is not None:
+                    span = int(grid_span.get(_w("val"), "1"))
+                v_merge = tc_pr.find(_w("vMerge"))
+                if v_merge is not None:
+                    merge = v_merge.get(_w("val"), "continue")
+
+            if merge == "continue":
+                text = above.get(col, "")
+            else:
+                text = _docx_cell_text(tc).strip()
+
+            for offset in range(span):
+                above[col + offset] = text
+                row.append(text)
+            col += span
+        rows.append(row)
+    return rows
+
+
+def parse_docx(file_path: str) -> Dict[str, Any]:
+    """Stream word/document.xml into {"paragraphs", "tables", "full_text"}"""
+    paragraphs = []
+    tables = []
+    full_text = ""
+
+    with zipfile.ZipFile(file_path) as archive:
+        style_names = _docx_style_names(archive)
+        default_style = style_names.get(None, "Normal")
+        body_tag = _w("body")
+
+        with archive.open("word/document.xml") as stream:
+            for _, elem in etree.iterparse(stream, events=("end",), tag=(_w("p"), _w("tbl")), huge_tree=True):
+                parent = elem.getparent()
+                # Nested paragraphs/tables are handled by their top-level table
+                if parent is None or parent.tag != body_tag:
+                    continue
+
+                if elem.tag == _w("p"):
+                    text = _docx_paragraph_text(elem)
+                    if text.strip():
+                        style = None
+                        p_pr = elem.find(_w("pPr"))
+                        if p_pr is not None:
+                            p_style = p_pr.find(_w("pStyle"))
+                            if p_style is not None:
+                                style = p_style.get(_w("val"))
+                        paragraphs.append({
+                            "text": text,
+                            "level": style_names.get(style, default_style) if style else default_style
+                        })
+                        full_text += text + "\n"
+                else:
+                    tables.append({
+                        "table_number": len(tables) + 1,
+                        "rows": _docx_table_rows(elem)
+                    })
+                _clear(elem)
+
+    return {
+        "paragraphs": paragraphs,
+        "tables": tables,
+        "full_text": full_text.strip(),
+    }
+
+
+# ----------------------------------------------------------------------------- PPTX
+
+
+def _read_rels(archive: zipfile.ZipFile, part_name: str) -> Dict[str, str]:
+    """rId -> absolute part name for a part's relationships"""
+    folder, name = posixpath.split(part_name)
+    rels_name = posixpath.join(folder, "_rels", f"{name}.rels")
+    try:
+        root = etree.fromstring(archive.read(rels_name))
+    except KeyError:
+        return {}
+    rels = {}
+    for rel in root.iter(f"{{{PKG_REL_NS}}}Relationship"):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target")
+        if target.startswith("/"):
+            rels[rel.get("Id")] = target.lstrip("/")
+        else:
+            rels[rel.get("Id")] = posixpath.normpath(posixpath.join(folder, target))
+    return rels
+
+
+def _slide_part_names(archive: zipfile.ZipFile) -> List[str]:
+    """Slide parts in presentation order (p:sldIdLst)"""
+    rels = _read_rels(archive, "ppt/presentation.xml")
+    root = etree.fromstring(archive.read("ppt/presentation.xml"))
+    slide_list = root.find(_p("sldIdLst"))
+    if slide_list is None:
+        return []
+    return [
+        rels[sld.get(f"{{{R_NS}}}id")]
+        for sld in slide_list.iterchildren(_p("sldId"))
+        if sld.get(f"{{{R_NS}}}id") in rels
+    ]
+
+
+def _pptx_text_body_text(tx_body) -> str:
+    """python-pptx TextFrame.text: paragraphs joined by newlines"""
+    paragraphs = []
+    for para in tx_body.iterchildren(_a("p")):
+        parts = []
+        for node in para.iter(_a("t"), _a("br")):
+            if node.tag == _a("t"):
+                parts.append(node.text or "")
+            else:
+                parts.append("\n")
+        paragraphs.append("".join(parts))
+    return "\n".join(paragraphs)
+
+
+def _pptx_shapes(elem) -> List[Dict[str, Any]]:
+    """Text-bearing shapes of one spTree child, descending into groups"""
+    tag = elem.tag
+    if tag == _p("grpSp"):
+        shapes = []
+        for child in elem:
+            shapes.extend(_pptx_shapes(child))
+        return shapes
+
+    if tag == _p("sp"):
+        tx_body = elem.find(_p("txBody"))
+        if tx_body is None:
+            return []
+        text = _pptx_text_body_text(tx_body)
+        if not text.strip():
+            return []
+        shape_type = SHAPE_AUTO_SHAPE
+        nv = elem.find(_p("nvSpPr"))
+        if nv is not None:
+            nv_pr = nv.find(_p("nvPr"))
+            c_nv_sp_pr = nv.find(_p("cNvSpPr"))
+            if nv_pr is not None and nv_pr.find(_p("ph")) is not None:
+                shape_type = SHAPE_PLACEHOLDER
+            elif c_nv_sp_pr is not None and c_nv_sp_pr.get("txBox") in ("1", "true"):
+                shape_type = SHAPE_TEXT_BOX
+        return [{"type": shape_type, "text": text}]
+
+    if tag == _p("graphicFrame"):
+        table = next(elem.iter(_a("tbl")), None)
+        if table is None:
+            return []
+        rows = []
+        for tr in table.iterchildren(_a("tr")):
+            row = []
+            for tc in tr.iterchildren(_a("tc")):
+                tx_body = tc.find(_a("txBody"))
+                row.append(_pptx_text_body_text(tx_body).strip() if tx_body is not None else "")
+            rows.append(row)
+        text = "\n".join("\t".join(row) for row in rows)
+        if not text.strip():
+            return []
+        return [{"type": SHAPE_TABLE, "text": text, "rows": rows}]
+
+    return []
+
+
+def parse_pptx(file_path: str) -> Dict[str, Any]:
+    """Stream slide parts into {"slides", "full_text"}, including grouped shapes and tables"""
+    slides = []
+    full_text = ""
+    sp_tree_tag = _p("spTree")
+    shape_tags = (_p("sp"), _p("grpSp"), _p("graphicFrame"))
+
+    with zipfile.ZipFile(file_path) as archive:
+        for slide_idx, part_name in enumerate(_slide_part_names(archive)):
+            slide_data = {
+                "slide_number": slide_idx + 1,
+                "shapes": []
+            }
+            with archive.open(part_name) as stream:
+                for _, elem in etree.iterparse(stream, events=("end",), tag=shape_tags):
+                    parent = elem.getparent()
+                    # Only top-level shapes; group members are walked by _pptx_shapes
+                    if parent is None or parent.tag != sp_tree_tag:
+                        continue
+                    for shape in _pptx_shapes(elem):
+                        slide_data["shapes"].append(shape)
+                        full_text += shape["text"] + "\n"
+                    _clear(elem)
+            slides.append(slide_data)
+
+    return {
+        "slides": slides,
+        "full_text": full_text.strip(),
+    }
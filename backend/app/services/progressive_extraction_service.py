@@ -0,0 +1,125 @@
+"""
+Background completion of progressively extracted attachments.
+
+Uploads in progressive mode OCR only the first few pages inline (see
+DocumentExtractionService.extract_preview) and store a "partial" form_data.
+This service finishes the remaining pages in page chunks on a small thread
+pool and merges each chunk into the attachment's form_data as it completes.
+Only results carrying a "progressive" section are completed (other "partial"
+results, e.g. the image-only PDF fallback, have nothing to continue), and
+attachments left pending or running by a restart are resumed at startup.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.upload_models import TenderAttachment, VendorAttachment
+from app.services.document_extraction_service import extraction_service
+from app.services.embedding_index_service import embedding_index_service
+from app.services.fact_extraction_service import fact_extraction_service
+from app.services.tender_digest_service import tender_digest_service
+from app.services.vendor_corpus_service import vendor_corpus_service
+
+logger = logging.getLogger(__name__)
+
+RESUMABLE = ("pending", "running")
+
+
+def needs_completion(form_data) -> bool:
+    """Whether a form_data is a progressive preview with pages still to extract"""
+    form_data = form_data or {}
+    progressive = form_data.get("progressive") or {}
+    return form_data.get("status") == "partial" and progressive.get("status") in RESUMABLE and "next_page" in progressive
+
+
+class ProgressiveExtractionService:
+    def __init__(self):
+        # Kept small on purpose: previews run on request threads and must not
+        # queue behind long background OCR jobs
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(1, settings.PROGRESSIVE_EXTRACTION_WORKERS),
+            thread_name_prefix="progressive-extraction",
+        )
+
+    def schedule(self, model, attachment_id: int):
+        """Queue the remaining pages of a partial attachment (TenderAttachment or VendorAttachment)"""
+        logger.info(f"Scheduling background extraction for {model.__name__} {attachment_id}")
+        return self.executor.submit(self._complete, model, attachment_id)
+
+    def resume_pending(self) -> int:
+        """Schedule every attachment a restart left mid-extraction; returns how many were queued"""
+        db = SessionLocal()
+        try:
+            pending = []
+            for model in (TenderAttachment, VendorAttachment):
+                key = model.tenderattachmentsid if model is TenderAttachment else model.vendorattachmentid
+                rows = db.query(key, model.form_data["progressive"]).filter(
+                    model.form_data["status"].as_string() == "partial"
+                ).all()
+                pending.extend(
+                    (model, attachment_id) for attachment_id, progressive in rows
+                    if needs_completion({"status": "partial", "progressive": progressive})
+                )
+        finally:
+            db.close()
+        for model, attachment_id in pending:
+            self.schedule(model, attachment_id)
+        if pending:
+            logger.info(f"Resuming background extraction of {len(pending)} partial attachments")
+        return len(pending)
+
+    def _complete(self, model, attachment_id: int):
+        chunk_pages = max(1, settings.PROGRESSIVE_CHUNK_PAGES)
+        db = SessionLocal()
+        try:
+            while True:
+                attachment = db.get(model, attachment_id)
+                if attachment is None:
+                    logger.info(f"{model.__name__} {attachment_id} was deleted; stopping background extraction")
+                    return
+
+                form_data = attachment.form_data or {}
+                progressive = form_data.get("progressive") or {}
+                if not needs_completion(form_data):
+                    return
+
+                next_page = progressive.get("next_page", 1)
+                chunk = extraction_service.extract_remaining(attachment.filepath, next_page, chunk_pages)
+                if chunk.get("status") != "success":
+                    raise RuntimeError(chunk.get("error") or chunk.get("message") or "page extraction failed")
+
+                # Re-read before merging so a concurrent update is not overwritten
+                db.refresh(attachment)
+                attachment.form_data = extraction_service.merge_extraction(attachment.form_data or {}, chunk)
+                db.commit()
+
+                done = attachment.form_data["progressive"]
+                logger.info(
+                    f"{model.__name__} {attachment_id}: extracted "
+                    f"{done['pages_extracted']}/{done['pages_total']} pages"
+                )
+                if done["status"] == "completed":
+                    embedding_index_service.schedule(model, attachment_id)
+                    fact_extraction_service.schedule(model, attachment_id)
+                    if model is TenderAttachment:
+                        tender_digest_service.schedule(attachment.tenderid)
+                    elif model is VendorAttachment:
+                        vendor_corpus_service.schedule(attachment.vendorid)
+                    return
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Background extraction failed for {model.__name__} {attachment_id}: {e}")
+            attachment = db.get(model, attachment_id)
+            if attachment is not None and attachment.form_data:
+                form_data = dict(attachment.form_data)
+                form_data["progressive"] = {**(form_data.get("progressive") or {}), "status": "failed", "error": str(e)}
+                attachment.form_data = form_data
+                db.commit()
+        finally:
+            db.close()
+
+
+# Global progressive extraction service instance
+progressive_extraction_service = ProgressiveExtractionService()
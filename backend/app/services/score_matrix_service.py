@@ -0,0 +1,266 @@
+"""
+Vendor x criterion score matrices of evaluation runs.
+
+Every batch evaluation stores its per-criterion raw scores as a dense
+(vendors, criteria) float32 matrix with the vendor/criterion labels and the
+configured weights:
+
+    EVALUATION_MATRIX_DIR/tender_<id>/<run_id>.npz
+
+Re-ranking under other weights is then a NumPy matrix product against the
+stored matrix (many scenarios at once), with no LLM calls. robustness()
+samples thousands of perturbed weight vectors around the configured weights
+and reports how often each vendor lands on each rank. Vendors rejected by the
+eligibility prefilter have no criterion scores and are left out of the matrix,
+so no weighting can rank them.
+"""
+
+import json
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ScoreMatrix:
+    run_id: str
+    tender_id: int
+    vendor_ids: List[Any]
+    vendor_names: List[str]
+    criterion_ids: List[Any]
+    criterion_names: List[str]
+    weights: "np.ndarray"  # (criteria,) configured weightage
+    scores: "np.ndarray"  # (vendors, criteria) raw 0-100 scores
+    created_at: str
+
+    @classmethod
+    def from_results(
+        cls, run_id: str, tender_id: int, results: Sequence[Dict[str, Any]], criteria: Sequence[Dict[str, Any]]
+    ) -> "ScoreMatrix":
+        """Build from evaluate_vendor() results (criteria_scores keyed by criterion name); eligibility rejections are skipped"""
+        results = [r for r in results if r.get("scoring_method") != "eligibility"]
+        scores = np.zeros((len(results), len(criteria)), dtype=np.float32)
+        for v, result in enumerate(results):
+            criteria_scores = result.get("criteria_scores") or {}
+            for c, criterion in enumerate(criteria):
+                scores[v, c] = float((criteria_scores.get(criterion["name"]) or {}).get("score", 0))
+        return cls(
+            run_id=run_id,
+            tender_id=tender_id,
+            vendor_ids=[r.get("vendor_id") for r in results],
+            vendor_names=[r.get("vendor_name") for r in results],
+            criterion_ids=[c["id"] for c in criteria],
+            criterion_names=[c["name"] for c in criteria],
+            weights=np.asarray([float(c.get("weightage") or 0) for c in criteria], dtype=np.float64),
+            scores=scores,
+            created_at=datetime.utcnow().isoformat(),
+        )
+
+    def weight_vector(self, overrides: Optional[Mapping[str, float]] = None) -> "np.ndarray":
+        """Configured weights with overrides keyed by criterion id or name"""
+        weights = self.weights.copy()
+        for key, value in (overrides or {}).items():
+            for c, (criterion_id, name) in enumerate(zip(self.criterion_ids, self.criterion_names)):
+                if str(key) in (str(criterion_id), name):
+                    weights[c] = float(value)
+        return weights
+
+    def totals(self, weights: "np.ndarray") -> "np.ndarray":
+        """Weighted totals (vendors, scenarios) for weight rows (scenarios, criteria); rows are normalised"""
+        weights = np.atleast_2d(np.asarray(weights, dtype=np.float64))
+        sums = weights.sum(axis=1, keepdims=True)
+        normalised = np.divide(weights, sums, out=np.zeros_like(weights), where=sums > 0)
+        return self.scores.astype(np.float64) @ normalised.T
+
+    def ranking(self, totals: "np.ndarray") -> List[Dict[str, Any]]:
+        """Vendors of one scenario ordered best first (ties keep evaluation order)"""
+        order = np.argsort(-totals, kind="stable")
+        return [
+            {
+                "rank": rank,
+                "vendor_id": self.vendor_ids[v],
+                "vendor_name": self.vendor_names[v],
+                "overall_score": round(float(totals[v]), 2),
+            }
+            for rank, v in enumerate(order, start=1)
+        ]
+
+    def sample_weights(
+        self, samples: int, spread: float, distribution: str = "dirichlet", rng: Optional["np.random.Generator"] = None
+    ) -> "np.ndarray":
+        """
+        (samples, criteria) weight vectors around the configured weights, rows summing to 1.
+        dirichlet: mean at the normalised weights, total concentration 1/spread^2 (smaller is tighter);
+        lognormal: each weight times exp(N(0, spread)), renormalised.
+        """
+        rng = rng or np.random.default_rng()
+        base = self.weights / self.weights.sum() if self.weights.sum() > 0 else np.full(len(self.weights), 1 / len(self.weights))
+        if distribution == "lognormal":
+            sampled = base * np.exp(rng.normal(0.0, spread, size=(samples, len(base))))
+        else:
+            # Zero-weight criteria stay (almost) zero instead of breaking the Dirichlet
+            alpha = np.maximum(base / max(spread, 1e-6) ** 2, 1e-3)
+            sampled = rng.dirichlet(alpha, size=samples)
+        return sampled / sampled.sum(axis=1, keepdims=True)
+
+    def robustness(
+        self,
+        samples: int = 10000,
+        spread: float = 0.2,
+        distribution: str = "dirichlet",
+        seed: Optional[int] = None,
+        chunk_size: int = 2048,
+        max_ranks: int = 10,
+    ) -> Dict[str, Any]:
+        """
+        Rank-frequency statistics of every vendor over `samples` perturbed weight vectors.
+        Samples are processed in chunks: one (vendors, chunk) matrix product, a double argsort
+        for ranks and a bincount into the (vendors, ranks) frequency table per chunk.
+        """
+        vendors = len(self.vendor_ids)
+        rng = np.random.default_rng(seed)
+        scores = self.scores.astype(np.float64)
+        counts = np.zeros(vendors * vendors, dtype=np.int64)
+        rank_sum = np.zeros(vendors)
+        offsets = np.arange(vendors)[:, None] * vendors
+
+        for start in range(0, samples, chunk_size):
+            weights = self.sample_weights(min(chunk_size, samples - start), spread, distribution, rng)
+            totals = scores @ weights.T  # (vendors, chunk)
+            order = np.argsort(-totals, axis=0, kind="stable")
+            ranks = np.empty_like(order)
+            np.put_along_axis(ranks, order, np.arange(vendors)[:, None], axis=0)  # 0-based rank per vendor
+            counts += np.bincount((offsets + ranks).ravel(), minlength=vendors * vendors)
+            rank_sum += ranks.sum(axis=1)
+
+        frequency = counts.reshape(vendors, vendors) / samples
+        cumulative = np.cumsum(frequency, axis=1)
+        baseline = self.ranking(self.totals(self.weights)[:, 0])
+        baseline_rank = {entry["vendor_id"]: entry["rank"] for entry in baseline}
+
+        stats = []
+        for v in range(vendors):
+            stats.append({
+                "vendor_id": self.vendor_ids[v],
+                "vendor_name": self.vendor_names[v],
+                "baseline_rank": baseline_rank[self.vendor_ids[v]],
+                "mean_rank": round(float(rank_sum[v] / samples) + 1, 3),
+                "p_first": round(float(frequency[v, 0]), 4),
+                "p_top3": round(float(cumulative[v, min(2, vendors - 1)]), 4),
+                "rank_p05": int(np.searchsorted(cumulative[v], 0.05)) + 1,
+                "rank_p95": int(np.searchsorted(cumulative[v], 0.95)) + 1,
+                "rank_frequency": [round(float(f), 4) for f in frequency[v, :max_ranks]],
+            })
+        stats.sort(key=lambda entry: entry["baseline_rank"])
+        leader = stats[0] if stats else None
+        return {
+            "samples": samples,
+            "spread": spread,
+            "distribution": distribution,
+            "leader_stability": leader["p_first"] if leader else None,
+            "vendors": stats,
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "tender_id": self.tender_id,
+            "created_at": self.created_at,
+            "vendors": len(self.vendor_ids),
+            "criteria": [
+                {"id": i, "name": n, "weightage": float(w)}
+                for i, n, w in zip(self.criterion_ids, self.criterion_names, self.weights)
+            ],
+        }
+
+
+class ScoreMatrixService:
+    @property
+    def available(self) -> bool:
+        return HAS_NUMPY
+
+    def _tender_dir(self, tender_id: int) -> Path:
+        return Path(settings.EVALUATION_MATRIX_DIR) / f"tender_{tender_id}"
+
+    def save(self, matrix: ScoreMatrix) -> Optional[Path]:
+        if not HAS_NUMPY:
+            return None
+        directory = self._tender_dir(matrix.tender_id)
+        path = directory / f"{matrix.run_id}.npz"
+        labels = {
+            "run_id": matrix.run_id,
+            "tender_id": matrix.tender_id,
+            "vendor_ids": matrix.vendor_ids,
+            "vendor_names": matrix.vendor_names,
+            "criterion_ids": matrix.criterion_ids,
+            "criterion_names": matrix.criterion_names,
+            "created_at": matrix.created_at,
+        }
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            tmp = directory / f"{matrix.run_id}.tmp.npz"
+            np.savez(tmp, scores=matrix.scores, weights=matrix.weights, labels=np.asarray(json.dumps(labels, default=str)))
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Could not store score matrix for run {matrix.run_id}: {e}")
+            return None
+        return path
+
+    def record(self, run_id: str, tender_id: Any, results: Sequence[Dict[str, Any]], criteria: Sequence[Dict[str, Any]]):
+        """Store a finished run's results; no-op without a tender id or scored (non-rejected) results"""
+        if not HAS_NUMPY or tender_id is None or not criteria:
+            return None
+        matrix = ScoreMatrix.from_results(run_id, tender_id, results, criteria)
+        if not matrix.vendor_ids:
+            return None
+        return self.save(matrix)
+
+    def _read(self, path: Path) -> ScoreMatrix:
+        with np.load(path, allow_pickle=False) as data:
+            labels = json.loads(str(data["labels"]))
+            return ScoreMatrix(
+                weights=data["weights"],
+                scores=data["scores"],
+                **labels,
+            )
+
+    def load(self, tender_id: int, run_id: Optional[str] = None) -> Optional[ScoreMatrix]:
+        """A run's matrix, or the tender's most recent one when run_id is None"""
+        if not HAS_NUMPY:
+            return None
+        directory = self._tender_dir(tender_id)
+        if run_id is not None:
+            path = directory / f"{Path(run_id).name}.npz"
+            return self._read(path) if path.exists() else None
+        runs = [p for p in directory.glob("*.npz") if not p.name.endswith(".tmp.npz")] if directory.exists() else []
+        if not runs:
+            return None
+        return self._read(max(runs, key=lambda p: p.stat().st_mtime))
+
+    def list_runs(self, tender_id: int) -> List[Dict[str, Any]]:
+        directory = self._tender_dir(tender_id)
+        if not HAS_NUMPY or not directory.exists():
+            return []
+        paths = sorted(
+            (p for p in directory.glob("*.npz") if not p.name.endswith(".tmp.npz")),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True,
+        )
+        return [self._read(p).summary() for p in paths]
+
+
+# Global score matrix service instance
+score_matrix_service = ScoreMatrixService()
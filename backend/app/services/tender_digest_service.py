@@ -0,0 +1,166 @@
+"""
+Per-tender requirement digest.
+
+Built once per tender (in the background when a tender attachment finishes
+extraction, or on first use) and shared by every vendor evaluation:
+
+- cleaned_text: the joined tender documents after the evaluation text
+  cleaning, so vendor evaluations no longer re-clean the whole tender;
+- requirements: sentences carrying an obligation ("shall", "must", "minimum",
+  ...) or an eligibility condition (turnover, experience, certification, ...),
+  in document order and de-duplicated;
+- character and token counts.
+
+The digest stores the tender's documents fingerprint and is rebuilt whenever
+an attachment is added, deleted or re-extracted (or the extraction rules'
+VERSION changes).
+"""
+
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.upload_models import Tender, TenderDigest
+from app.services.ai_evaluation_service import ai_evaluation_service
+from app.services.embedding_index_service import documents_fingerprint, successful_extractions
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_MARKER = re.compile(r"--- Document: (.*?) ---")
+# Sentence ends, or the start of a numbered / lettered / bulleted clause
+CLAUSE_BREAK = re.compile(r"(?<=[.;!?])\s+(?=[A-Z0-9(\"'])|\s+(?=(?:\(?\d{1,2}(?:\.\d{1,2})*[.)]|\(?[a-z][.)]|[-•*])\s+[A-Z])")
+OBLIGATION = re.compile(
+    r"\b(?:shall|must|required|requirements?|mandatory|minimum|maximum|at least|not less than|no less than|"
+    r"not more than|should|is to be|are to be|will be required)\b",
+    re.IGNORECASE,
+)
+ELIGIBILITY = re.compile(
+    r"\b(?:eligib\w*|qualif\w*|disqualif\w*|turnover|net worth|experience|certif\w*|registered|registration|"
+    r"licen[cs]\w*|ISO\s*\d{3,5}|blacklist\w*|debarred|similar (?:works?|projects?)|bid security|EMD)\b",
+    re.IGNORECASE,
+)
+CLAUSE_LABEL = re.compile(r"^(?:\(?\d{1,2}(?:\.\d{1,2})*[.)]|\(?[a-z][.)])\s+")
+MIN_CLAUSE_CHARS = 25
+MAX_CLAUSE_CHARS = 400
+
+
+class TenderDigestService:
+    # Bump when the cleaning or requirement extraction changes so stored digests are rebuilt
+    VERSION = "1"
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tender-digest")
+
+    def extract_requirements(self, cleaned_text: str) -> List[Dict[str, Any]]:
+        """Obligation and eligibility clauses of the cleaned tender text, in order, de-duplicated"""
+        parts = DOCUMENT_MARKER.split(cleaned_text)
+        documents = [(None, parts[0])] + list(zip(parts[1::2], parts[2::2]))
+        requirements, seen = [], set()
+        for document, body in documents:
+            for clause in CLAUSE_BREAK.split(body):
+                clause = CLAUSE_LABEL.sub("", clause.strip(" -•*"))
+                if len(clause) < MIN_CLAUSE_CHARS:
+                    continue
+                eligibility = ELIGIBILITY.search(clause) is not None
+                if not eligibility and OBLIGATION.search(clause) is None:
+                    continue
+                key = re.sub(r"\W+", " ", clause.lower()).strip()
+                if key in seen:
+                    continue
+                seen.add(key)
+                requirements.append({
+                    "text": clause[:MAX_CLAUSE_CHARS],
+                    "kind": "eligibility" if eligibility else "requirement",
+                    "document": document,
+                })
+                if len(requirements) >= settings.TENDER_DIGEST_MAX_REQUIREMENTS:
+                    return requirements
+        return requirements
+
+    def get_or_build(self, db: Session, tender: Tender, docs: Optional[List] = None) -> TenderDigest:
+        """The tender's current digest, (re)building it when the documents changed (caller's session; commits)"""
+        docs = list(successful_extractions(tender.attachments)) if docs is None else docs
+        fingerprint = documents_fingerprint(docs)
+        digest = db.query(TenderDigest).filter(TenderDigest.tenderid == tender.tenderid).first()
+        if digest is not None and digest.fingerprint == fingerprint and digest.version == self.VERSION:
+            return digest
+
+        cleaned = ai_evaluation_service._clean_text(
+            "\n\n".join(f"--- Document: {a.filename} ---\n\n{text}" for a, text in docs)
+        )
+        requirements = self.extract_requirements(cleaned)
+        token_count, counter = ai_evaluation_service.count_tokens(cleaned)
+        requirements_tokens, _ = ai_evaluation_service.count_tokens("\n".join(r["text"] for r in requirements))
+        values = {
+            "fingerprint": fingerprint,
+            "version": self.VERSION,
+            "cleaned_text": cleaned,
+            "requirements": requirements,
+            "char_count": len(cleaned),
+            "token_count": token_count,
+            "requirements_token_count": requirements_tokens,
+            "token_counter": counter,
+        }
+        if digest is None:
+            digest = TenderDigest(tenderid=tender.tenderid, **values)
+            db.add(digest)
+        else:
+            for key, value in values.items():
+                setattr(digest, key, value)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Built concurrently (e.g. by the background job); use that row
+            db.rollback()
+            digest = db.query(TenderDigest).filter(TenderDigest.tenderid == tender.tenderid).one()
+        logger.info(
+            f"Tender {tender.tenderid} digest: {len(requirements)} requirements, "
+            f"{len(cleaned)} chars, {token_count} tokens ({counter})"
+        )
+        return digest
+
+    def invalidate(self, db: Session, tenderid: int):
+        """Drop a tender's digest (caller commits); it is rebuilt on next use"""
+        db.query(TenderDigest).filter(TenderDigest.tenderid == tenderid).delete(synchronize_session=False)
+
+    def schedule(self, tenderid: int):
+        """Rebuild a tender's digest in the background after one of its attachments finished extraction"""
+        return self.executor.submit(self._build_job, tenderid)
+
+    def _build_job(self, tenderid: int):
+        db = SessionLocal()
+        try:
+            tender = db.get(Tender, tenderid)
+            if tender is not None:
+                self.get_or_build(db, tender)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Tender digest failed for tender {tenderid}: {e}")
+        finally:
+            db.close()
+
+    def summary(self, digest: TenderDigest) -> Dict[str, Any]:
+        kinds = [r["kind"] for r in digest.requirements or []]
+        return {
+            "tenderid": digest.tenderid,
+            "fingerprint": digest.fingerprint,
+            "version": digest.version,
+            "char_count": digest.char_count,
+            "token_count": digest.token_count,
+            "requirements_token_count": digest.requirements_token_count,
+            "token_counter": digest.token_counter,
+            "requirement_count": kinds.count("requirement"),
+            "eligibility_count": kinds.count("eligibility"),
+            "requirements": digest.requirements,
+            "updateddate": digest.updateddate,
+        }
+
+
+# Global tender digest service instance
+tender_digest_service = TenderDigestService()
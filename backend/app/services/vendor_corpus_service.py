@@ -0,0 +1,191 @@
+"""
+Materialized per-vendor evaluation corpus.
+
+Built when a vendor attachment finishes extraction (or on first use) instead
+of concatenating every document's text on each evaluation. Repeated page
+furniture is stripped first: the short lines at the top and bottom of every
+page are keyed with digits ignored ("Page 3 of 40" and "Page 4 of 40" share a
+key), and a key that occurs on enough pages of the documents it appears in
+(VENDOR_CORPUS_BOILERPLATE_*) is treated as a header, footer or stamp and
+removed from the page edges; the page bodies are kept as extracted. Pages come from
+the extraction's page blocks (OCR) or page text; documents without pages
+count as a single page, so their lines are only stripped when they repeat
+across documents.
+
+The corpus stores the vendor's documents fingerprint and is rebuilt when an
+attachment is added, deleted or re-extracted (or VERSION changes). Evaluation
+retrieval uses the corpus chunks rather than the attachment embedding index
+(which covers the raw text); the background build stores their vectors through
+embedding_index_service so no evaluation has to re-embed them.
+"""
+
+import logging
+import re
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.upload_models import Vendor, VendorCorpus
+from app.services.ai_evaluation_service import ai_evaluation_service
+from app.services.embedding_index_service import (
+    documents_fingerprint, embedding_index_service, successful_extractions,
+)
+
+logger = logging.getLogger(__name__)
+
+# Stored with the corpus: the most repeated stripped lines, for inspection
+MAX_BOILERPLATE_REPORTED = 50
+
+
+class VendorCorpusService:
+    # Bump when the boilerplate filter or corpus layout changes so stored corpora are rebuilt
+    VERSION = "1"
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vendor-corpus")
+
+    def page_lines(self, form_data: Dict[str, Any], text: str) -> List[List[str]]:
+        """Lines of each page of an extraction (OCR blocks, page text, or the whole text as one page)"""
+        pages = [page for page in form_data.get("pages") or [] if page.get("blocks") or page.get("text")]
+        if not pages:
+            return [text.splitlines()]
+        return [
+            [block["text"] for block in page["blocks"]] if page.get("blocks") else page["text"].splitlines()
+            for page in pages
+        ]
+
+    def _line_key(self, line: str) -> str:
+        return re.sub(r"\d+", "#", " ".join(line.lower().split()))
+
+    def _split_page(self, lines: List[str]) -> Tuple[List[str], List[str], List[str]]:
+        """(top, body, bottom) non-empty lines of a page; headers and footers sit in top and bottom"""
+        lines = [line for line in lines if line.strip()]
+        edge = settings.VENDOR_CORPUS_BOILERPLATE_EDGE_LINES
+        if len(lines) <= 2 * edge:
+            return lines, [], []
+        return lines[:edge], lines[edge:-edge], lines[-edge:]
+
+    def _is_candidate(self, line: str) -> bool:
+        return len(line) <= settings.VENDOR_CORPUS_BOILERPLATE_MAX_CHARS
+
+    def find_boilerplate(self, documents: List[List[List[str]]]) -> Counter:
+        """Keys of boilerplate lines across a vendor's documents, with the number of pages they occur on"""
+        pages_with, documents_of = Counter(), defaultdict(set)
+        for index, pages in enumerate(documents):
+            for lines in pages:
+                top, _, bottom = self._split_page(lines)
+                keys = {self._line_key(line) for line in top + bottom if self._is_candidate(line)}
+                for key in keys:
+                    pages_with[key] += 1
+                    documents_of[key].add(index)
+        return Counter({
+            key: count for key, count in pages_with.items()
+            if count >= settings.VENDOR_CORPUS_BOILERPLATE_MIN_PAGES
+            and count >= settings.VENDOR_CORPUS_BOILERPLATE_PAGE_RATIO * sum(len(documents[i]) for i in documents_of[key])
+        })
+
+    def get_or_build(self, db: Session, vendor: Vendor, docs: Optional[List] = None) -> VendorCorpus:
+        """The vendor's current corpus, (re)building it when the documents changed (caller's session; commits)"""
+        docs = list(successful_extractions(vendor.attachments)) if docs is None else docs
+        fingerprint = documents_fingerprint(docs)
+        corpus = db.query(VendorCorpus).filter(VendorCorpus.vendorid == vendor.vendorid).first()
+        if corpus is not None and corpus.fingerprint == fingerprint and corpus.version == self.VERSION:
+            return corpus
+
+        documents = [self.page_lines(attachment.form_data or {}, text) for attachment, text in docs]
+        boilerplate = self.find_boilerplate(documents)
+        parts, stats, samples = [], [], {}
+        for (attachment, _), pages in zip(docs, documents):
+            kept, stripped = [], 0
+            for lines in pages:
+                top, body, bottom = self._split_page(lines)
+                for edge in (top, None, bottom):
+                    if edge is None:
+                        kept.extend(body)
+                        continue
+                    for line in edge:
+                        key = self._line_key(line)
+                        if key in boilerplate and self._is_candidate(line):
+                            stripped += 1
+                            samples.setdefault(key, line.strip())
+                        else:
+                            kept.append(line)
+            body = "\n".join(kept)
+            parts.append(f"--- Document: {attachment.filename} ---\n\n{body}")
+            stats.append({"name": attachment.filename, "pages": len(pages), "chars": len(body), "stripped_lines": stripped})
+
+        text = ai_evaluation_service._clean_text("\n\n".join(parts))
+        token_count, counter = ai_evaluation_service.count_tokens(text)
+        values = {
+            "fingerprint": fingerprint,
+            "version": self.VERSION,
+            "text": text,
+            "documents": stats,
+            "boilerplate": [
+                {"line": samples[key], "pages": count}
+                for key, count in boilerplate.most_common(MAX_BOILERPLATE_REPORTED)
+                if key in samples
+            ],
+            "raw_char_count": sum(len(raw) for _, raw in docs),
+            "char_count": len(text),
+            "token_count": token_count,
+            "token_counter": counter,
+        }
+        if corpus is None:
+            corpus = VendorCorpus(vendorid=vendor.vendorid, **values)
+            db.add(corpus)
+        else:
+            for key, value in values.items():
+                setattr(corpus, key, value)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Built concurrently (e.g. by the background job); use that row
+            db.rollback()
+            corpus = db.query(VendorCorpus).filter(VendorCorpus.vendorid == vendor.vendorid).one()
+        logger.info(
+            f"Vendor {vendor.vendorid} corpus: {len(text)} chars, {token_count} tokens ({counter}), "
+            f"{sum(s['stripped_lines'] for s in stats)} boilerplate lines stripped"
+        )
+        return corpus
+
+    def schedule(self, vendorid: int):
+        """Rebuild a vendor's corpus in the background after one of its attachments finished extraction"""
+        return self.executor.submit(self._build_job, vendorid)
+
+    def _build_job(self, vendorid: int):
+        db = SessionLocal()
+        try:
+            vendor = db.get(Vendor, vendorid)
+            if vendor is not None:
+                summary = embedding_index_service.index_corpus(self.get_or_build(db, vendor))
+                if summary:
+                    logger.info(f"Indexed {summary['count']} corpus chunks of vendor {vendorid}")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Vendor corpus failed for vendor {vendorid}: {e}")
+        finally:
+            db.close()
+
+    def summary(self, corpus: VendorCorpus) -> Dict[str, Any]:
+        return {
+            "vendorid": corpus.vendorid,
+            "fingerprint": corpus.fingerprint,
+            "version": corpus.version,
+            "raw_char_count": corpus.raw_char_count,
+            "char_count": corpus.char_count,
+            "token_count": corpus.token_count,
+            "token_counter": corpus.token_counter,
+            "documents": corpus.documents,
+            "boilerplate": corpus.boilerplate,
+            "updateddate": corpus.updateddate,
+        }
+
+
+# Global vendor corpus service instance
+vendor_corpus_service = VendorCorpusService()
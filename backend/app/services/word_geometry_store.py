@@ -0,0 +1,306 @@
+"""
+Array-backed sidecar storage for word-level OCR geometry.
+
+Each extracted attachment gets a ``<file>.words/`` directory next to it holding
+one segment directory per extracted page range (``p00001/``, ``p00011/``, ...)
+of plain ``.npy`` arrays, so the words can be memory-mapped back without parsing:
+
+    boxes.npy        float32 (N, 4)  x0, y0, x1, y1 relative to the page (0..1)
+    confidences.npy  float16 (N,)    doctr word confidence
+    pages.npy        int32   (N,)    1-based page number (words are page-ordered)
+    blocks.npy       int32   (N,)    block index within the page
+    offsets.npy      int64   (N+1,)  byte offsets of each word into text.npy
+    text.npy         uint8   (M,)    UTF-8 bytes of all words, concatenated
+
+``meta.json`` lists the segments in page order. Writing a page range replaces
+every segment overlapping it, so progressively extracted PDFs add one segment
+per chunk (no rewrite of earlier pages) and a re-run chunk replaces its words
+instead of duplicating them. Version 1 sidecars (arrays directly in the
+directory) are read as a single segment.
+"""
+
+import json
+import logging
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+logger = logging.getLogger(__name__)
+
+SIDECAR_SUFFIX = ".words"
+FORMAT_VERSION = 2
+
+
+class WordGeometryCollector:
+    """Accumulates words while an OCR result is walked, then builds the arrays"""
+
+    def __init__(self):
+        self.boxes: List[Tuple[float, float, float, float]] = []
+        self.confidences: List[float] = []
+        self.pages: List[int] = []
+        self.blocks: List[int] = []
+        self.texts: List[bytes] = []
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add(self, page_number: int, block_index: int, geometry, confidence: float, value: str):
+        """Record one word. ``geometry`` is a doctr box or polygon in relative coordinates."""
+        xs = [float(point[0]) for point in geometry]
+        ys = [float(point[1]) for point in geometry]
+        self.boxes.append((min(xs), min(ys), max(xs), max(ys)))
+        self.confidences.append(float(confidence))
+        self.pages.append(page_number)
+        self.blocks.append(block_index)
+        self.texts.append(value.encode("utf-8"))
+
+    def extend(self, other: "WordGeometryCollector"):
+        self.boxes.extend(other.boxes)
+        self.confidences.extend(other.confidences)
+        self.pages.extend(other.pages)
+        self.blocks.extend(other.blocks)
+        self.texts.extend(other.texts)
+
+    def mean_confidence(self) -> float:
+        """Mean word confidence (0.0 for a page without words)"""
+        return sum(self.confidences) / len(self.confidences) if self.confidences else 0.0
+
+    def to_arrays(self) -> Dict[str, "np.ndarray"]:
+        lengths = np.fromiter((len(t) for t in self.texts), dtype=np.int64, count=len(self.texts))
+        offsets = np.zeros(len(self.texts) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return {
+            "boxes": np.asarray(self.boxes, dtype=np.float32).reshape(-1, 4),
+            "confidences": np.asarray(self.confidences, dtype=np.float16),
+            "pages": np.asarray(self.pages, dtype=np.int32),
+            "blocks": np.asarray(self.blocks, dtype=np.int32),
+            "offsets": offsets,
+            "text": np.frombuffer(b"".join(self.texts), dtype=np.uint8),
+        }
+
+
+class WordGeometry:
+    """Read-only view over a (memory-mapped) sidecar"""
+
+    def __init__(self, arrays: Dict[str, "np.ndarray"]):
+        self.boxes = arrays["boxes"]
+        self.confidences = arrays["confidences"]
+        self.pages = arrays["pages"]
+        self.blocks = arrays["blocks"]
+        self.offsets = arrays["offsets"]
+        self.text = arrays["text"]
+
+    def __len__(self):
+        return int(self.pages.shape[0])
+
+    def select(
+        self,
+        page: Optional[int] = None,
+        region: Optional[Tuple[float, float, float, float]] = None,
+        min_confidence: Optional[float] = None,
+    ) -> "np.ndarray":
+        """Return indices of words on ``page`` that intersect ``region`` (x0, y0, x1, y1)"""
+        start, stop = 0, len(self)
+        if page is not None:
+            # Words are stored in page order, so a page is a contiguous slice
+            start = int(np.searchsorted(self.pages, page, side="left"))
+            stop = int(np.searchsorted(self.pages, page, side="right"))
+
+        mask = np.ones(stop - start, dtype=bool)
+        if region is not None:
+            x0, y0, x1, y1 = region
+            boxes = self.boxes[start:stop]
+            mask &= (boxes[:, 0] < x1) & (boxes[:, 2] > x0) & (boxes[:, 1] < y1) & (boxes[:, 3] > y0)
+        if min_confidence is not None:
+            mask &= self.confidences[start:stop] >= min_confidence
+
+        return np.nonzero(mask)[0] + start
+
+    def words(self, indices) -> List[Dict[str, Any]]:
+        """Materialize the selected words as JSON-friendly dicts"""
+        result = []
+        for i in indices:
+            i = int(i)
+            value = bytes(self.text[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8", errors="replace")
+            x0, y0, x1, y1 = (float(v) for v in self.boxes[i])
+            result.append({
+                "text": value,
+                "page_number": int(self.pages[i]),
+                "block": int(self.blocks[i]),
+                "box": [round(x0, 5), round(y0, 5), round(x1, 5), round(y1, 5)],
+                "confidence": round(float(self.confidences[i]), 4),
+            })
+        return result
+
+
+class SegmentedWordGeometry:
+    """Read-only view over the page-ordered segments of a sidecar; indices are global"""
+
+    def __init__(self, segments: List[WordGeometry]):
+        self.segments = segments
+        self.starts = np.cumsum([0] + [len(s) for s in segments])
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def select(
+        self,
+        page: Optional[int] = None,
+        region: Optional[Tuple[float, float, float, float]] = None,
+        min_confidence: Optional[float] = None,
+    ) -> "np.ndarray":
+        """Global indices of the matching words (see WordGeometry.select)"""
+        selected = []
+        for start, segment in zip(self.starts, self.segments):
+            if page is not None and (not len(segment) or not segment.pages[0] <= page <= segment.pages[-1]):
+                continue
+            selected.append(segment.select(page=page, region=region, min_confidence=min_confidence) + start)
+        return np.concatenate(selected) if selected else np.zeros(0, dtype=np.int64)
+
+    def words(self, indices) -> List[Dict[str, Any]]:
+        indices = np.asarray(indices, dtype=np.int64)
+        owners = np.searchsorted(self.starts, indices, side="right") - 1
+        return [
+            word
+            for owner in np.unique(owners)
+            for word in self.segments[owner].words(indices[owners == owner] - self.starts[owner])
+        ]
+
+
+class WordGeometryStore:
+    """Reads and writes word geometry sidecars next to uploaded files"""
+
+    ARRAY_NAMES = ("boxes", "confidences", "pages", "blocks", "offsets", "text")
+
+    def sidecar_path(self, file_path: str) -> Path:
+        return Path(f"{file_path}{SIDECAR_SUFFIX}")
+
+    def exists(self, file_path: str) -> bool:
+        return (self.sidecar_path(file_path) / "meta.json").exists()
+
+    def _read_meta(self, sidecar: Path) -> Dict[str, Any]:
+        try:
+            with open(sidecar / "meta.json", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return {"version": FORMAT_VERSION, "segments": []}
+        if meta.get("version", 1) < 2:
+            # Arrays directly in the sidecar directory: one segment covering its pages
+            pages = meta.get("pages") or [1]
+            meta = {"version": 1, "segments": [{
+                "name": "", "first_page": min(pages), "last_page": max(pages),
+                "word_count": meta.get("word_count", 0), "bytes": meta.get("bytes", 0),
+            }]}
+        return meta
+
+    def write(
+        self,
+        file_path: str,
+        collector: WordGeometryCollector,
+        first_page: int = 1,
+        last_page: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Persist the words of pages `first_page`..`last_page` (None: to the end) as one
+        segment, replacing any segment overlapping that range; returns the summary
+        stored in form_data.
+        """
+        if not HAS_NUMPY:
+            logger.warning("numpy not installed. Word geometry will not be stored.")
+            return None
+
+        sidecar = self.sidecar_path(file_path)
+        meta = self._read_meta(sidecar)
+        if meta["version"] < 2:
+            # Move legacy arrays into a segment directory so new segments can sit next to it
+            legacy = meta["segments"][0]
+            legacy["name"] = f"p{legacy['first_page']:05d}"
+            (sidecar / legacy["name"]).mkdir()
+            for array_name in self.ARRAY_NAMES:
+                (sidecar / f"{array_name}.npy").rename(sidecar / legacy["name"] / f"{array_name}.npy")
+
+        def overlaps(segment: Dict[str, Any]) -> bool:
+            end = segment["last_page"]
+            return (last_page is None or segment["first_page"] <= last_page) and (end is None or end >= first_page)
+
+        segments = []
+        for segment in meta["segments"]:
+            if overlaps(segment):
+                shutil.rmtree(sidecar / segment["name"], ignore_errors=True)
+            else:
+                segments.append(segment)
+
+        arrays = collector.to_arrays()
+        name = f"p{first_page:05d}"
+        directory = sidecar / name
+        directory.mkdir(parents=True, exist_ok=True)
+        for array_name in self.ARRAY_NAMES:
+            np.save(directory / f"{array_name}.npy", arrays[array_name], allow_pickle=False)
+        segments.append({
+            "name": name,
+            "first_page": first_page,
+            "last_page": last_page,
+            "word_count": int(arrays["pages"].shape[0]),
+            "pages": [int(p) for p in np.unique(arrays["pages"])],
+            "bytes": int(sum(arrays[n].nbytes for n in self.ARRAY_NAMES)),
+        })
+        segments.sort(key=lambda s: s["first_page"])
+
+        meta = {
+            "version": FORMAT_VERSION,
+            "segments": segments,
+            "word_count": sum(s["word_count"] for s in segments),
+            "bytes": sum(s["bytes"] for s in segments),
+        }
+        with open(sidecar / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+        return {
+            "path": str(sidecar),
+            "format": f"npy-v{FORMAT_VERSION}",
+            "segments": len(segments),
+            "word_count": meta["word_count"],
+            "bytes": meta["bytes"],
+        }
+
+    def load(self, file_path: str, mmap: bool = True) -> Optional[SegmentedWordGeometry]:
+        """Open a sidecar; arrays are memory-mapped so nothing is copied until read"""
+        if not HAS_NUMPY or not self.exists(file_path):
+            return None
+        sidecar = self.sidecar_path(file_path)
+        mode = "r" if mmap else None
+        return SegmentedWordGeometry([
+            WordGeometry({
+                name: np.load(sidecar / segment["name"] / f"{name}.npy", mmap_mode=mode, allow_pickle=False)
+                for name in self.ARRAY_NAMES
+            })
+            for segment in self._read_meta(sidecar)["segments"]
+        ])
+
+    def get_words(
+        self,
+        file_path: str,
+        page: Optional[int] = None,
+        region: Optional[Tuple[float, float, float, float]] = None,
+        min_confidence: Optional[float] = None,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Words for a page and/or region, or None if the file has no sidecar"""
+        geometry = self.load(file_path)
+        if geometry is None:
+            return None
+        return geometry.words(geometry.select(page=page, region=region, min_confidence=min_confidence))
+
+    def delete(self, file_path: str):
+        sidecar = self.sidecar_path(file_path)
+        if sidecar.exists():
+            shutil.rmtree(sidecar, ignore_errors=True)
+
+
+# Create a singleton instance
+word_geometry_store = WordGeometryStore()
@@ -0,0 +1,152 @@
+"""
+Standalone evaluation worker.
+
+    python -m app.workers.evaluation_worker [--batch N] [--poll-seconds S] [--worker-id ID] [--once]
+
+Claims queued evaluation jobs from the shared database (see
+evaluation_queue_service), evaluates them with this process's LLM backend and
+records the results. Jobs claimed together are evaluated concurrently, so the
+inference executor batches their prompts; jobs of one run share a single load
+of the tender inputs. A heartbeat task renews the leases of the jobs in
+flight. Capacity scales by starting more workers against the same database,
+on this host or others. SIGINT/SIGTERM finish the current batch and exit.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+from itertools import groupby
+from typing import Any, Dict, List, Set
+
+from app.core.config import settings
+from app.db.database import Base, SessionLocal, engine
+from app.models.user import EvaluationCriterion  # noqa: F401 (registers the criteria table for the FKs)
+from app.models import upload_models  # noqa: F401
+from app.services.ai_evaluation_service import ai_evaluation_service, stream_batch_evaluation
+from app.services.evaluation_cache import criteria_fingerprint
+from app.services.evaluation_queue_service import evaluation_queue_service
+from app.services.evaluation_run_service import evaluation_run_service
+from app.services.evaluation_service import load_evaluation_inputs
+
+logger = logging.getLogger(__name__)
+
+
+class EvaluationWorker:
+    def __init__(self, worker_id: str, batch: int, poll_seconds: float):
+        self.worker_id = worker_id
+        self.batch = batch
+        self.poll_seconds = poll_seconds
+        self.held: Set[int] = set()
+        self.stopping = asyncio.Event()
+        self.processed = 0
+
+    def _load_inputs(self, tenderid: int, vendorids: List[int]):
+        db = SessionLocal()
+        try:
+            return load_evaluation_inputs(db, tenderid, vendorids)
+        finally:
+            db.close()
+
+    async def _heartbeat(self):
+        # Runs until cancelled, so leases stay renewed while a batch drains after a stop signal
+        while True:
+            await asyncio.sleep(settings.EVALUATION_JOB_HEARTBEAT_SECONDS)
+            if self.held:
+                try:
+                    await asyncio.to_thread(evaluation_queue_service.heartbeat, self.worker_id, list(self.held))
+                except Exception as e:
+                    logger.error(f"Heartbeat failed: {e}")
+
+    async def _fail(self, job: Dict[str, Any], error: str, retry: bool = True):
+        self.held.discard(job["id"])
+        await asyncio.to_thread(evaluation_queue_service.fail, job["id"], self.worker_id, error, retry)
+
+    async def _process_run(self, jobs: List[Dict[str, Any]]):
+        """Evaluate the claimed jobs of one run against a single load of its inputs"""
+        first = jobs[0]
+        criteria = first["criteria"]
+        try:
+            tender_data, vendors_data, _ = await asyncio.to_thread(
+                self._load_inputs, first["tenderid"], [job["vendorid"] for job in jobs]
+            )
+        except Exception as e:
+            logger.error(f"Could not load inputs of run {first['run_id']}: {e}")
+            for job in jobs:
+                await self._fail(job, f"Input loading failed: {e}")
+            return
+
+        vendors = {vendor["id"]: vendor for vendor in vendors_data}
+        for job in jobs:
+            if job["vendorid"] not in vendors:
+                await self._fail(job, "Vendor no longer exists", retry=False)
+        jobs = [job for job in jobs if job["vendorid"] in vendors]
+        pending = [vendors[job["vendorid"]] for job in jobs]
+
+        criteria_fp = criteria_fingerprint(criteria)
+        model_fp = ai_evaluation_service._model_fingerprint()
+        async for index, result in stream_batch_evaluation(tender_data, pending, criteria):
+            job, vendor = jobs[index], pending[index]
+            if isinstance(result, Exception):
+                logger.error(f"❌ Job {job['id']} ({vendor['name']}) failed: {result}")
+                await self._fail(job, str(result))
+                continue
+            fingerprint = evaluation_run_service.vendor_fingerprint(
+                tender_data["fingerprint"], vendor["fingerprint"], criteria_fp, model_fp
+            )
+            self.held.discard(job["id"])
+            if await asyncio.to_thread(evaluation_queue_service.complete, job["id"], self.worker_id, fingerprint, result):
+                self.processed += 1
+
+    async def run(self, once: bool = False):
+        logger.info(f"Evaluation worker {self.worker_id} starting (batch {self.batch})")
+        # Load the model before claiming so leases are not spent on start-up
+        await asyncio.to_thread(ai_evaluation_service.ensure_loaded)
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            while not self.stopping.is_set():
+                jobs = await asyncio.to_thread(evaluation_queue_service.claim, self.worker_id, self.batch)
+                if not jobs:
+                    if once:
+                        break
+                    try:
+                        await asyncio.wait_for(self.stopping.wait(), timeout=self.poll_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                self.held.update(job["id"] for job in jobs)
+                logger.info(f"Claimed {len(jobs)} evaluation jobs")
+                by_run = sorted(jobs, key=lambda job: job["evaluation_run_id"])
+                runs = [list(group) for _, group in groupby(by_run, key=lambda job: job["evaluation_run_id"])]
+                await asyncio.gather(*(self._process_run(run_jobs) for run_jobs in runs))
+        finally:
+            heartbeat.cancel()
+        logger.info(f"Evaluation worker {self.worker_id} stopped after {self.processed} jobs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run queued tender evaluation jobs")
+    parser.add_argument("--batch", type=int, default=settings.EVALUATION_WORKER_BATCH, help="jobs claimed per poll")
+    parser.add_argument("--poll-seconds", type=float, default=settings.EVALUATION_WORKER_POLL_SECONDS)
+    parser.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}")
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    Base.metadata.create_all(bind=engine)
+    worker = EvaluationWorker(args.worker_id, max(1, args.batch), args.poll_seconds)
+
+    async def _run():
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, worker.stopping.set)
+        await worker.run(once=args.once)
+
+    asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import os
+from datetime import date
+
+os.environ.setdefault("JWT_SECRET_KEY", "test")
+os.environ.setdefault("ELIGIBILITY_DATES_DAYFIRST", "true")
+
+import numpy as np
+
+from app.services.eligibility_service import CompiledRule, eligibility_service, parse_date
+from app.services.fact_extraction_service import fact_extraction_service
+
+
+def test_iso_dates_ignore_dayfirst():
+    assert parse_date("2025-03-04") == date(2025, 3, 4)
+    assert parse_date("2025-03-04T10:30:00") == date(2025, 3, 4)
+    assert parse_date("04/03/2025") == date(2025, 3, 4)
+    assert parse_date("2025-13-01") is None
+
+
+def test_iso_rule_bound_and_fact_dates_compare_correctly():
+    bounds = eligibility_service._bounds("date", ">=", "2025-03-10")
+    assert bounds == (float(date(2025, 3, 10).toordinal()),)
+
+    rule = CompiledRule(
+        id=1, name="expiry", source="fact", field="certificate_expiry", kind="date",
+        pattern=None, operator=">=", bounds=bounds, on_missing="fail",
+    )
+    vendor = {"facts": {"certificate_expiry": [date(2025, 3, 15), "2025-03-05"]}}
+    values = np.asarray(rule.values(vendor))
+    assert rule.compare(values).tolist() == [True, False]
+
+
+def test_iso_fact_dates_are_extracted_year_month_day():
+    facts = fact_extraction_service.extract({}, "ISO 9001 certificate valid until 2027-03-04.")
+    assert [f["value_date"] for f in facts if f["fact"] == "certificate_expiry"] == [date(2027, 3, 4)]